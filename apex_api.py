@@ -1,6 +1,10 @@
 import json
 import os
 from pathlib import Path
+from server.projection import project_frame
+from server.match_stats import MatchStats, event_time
+from server.event_ring import EventRing
+from server.event_dispatch import EventRegistry, event_players
 
 class ApexAPI:
     def __init__(self):
@@ -13,6 +17,18 @@ class ApexAPI:
         # 設定ファイルのパス
         self.config_file = self.liveapi_path / "config.json"
         
+        # イベント形式（protobuf / JSONのcategory付きイベント）から組み立てる現在の状態
+        self.reset_live_state()
+        
+        # マッチ中の統計（イベント・フレームごとに差分で更新）
+        self.stats = MatchStats()
+        
+        # 直前のスナップショットのマッチの状態（進行中かどうか, ゲーム状態, マップ）
+        self.snapshot_match = None
+        
+        # 直近のイベント（キルフィード・直近N秒の表示用。メモリ使用量は一定）
+        self.events = EventRing()
+        
     def setup(self):
         """APIの設定を確認する（既存の設定は変更しない）"""
         # LiveAPIディレクトリが存在するか確認
@@ -52,58 +68,256 @@ class ApexAPI:
                     "message": "データがありません"
                 }
             
-            # ゲーム状態の処理
-            game_state = data.get("gameState", "")
-            
-            # プレイヤーデータの処理
-            player_data = data.get("player", {})
-            processed_player = {
-                "name": player_data.get("name", ""),
-                "health": player_data.get("health", 0),
-                "maxHealth": player_data.get("maxHealth", 100),
-                "shields": player_data.get("shields", 0),
-                "maxShields": player_data.get("maxShields", 0),
-                "kills": player_data.get("kills", 0),
-                "damage": player_data.get("damage", 0),
-                "legend": player_data.get("legendName", "")
-            }
+            # ゲーム状態・プレイヤー・スクワッド・マッチデータの処理
+            # （スキーマからコンパイル済みの射影関数で1回で処理する）
+            processed = project_frame(data)
             
-            # スクワッドデータの処理
-            squad_data = data.get("squad", [])
-            processed_squad = []
-            
-            for member in squad_data:
-                processed_squad.append({
-                    "name": member.get("name", ""),
-                    "health": member.get("health", 0),
-                    "maxHealth": member.get("maxHealth", 100),
-                    "shields": member.get("shields", 0),
-                    "maxShields": member.get("maxShields", 0),
-                    "legend": member.get("legendName", "")
-                })
-            
-            # マッチデータの処理
-            match_data = data.get("match", {})
-            processed_match = {
-                "inProgress": match_data.get("inProgress", False),
-                "squadEliminated": match_data.get("squadEliminated", False),
-                "phase": match_data.get("phase", 0),
-                "remainingTime": match_data.get("remainingTime", 0),
-                "remainingSquads": match_data.get("remainingSquads", 0)
-            }
+            # 新しいマッチが始まった場合は統計を初期化（スナップショット形式にはmatchSetupがない）
+            if self._is_new_snapshot_match(data, processed):
+                self.stats.reset()
             
-            # 処理したデータを返す
-            return {
-                "type": "gameData",
-                "gameState": game_state,
-                "player": processed_player,
-                "squad": processed_squad,
-                "match": processed_match
-            }
+            # 観戦中のプレイヤーの累計から統計を更新
+            self.stats.on_snapshot(processed)
+            processed["stats"] = self.stats.summary(processed)
+            return processed
             
         except Exception as e:
             print(f"データ処理中にエラーが発生しました: {str(e)}")
             return {
                 "type": "error",
                 "message": f"データ処理エラー: {str(e)}"
-            }
\ No newline at end of file
+            }
+    
+    def _is_new_snapshot_match(self, data, processed):
+        """
+        スナップショットから新しいマッチの開始を判定
+        
+        マッチが進行中でない状態から進行中になった場合、ゲーム状態がPlayingになった場合、
+        マップが変わった場合に新しいマッチとみなす。
+        
+        Parameters:
+            data (dict): 受信したデータ
+            processed (dict): 射影済みのデータ
+            
+        Returns:
+            bool: 新しいマッチが始まった場合はTrue
+        """
+        match = data.get("match")
+        current = (
+            processed["match"]["inProgress"],
+            processed["gameState"],
+            match.get("map") if isinstance(match, dict) else None
+        )
+        previous = self.snapshot_match
+        self.snapshot_match = current
+        if previous is None:
+            return False
+        
+        in_progress, game_state, map_name = current
+        was_in_progress, previous_state, previous_map = previous
+        return (
+            (in_progress and not was_in_progress)
+            or (game_state == "Playing" and previous_state != "Playing")
+            or (map_name is not None and previous_map is not None and map_name != previous_map)
+        )
+    
+    def reset_live_state(self):
+        """イベントから組み立てる状態を初期化（マッチ開始時など）"""
+        # process_dataに渡すのと同じ形式のフレーム
+        self.live_frame = {
+            "gameState": "",
+            "player": {},
+            "squad": [],
+            "match": {}
+        }
+        
+        # 観戦中のプレイヤーのチームID
+        self.live_team_id = None
+        
+        # マッチに参加しているチームと敗退したチーム
+        self.live_teams = set()
+        self.eliminated_teams = set()
+    
+    def _player_fields(self, player):
+        """LiveAPIのPlayerメッセージをフレームのプレイヤー形式に変換（proto3の省略値は0/空文字）"""
+        fields = {
+            "name": player.get("name", ""),
+            "health": player.get("currentHealth", 0),
+            "maxHealth": player.get("maxHealth", 0),
+            "shields": player.get("shieldHealth", 0),
+            "maxShields": player.get("shieldMaxHealth", 0),
+            "legendName": player.get("character", "")
+        }
+        
+        # チームが分かる場合のみ含める（マッチの統計でチームごとに集計する）
+        if "teamId" in player:
+            fields["teamId"] = player["teamId"]
+        
+        # 位置は毎回新しいdictにする（前回のスナップショットと共有しない）
+        pos = player.get("pos")
+        if pos is not None:
+            fields["position"] = {
+                "x": pos.get("x", 0),
+                "y": pos.get("y", 0),
+                "z": pos.get("z", 0)
+            }
+        return fields
+    
+    def _update_players(self, players):
+        """イベントに含まれるプレイヤーの体力・シールドなどを反映"""
+        frame = self.live_frame
+        observed_name = frame["player"].get("name")
+        
+        for player in players:
+            name = player.get("name")
+            if not name:
+                continue
+            
+            if "teamId" in player:
+                self.live_teams.add(player["teamId"])
+            
+            if name == observed_name:
+                frame["player"] = {**frame["player"], **self._player_fields(player)}
+            
+            for index, member in enumerate(frame["squad"]):
+                if member.get("name") == name:
+                    frame["squad"][index] = {**member, **self._player_fields(player)}
+    
+    def _is_observed(self, player):
+        """観戦中のプレイヤーかどうか"""
+        return bool(player) and player.get("name") == self.live_frame["player"].get("name")
+    
+    def apply_event(self, event):
+        """
+        LiveAPIのイベントを現在の状態に反映して処理済みデータを返す
+        
+        イベント種類ごとの処理は event_handlers から1回で引く（未登録の種類は状態に影響しない）。
+        
+        Parameters:
+            event (dict): "category"を含むイベント（protobufからデコードしたもの、またはJSON）
+            
+        Returns:
+            dict: 処理済みのデータ（状態に影響しないイベントの場合はNone）
+        """
+        try:
+            category = event.get("category")
+            
+            # 統計はすべてのプレイヤーのイベントから集計する
+            now = event_time(event)
+            self.stats.on_event(event, now)
+            self.events.on_event(event, now)
+            
+            handler = self.event_handlers.get(category)
+            if handler is None:
+                # 未登録のイベント（高速パス）
+                return None
+            
+            # イベントに含まれるプレイヤー情報を反映
+            players = event_players(event, category)
+            if handler(self, event, players) is False:
+                return None
+            self._update_players(players)
+            
+            # 残りスクワッド数
+            frame = self.live_frame
+            if self.live_teams:
+                remaining = len(self.live_teams - self.eliminated_teams)
+                if remaining != frame["match"].get("remainingSquads"):
+                    frame["match"] = {**frame["match"], "remainingSquads": remaining}
+            
+            processed = project_frame(frame)
+            processed["stats"] = self.stats.summary(processed, now)
+            return processed
+            
+        except Exception as e:
+            print(f"イベント処理中にエラーが発生しました: {str(e)}")
+            return {
+                "type": "error",
+                "message": f"イベント処理エラー: {str(e)}"
+            }
+    
+    # イベント種類ごとの処理（self, event, players を受け取り、Falseを返すと状態に影響しないイベントとして扱う）
+    event_handlers = EventRegistry()
+    
+    @event_handlers.on("matchSetup")
+    def _on_match_setup(self, event, players):
+        self.reset_live_state()
+    
+    @event_handlers.on("gameStateChanged")
+    def _on_game_state_changed(self, event, players):
+        frame = self.live_frame
+        state = event.get("state", "")
+        frame["gameState"] = state
+        frame["match"] = {**frame["match"], "inProgress": state == "Playing"}
+    
+    @event_handlers.on("observerSwitched")
+    def _on_observer_switched(self, event, players):
+        # 観戦対象とそのチームを切り替え
+        frame = self.live_frame
+        target = event.get("target", {})
+        previous = frame["player"]
+        player = self._player_fields(target)
+        if previous.get("name") == player["name"]:
+            player = {**previous, **player}
+        frame["player"] = player
+        frame["squad"] = [self._player_fields(member) for member in event.get("targetTeam", [])]
+        self.live_team_id = target.get("teamId")
+    
+    @event_handlers.on("playerDamaged")
+    def _on_player_damaged(self, event, players):
+        if self._is_observed(event.get("attacker")):
+            frame = self.live_frame
+            player = frame["player"]
+            frame["player"] = {**player, "damage": player.get("damage", 0) + event.get("damageInflicted", 0)}
+    
+    @event_handlers.on("playerKilled")
+    def _on_player_killed(self, event, players):
+        killer = event.get("awardedTo") or event.get("attacker")
+        if self._is_observed(killer):
+            frame = self.live_frame
+            player = frame["player"]
+            frame["player"] = {**player, "kills": player.get("kills", 0) + 1}
+    
+    @event_handlers.on("playerStatChanged")
+    def _on_player_stat_changed(self, event, players):
+        if self._is_observed(event.get("player")):
+            frame = self.live_frame
+            stat_name = event.get("statName", "")
+            if stat_name == "kills":
+                frame["player"] = {**frame["player"], "kills": event.get("newValue", 0)}
+            elif stat_name in ("damageDealt", "damage"):
+                frame["player"] = {**frame["player"], "damage": event.get("newValue", 0)}
+    
+    @event_handlers.on("squadEliminated")
+    def _on_squad_eliminated(self, event, players):
+        frame = self.live_frame
+        match = dict(frame["match"])
+        for player in event.get("players", []):
+            team_id = player.get("teamId")
+            self.eliminated_teams.add(team_id)
+            if team_id == self.live_team_id or self._is_observed(player):
+                match["squadEliminated"] = True
+        frame["match"] = match
+    
+    @event_handlers.on("ringStartClosing", "ringFinishedClosing")
+    def _on_ring(self, event, players):
+        frame = self.live_frame
+        frame["match"] = {
+            **frame["match"],
+            "phase": event.get("stage", 0),
+            "remainingTime": int(event.get("shrinkDuration", 0))
+        }
+    
+    @event_handlers.on("matchStateEnd")
+    def _on_match_state_end(self, event, players):
+        frame = self.live_frame
+        frame["match"] = {**frame["match"], "inProgress": False}
+    
+    @event_handlers.on(
+        "characterSelected", "playerConnected", "playerDisconnected", "playerUpgradeTierChanged",
+        "playerDowned", "playerAssist", "playerRespawnTeam", "playerRevive",
+        "inventoryPickUp", "inventoryDrop", "inventoryUse"
+    )
+    def _on_player_event(self, event, players):
+        # プレイヤーの体力・シールドなどの反映のみ（プレイヤー情報がなければ状態に影響しない）
+        return bool(players)
@@ -0,0 +1,95 @@
+"""
+分析ストア（server.analytics）の集計速度を計測するベンチマーク
+
+合成したマッチ（20チーム x 3人）をイベントからMatchStatsで集計して取り込み、
+保存・読み込みとグループ化・絞り込みの集計時間を計測する。
+NumPyがインストールされていればベクトル化した集計、なければarray.arrayの走査で集計する。
+
+使い方:
+    python -m benchmarks.bench_analytics --matches 1000
+"""
+import argparse
+import random
+import tempfile
+import time
+from server.analytics import AnalyticsStore, BACKEND
+from server.match_stats import MatchStats
+from tools.liveapi_producer import LEGENDS, TEAM_COUNT, TEAM_SIZE
+
+# 計測の繰り返し回数（最小値を採用）
+ROUNDS = 5
+
+# 集計する条件（名前, group_by, filters）
+QUERIES = (
+    ("レジェンド別", "legend", None),
+    ("プレイヤー別", "player", None),
+    ("レジェンドで絞り込み", "player", {"legend": ["Wraith", "Octane"]}),
+    ("キル数で絞り込み", "legend", {"kills": {"min": 3}}),
+    ("チーム別（複合条件）", "team", {"legend": ["Lifeline"], "damage": {"min": 300}})
+)
+
+def build_match(index, players, rng):
+    """イベントから1マッチ分の統計を作成"""
+    stats = MatchStats()
+    start = 1700000000 + index * 3600
+    lobby = rng.sample(players, TEAM_COUNT * TEAM_SIZE)
+    entries = [
+        {"name": name, "teamId": team + 1, "character": rng.choice(LEGENDS)}
+        for team in range(TEAM_COUNT)
+        for name in lobby[team * TEAM_SIZE:(team + 1) * TEAM_SIZE]
+    ]
+
+    stats.on_event({"category": "gameStateChanged", "state": "Playing"}, start)
+    now = start
+    alive = list(entries)
+    while len(alive) > TEAM_SIZE:
+        now += rng.uniform(1, 20)
+        attacker, victim = rng.sample(alive, 2)
+        stats.on_event({"category": "playerDamaged", "attacker": attacker, "victim": victim,
+                        "damageInflicted": rng.randint(10, 120)}, now)
+        if rng.random() < 0.3:
+            stats.on_event({"category": "playerKilled", "attacker": attacker, "victim": victim}, now)
+            alive.remove(victim)
+    stats.on_event({"category": "matchStateEnd"}, now)
+    return stats
+
+def measure(function):
+    """関数の実行時間（ms、ROUNDS回の最小値）"""
+    best = None
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="分析ストアの集計速度を計測")
+    parser.add_argument("--matches", type=int, default=1000, help="取り込むマッチ数")
+    parser.add_argument("--players", type=int, default=2000, help="プレイヤーの人数")
+    parser.add_argument("--seed", type=int, default=1, help="乱数のシード")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    players = [f"Player{index:05d}" for index in range(args.players)]
+    matches = [build_match(index, players, rng) for index in range(args.matches)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = AnalyticsStore(directory)
+        started = time.perf_counter()
+        for index, stats in enumerate(matches):
+            store.add_match(stats, f"match{index}", save=False)
+        store.save()
+        ingest_ms = (time.perf_counter() - started) * 1000
+
+        load_ms = measure(lambda: AnalyticsStore(directory))
+
+        print(f"バックエンド: {BACKEND}  {len(store.matches)}マッチ / {store.rows}行")
+        print(f"取り込み（まとめて保存）: {ingest_ms:.1f} ms  読み込み: {load_ms:.1f} ms")
+        for name, group_by, filters in QUERIES:
+            results = store.query(group_by, filters)
+            elapsed = measure(lambda: store.query(group_by, filters))
+            print(f"{name}: {elapsed:.2f} ms（{len(results)}グループ）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+フレームあたりのシリアライズコストを計測するマイクロベンチマーク
+
+旧方式（送信先ごとに json.dumps）と新方式（codecで1回だけエンコードして共有）を
+1 / 10 / 50 クライアントで比較する。
+
+使い方:
+    python -m benchmarks.bench_codec
+"""
+import json
+import timeit
+from apex_api import ApexAPI
+from server import codec
+
+# クライアント数
+CLIENT_COUNTS = (1, 10, 50)
+
+# 1計測あたりのフレーム数
+FRAMES = 2000
+
+def build_sample_frame():
+    """ゲームから届く典型的なフレームを生成"""
+    return {
+        "gameState": "Playing",
+        "player": {
+            "name": "ObserverTarget",
+            "health": 87,
+            "maxHealth": 100,
+            "shields": 50,
+            "maxShields": 100,
+            "kills": 3,
+            "damage": 1245,
+            "legendName": "Wraith",
+            "position": {"x": 1520.5, "y": -3310.25, "z": 412.0}
+        },
+        "squad": [
+            {"name": f"Teammate{i}", "health": 100, "maxHealth": 100,
+             "shields": 75, "maxShields": 100, "legendName": "Bangalore"}
+            for i in range(3)
+        ],
+        "match": {
+            "inProgress": True,
+            "squadEliminated": False,
+            "phase": 3,
+            "remainingTime": 95,
+            "remainingSquads": 11
+        }
+    }
+
+def measure(func):
+    """1フレームあたりの処理時間（マイクロ秒）を計測"""
+    seconds = min(timeit.repeat(func, number=FRAMES, repeat=5))
+    return seconds / FRAMES * 1e6
+
+def main():
+    message = ApexAPI().process_data(build_sample_frame())
+
+    print(f"JSONバックエンド: {codec.BACKEND}")
+    print(f"メッセージサイズ: {len(codec.encode(message))} bytes")
+    print()
+    print(f"{'clients':>8} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+
+    for clients in CLIENT_COUNTS:
+        def before():
+            # 送信先ごとにシリアライズ
+            for _ in range(clients):
+                json.dumps(message)
+
+        def after():
+            # 1回だけエンコードし、同じバッファを全送信先で共有
+            payload = codec.encode_text(message)
+            return [payload] * clients
+
+        before_us = measure(before)
+        after_us = measure(after)
+        print(f"{clients:>8} {before_us:>12.2f} {after_us:>12.2f} {before_us / after_us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+LiveAPIのイベント処理（ApexAPI.apply_event）のスループットを計測するベンチマーク
+
+合成したマッチ（tools.liveapi_producer）に回復・インベントリなどの種類と未対応の種類を
+混ぜたイベント列を処理し、1イベントあたりの時間と種類ごとの時間を計測する。
+処理の登録数を増やしても（ダミーの種類を追加）1イベントあたりの時間が変わらないことも確認する。
+
+使い方:
+    python -m benchmarks.bench_dispatch --fights 2000
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from apex_api import ApexAPI
+from server.liveapi_proto import decode_event
+from tools.liveapi_producer import generate_match
+
+# 計測の繰り返し回数（最小値を採用）
+ROUNDS = 7
+
+# 登録数を増やす場合に追加するダミーの種類の数
+EXTRA_CATEGORIES = 200
+
+def build_events(fights, seed):
+    """合成したマッチのイベントに、合成マッチに含まれない種類と未対応の種類を混ぜる"""
+    rng = random.Random(seed)
+    events = []
+    for event in (decode_event(frame) for frame in generate_match(seed, fights)):
+        events.append(event)
+        victim = event.get("victim")
+        if victim is None or rng.random() < 0.7:
+            continue
+        timestamp = event["timestamp"]
+        events.append(rng.choice((
+            {"category": "inventoryPickUp", "timestamp": timestamp, "player": victim, "item": "ammo", "quantity": 20},
+            {"category": "inventoryUse", "timestamp": timestamp, "player": victim, "item": "syringe", "quantity": 1},
+            {"category": "playerRevive", "timestamp": timestamp, "player": event["attacker"], "revived": victim},
+            {"category": "playerAssist", "timestamp": timestamp, "assistant": event["attacker"], "victim": victim},
+            {"category": "playerUpgradeTierChanged", "timestamp": timestamp, "player": victim, "level": 2},
+            {"category": "bannerCollected", "timestamp": timestamp, "player": victim},
+            {"category": None, "typeUrl": "type.googleapis.com/rtech.liveapi.Unknown"}
+        )))
+    return events
+
+def measure(events):
+    """1イベントあたりの処理時間（マイクロ秒、ROUNDS回の最小値）"""
+    best = None
+    for _ in range(ROUNDS):
+        api = ApexAPI()
+        started = time.perf_counter()
+        for event in events:
+            api.apply_event(event)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(events) * 1e6
+
+def measure_by_category(events):
+    """種類ごとの1イベントあたりの処理時間（マイクロ秒）"""
+    totals = defaultdict(float)
+    counts = defaultdict(int)
+    api = ApexAPI()
+    for event in events:
+        category = event.get("category") or "(未対応)"
+        started = time.perf_counter()
+        api.apply_event(event)
+        totals[category] += time.perf_counter() - started
+        counts[category] += 1
+    return {category: (counts[category], totals[category] / counts[category] * 1e6) for category in totals}
+
+def main():
+    parser = argparse.ArgumentParser(description="LiveAPIのイベント処理のスループットを計測")
+    parser.add_argument("--fights", type=int, default=2000, help="合成マッチの交戦イベントの数")
+    parser.add_argument("--seed", type=int, default=1, help="乱数のシード")
+    args = parser.parse_args()
+
+    events = build_events(args.fights, args.seed)
+    per_event = measure(events)
+    print(f"{len(events)}イベント / 登録済みの種類 {len(ApexAPI.event_handlers.categories())}")
+    print(f"1イベントあたり {per_event:.2f} µs（{1e6 / per_event:,.0f} イベント/秒）")
+    print()
+
+    print("種類ごとの1イベントあたりの時間")
+    for category, (count, micros) in sorted(measure_by_category(events).items(), key=lambda item: -item[1][0]):
+        print(f"  {category:<26} {count:6d}件  {micros:6.2f} µs")
+    print()
+
+    # 処理の登録数を増やしても1イベントあたりの時間は変わらない（辞書を1回引くだけ）
+    registry = ApexAPI.event_handlers
+    added = [f"dummyEvent{index}" for index in range(EXTRA_CATEGORIES)]
+    registry.on(*added)(lambda api, event, players: False)
+    try:
+        grown = measure(events)
+    finally:
+        for category in added:
+            del registry.handlers[category]
+    print(f"ダミーの種類を{EXTRA_CATEGORIES}個追加: 1イベントあたり {grown:.2f} µs（追加前 {per_event:.2f} µs）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+直近のイベントのリングバッファ（server.event_ring）のメモリ使用量と取得速度を計測するベンチマーク
+
+25分のマッチを指定した頻度のイベントで再現し、途中のメモリ使用量（tracemalloc）が
+一定であることと、「直近N秒」の取得時間をすべてのイベントをリストに残して走査する場合と比較する。
+
+使い方:
+    python -m benchmarks.bench_event_ring --rate 50
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from server.event_ring import EventRing
+from tools.liveapi_producer import TEAM_COUNT, TEAM_SIZE
+
+# マッチの長さ（秒）
+MATCH_SECONDS = 25 * 60
+
+# メモリ使用量を表示する間隔（秒）
+REPORT_INTERVAL = 5 * 60
+
+# 計測の繰り返し回数（最小値を採用）
+ROUNDS = 5
+
+# イベントの種類（playerDamagedが大半を占める）
+CATEGORIES = ("playerDamaged",) * 8 + ("playerDowned", "playerKilled")
+
+WEAPONS = ("R-301", "Flatline", "Peacekeeper", "Wingman", "Volt")
+
+def build_events(rate, rng):
+    """マッチ中のイベントを生成"""
+    players = [{"name": f"Player{index:02d}", "teamId": index // TEAM_SIZE + 1}
+               for index in range(TEAM_COUNT * TEAM_SIZE)]
+    start = 1700000000.0
+    count = int(MATCH_SECONDS * rate)
+    for index in range(count):
+        attacker, victim = rng.sample(players, 2)
+        yield {
+            "category": rng.choice(CATEGORIES),
+            "timestamp": start + index / rate,
+            "attacker": attacker,
+            "victim": victim,
+            "weapon": rng.choice(WEAPONS),
+            "damageInflicted": rng.randint(10, 120)
+        }
+
+def measure(function):
+    """関数の実行時間（ms、ROUNDS回の最小値）"""
+    best = None
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def scan_list(events, seconds, player=None, types=None):
+    """比較用: すべてのイベントを走査して直近N秒のイベントを取り出す"""
+    cutoff = events[-1]["timestamp"] - seconds
+    return [
+        event for event in events
+        if event["timestamp"] >= cutoff
+        and (types is None or event["category"] in types)
+        and (player is None or player in (event["attacker"]["name"], event["victim"]["name"]))
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="イベントのリングバッファのメモリ使用量と取得速度を計測")
+    parser.add_argument("--rate", type=float, default=50, help="1秒あたりのイベント数")
+    parser.add_argument("--seed", type=int, default=1, help="乱数のシード")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    events = list(build_events(args.rate, rng))
+
+    tracemalloc.start()
+    ring = EventRing()
+    baseline = tracemalloc.get_traced_memory()[0]
+    next_report = REPORT_INTERVAL
+    start = events[0]["timestamp"]
+    print(f"{len(events)}件のイベント（{args.rate:g}件/秒・{MATCH_SECONDS // 60}分）")
+    for event in events:
+        ring.on_event(event, event["timestamp"])
+        if event["timestamp"] - start >= next_report:
+            used = tracemalloc.get_traced_memory()[0] - baseline
+            print(f"  {next_report // 60:2d}分: 確保後の増加 {used / 1024:.1f} KiB（{ring.get_stats()['size']}件保持）")
+            next_report += REPORT_INTERVAL
+    tracemalloc.stop()
+    print(f"配列の確保サイズ: {ring.get_stats()['bytes'] / 1024:.1f} KiB")
+    print()
+
+    queries = (
+        ("直近30秒", {"seconds": 30}),
+        ("直近30秒・キルのみ", {"seconds": 30, "types": ["playerKilled"]}),
+        ("直近60秒・プレイヤー指定", {"seconds": 60, "player": "Player07"})
+    )
+    for name, options in queries:
+        results = ring.query(options["seconds"], options.get("player"), options.get("types"))
+        ring_ms = measure(lambda: ring.query(options["seconds"], options.get("player"), options.get("types")))
+        scan_ms = measure(lambda: scan_list(events, options["seconds"], options.get("player"), options.get("types")))
+        print(f"{name}: リングバッファ {ring_ms:.3f} ms / 全件走査 {scan_ms:.2f} ms（{len(results)}件）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+段階ごとの計測（utils.metrics）のオーバーヘッドを計測するベンチマーク
+
+別プロセスのプロデューサーから最大速度でフレームを送信し、WebSocketサーバー側で
+受信 → デコード → process_data → 差分 → シリアライズ の経路を処理する。
+計測なしと main.py と同じ計測ありのハンドラーを交互に実行し、1フレームあたりの
+処理時間を比較する。
+
+使い方:
+    python -m benchmarks.bench_metrics
+"""
+import argparse
+import asyncio
+import sys
+from time import perf_counter_ns
+import websockets
+from websockets.frames import Frame, OP_TEXT
+from apex_api import ApexAPI
+from server import codec
+from server.state_stream import StateStream
+from utils.metrics import (
+    timing_sampler, RECEIVE_SECONDS, DECODE_SECONDS, PROCESS_SECONDS, SERIALIZE_SECONDS
+)
+from benchmarks.bench_codec import build_sample_frame
+from benchmarks.load_test import free_port
+
+# 1計測あたりのフレーム数
+FRAMES = 20000
+
+# 計測の繰り返し回数（各方式の最小値を採用）
+ROUNDS = 5
+
+def build_messages(count=64):
+    """少しずつ値が変わる受信フレームを生成（毎回差分が出るようにする）"""
+    messages = []
+    for index in range(count):
+        frame = build_sample_frame()
+        frame["player"]["health"] = 100 - index
+        frame["player"]["position"]["x"] += index
+        messages.append(codec.encode_text(frame))
+    return messages
+
+async def produce(port, frames):
+    """
+    プロデューサー（別プロセス）: フレームを最大速度で送信
+
+    サーバー側の処理速度を計測するため、マスク済みのフレームを事前にまとめて作成し、
+    トランスポートに直接書き込む（送信側がボトルネックにならないようにする）
+    """
+    messages = build_messages()
+    encoded = [
+        Frame(OP_TEXT, message.encode("utf-8")).serialize(mask=True)
+        for message in messages
+    ]
+    payload = b"".join(encoded[index % len(encoded)] for index in range(frames))
+
+    async with websockets.connect(f"ws://localhost:{port}") as websocket:
+        websocket.transport.write(payload)
+        await websocket.wait_closed()
+
+def make_handlers(api):
+    """計測なし / 計測ありの1フレーム分の処理"""
+    stream = StateStream()
+
+    def plain(message):
+        data = codec.decode(message)
+        processed = api.process_data(data)
+        patch = stream.update(processed)
+        if patch is not None:
+            codec.encode_text(patch)
+
+    should_time = timing_sampler()
+
+    def instrumented(message):
+        # main.py の handle_client / ingest_frame / publish_state と同じ計測
+        timed = should_time()
+        if timed:
+            received = perf_counter_ns()
+        data = codec.decode(message)
+        if timed:
+            DECODE_SECONDS.observe_ns(perf_counter_ns() - received)
+            started = perf_counter_ns()
+        processed = api.process_data(data)
+        if timed:
+            PROCESS_SECONDS.observe_ns(perf_counter_ns() - started)
+
+        started = perf_counter_ns()
+        patch = stream.update(processed)
+        if patch is not None:
+            codec.encode_text(patch)
+            SERIALIZE_SECONDS.observe_ns(perf_counter_ns() - started)
+        if timed:
+            RECEIVE_SECONDS.observe_ns(perf_counter_ns() - received)
+
+    return plain, instrumented
+
+async def measure(process, frames=FRAMES):
+    """
+    サーバー側で最初のフレームから最後のフレームを処理し終えるまでの時間を計測
+
+    Returns:
+        float: 1フレームあたりの処理時間（µs）
+    """
+    port = free_port()
+    done = asyncio.get_running_loop().create_future()
+    state = {"count": 0, "start": 0}
+
+    async def handler(websocket, path):
+        async for message in websocket:
+            if state["count"] == 0:
+                state["start"] = perf_counter_ns()
+            process(message)
+            state["count"] += 1
+            if state["count"] == frames:
+                done.set_result(perf_counter_ns() - state["start"])
+                return
+
+    async with websockets.serve(handler, "localhost", port):
+        producer = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.bench_metrics", "--produce", str(port), str(frames)
+        )
+        elapsed = await done
+        await producer.wait()
+
+    return elapsed / 1000 / (frames - 1)
+
+async def run():
+    plain, instrumented = make_handlers(ApexAPI())
+
+    best = {"plain": float("inf"), "instrumented": float("inf")}
+    for _ in range(ROUNDS):
+        best["plain"] = min(best["plain"], await measure(plain))
+        best["instrumented"] = min(best["instrumented"], await measure(instrumented))
+
+    print(f"JSONバックエンド: {codec.BACKEND}")
+    print(f"計測なし: {best['plain']:.2f} µs/frame")
+    print(f"計測あり: {best['instrumented']:.2f} µs/frame")
+    print(f"計測のオーバーヘッド: {(best['instrumented'] / best['plain'] - 1) * 100:+.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="段階ごとの計測のオーバーヘッドを計測")
+    parser.add_argument("--produce", nargs=2, type=int, metavar=("PORT", "FRAMES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.produce:
+        asyncio.run(produce(*args.produce))
+    else:
+        asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+フィールド射影のスループットを計測するベンチマーク
+
+同じフィールド定義（server.projection）から射影する3つの方法を比較する。
+- 手書きの dict.get による抽出（射影関数導入前の ApexAPI.process_data）
+- フィールド定義を実行時にたどる辞書内包表記
+- フィールド定義からコンパイルした射影関数（現在の project_frame）
+
+統計の更新など射影以外の処理は含めない。
+
+使い方:
+    python -m benchmarks.bench_projection
+"""
+import timeit
+from benchmarks.bench_codec import build_sample_frame
+from server.projection import PLAYER_FIELDS, SQUAD_MEMBER_FIELDS, MATCH_FIELDS, project_frame
+
+# 1計測あたりのフレーム数
+FRAMES = 20000
+
+def handwritten_project(data):
+    """射影関数導入前の ApexAPI.process_data の抽出（比較用、position も含めて出力を揃えている）"""
+    player_data = data.get("player", {})
+    processed_player = {
+        "name": player_data.get("name", ""),
+        "teamId": player_data.get("teamId"),
+        "health": player_data.get("health", 0),
+        "maxHealth": player_data.get("maxHealth", 100),
+        "shields": player_data.get("shields", 0),
+        "maxShields": player_data.get("maxShields", 0),
+        "kills": player_data.get("kills", 0),
+        "damage": player_data.get("damage", 0),
+        "legend": player_data.get("legendName", ""),
+        "position": player_data.get("position", {"x": 0, "y": 0, "z": 0})
+    }
+
+    processed_squad = []
+    for member in data.get("squad", []):
+        processed_squad.append({
+            "name": member.get("name", ""),
+            "teamId": member.get("teamId"),
+            "health": member.get("health", 0),
+            "maxHealth": member.get("maxHealth", 100),
+            "shields": member.get("shields", 0),
+            "maxShields": member.get("maxShields", 0),
+            "legend": member.get("legendName", "")
+        })
+
+    match_data = data.get("match", {})
+    processed_match = {
+        "inProgress": match_data.get("inProgress", False),
+        "squadEliminated": match_data.get("squadEliminated", False),
+        "phase": match_data.get("phase", 0),
+        "remainingTime": match_data.get("remainingTime", 0),
+        "remainingSquads": match_data.get("remainingSquads", 0)
+    }
+
+    return {
+        "type": "gameData",
+        "gameState": data.get("gameState", ""),
+        "player": processed_player,
+        "squad": processed_squad,
+        "match": processed_match
+    }
+
+def comprehension_project(data):
+    """フィールド定義を実行時にたどる辞書内包表記（比較用）"""
+    player = data.get("player", {})
+    match = data.get("match", {})
+    return {
+        "type": "gameData",
+        "gameState": data.get("gameState", ""),
+        "player": {output_key: player.get(source_key, default) for source_key, output_key, default in PLAYER_FIELDS},
+        "squad": [
+            {output_key: member.get(source_key, default) for source_key, output_key, default in SQUAD_MEMBER_FIELDS}
+            for member in data.get("squad", [])
+        ],
+        "match": {output_key: match.get(source_key, default) for source_key, output_key, default in MATCH_FIELDS}
+    }
+
+def frames_per_second(funcs, frame, rounds=7):
+    """
+    1秒あたりの処理フレーム数を計測
+
+    計測環境の揺らぎの影響を減らすため、各関数を交互に計測して最小値を採用する
+    """
+    best = [float("inf")] * len(funcs)
+    for _ in range(rounds):
+        for index, func in enumerate(funcs):
+            seconds = timeit.timeit(lambda: func(frame), number=FRAMES)
+            best[index] = min(best[index], seconds)
+    return [FRAMES / seconds for seconds in best]
+
+def main():
+    frames = (
+        ("全フィールドあり", build_sample_frame()),
+        ("セクションのみ（既定値を使用）", {"gameState": "Playing", "player": {}, "squad": [{}, {}], "match": {}})
+    )
+    funcs = (
+        ("手書き", handwritten_project),
+        ("辞書内包表記", comprehension_project),
+        ("コンパイル済み", project_frame)
+    )
+
+    for title, frame in frames:
+        # 出力が同じであることを確認
+        expected = project_frame(frame)
+        for name, func in funcs:
+            assert func(frame) == expected, name
+
+        results = frames_per_second([func for _, func in funcs], frame)
+        print(title)
+        print(f"  {'':<14} {'frames/sec':>12} {'手書き比':>8}")
+        for (name, _), result in zip(funcs, results):
+            print(f"  {name:<14} {result:>12,.0f} {result / results[0]:>7.2f}x")
+        print()
+
+if __name__ == "__main__":
+    main()
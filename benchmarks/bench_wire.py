@@ -0,0 +1,139 @@
+"""
+配信メッセージのエンコーディングと圧縮設定ごとの転送量・CPU時間を計測するベンチマーク
+
+試合中のフレームを模した差分ストリーム（StateStreamのキーフレームとパッチ）を
+JSON / MessagePack でエンコードし、permessage-deflate と同じ方法（接続ごとに圧縮コンテキストを
+引き継ぎ、Z_SYNC_FLUSHで区切って末尾4バイトを除く）で圧縮したサイズを比較する。
+
+使い方:
+    python -m benchmarks.bench_wire --frames 2000
+"""
+import argparse
+import copy
+import random
+import time
+import zlib
+from apex_api import ApexAPI
+from benchmarks.bench_codec import build_sample_frame
+from server import codec, msgpack_codec
+from server.state_stream import StateStream
+
+# 比較する圧縮設定（名前, level, windowBits, memLevel）。levelがNoneの場合は圧縮しない
+COMPRESSION_SETTINGS = (
+    ("圧縮なし", None, None, None),
+    ("level 1 / window 12", 1, 12, 5),
+    ("level 6 / window 12（デフォルト）", 6, 12, 5),
+    ("level 9 / window 12", 9, 12, 5),
+    ("level 6 / window 9", 6, 9, 5),
+    ("level 6 / window 15", 6, 15, 8)
+)
+
+# 配信のCPU時間の計測で形式ごとに想定する接続数
+FANOUT_CLIENTS = 10
+
+# permessage-deflateで各メッセージの末尾から取り除くバイト列
+DEFLATE_TAIL = b"\x00\x00\xff\xff"
+
+def build_patches(count, seed):
+    """試合中のフレームから配信メッセージ（キーフレームとパッチのdict）の列を作成"""
+    rng = random.Random(seed)
+    api = ApexAPI()
+    stream = StateStream()
+    frame = build_sample_frame()
+    patches = []
+
+    for index in range(count):
+        frame = copy.deepcopy(frame)
+        player = frame["player"]
+        player["position"] = {key: value + rng.uniform(-30, 30) for key, value in player["position"].items()}
+        if rng.random() < 0.3:
+            player["health"] = rng.randint(1, 100)
+            player["shields"] = rng.choice((0, 25, 50, 75, 100))
+        if rng.random() < 0.1:
+            teammate = rng.choice(frame["squad"])
+            teammate["health"] = rng.randint(0, 100)
+        if rng.random() < 0.02:
+            player["kills"] += 1
+            player["damage"] += rng.randint(50, 250)
+        frame["match"]["remainingTime"] = max(0, 95 - index // 30)
+
+        patch = stream.update(api.process_data(frame))
+        if patch is not None:
+            patch["channel"] = "default"
+            patches.append(patch)
+    return patches
+
+def compress_all(payloads, level, window_bits, mem_level):
+    """
+    1つの接続として順番に圧縮
+
+    Returns:
+        tuple: (圧縮後の合計バイト数, 1メッセージあたりの圧縮時間（マイクロ秒）)
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -window_bits, mem_level)
+    total = 0
+    started = time.perf_counter()
+    for payload in payloads:
+        data = compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data.endswith(DEFLATE_TAIL):
+            data = data[:-4]
+        total += len(data)
+    elapsed = time.perf_counter() - started
+    return total, elapsed / len(payloads) * 1e6
+
+def fan_out(patch):
+    """JSONとMessagePackの接続にFANOUT_CLIENTS件ずつ配信する場合のエンコード（配信時と同じOutgoingMessageを使う）"""
+    message = codec.OutgoingMessage(patch)
+    for _ in range(FANOUT_CLIENTS):
+        message.encode(codec.SUBPROTOCOL_JSON)
+        message.encode(codec.SUBPROTOCOL_MSGPACK)
+
+def per_message_us(function, items):
+    """1メッセージあたりの処理時間（マイクロ秒、3回の最小値）"""
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(items) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="エンコーディング・圧縮設定ごとの転送量とCPU時間を計測")
+    parser.add_argument("--frames", type=int, default=2000, help="生成するフレーム数")
+    parser.add_argument("--seed", type=int, default=1, help="乱数のシード")
+    args = parser.parse_args()
+
+    patches = build_patches(args.frames, args.seed)
+    encodings = (
+        ("JSON", [codec.encode(patch) for patch in patches]),
+        ("MessagePack", [msgpack_codec.pack(patch) for patch in patches])
+    )
+
+    print(f"JSONバックエンド: {codec.BACKEND}  MessagePackバックエンド: {msgpack_codec.BACKEND}")
+    print(f"メッセージ数: {len(patches)}（キーフレーム1 + パッチ{len(patches) - 1}）")
+    for name, payloads in encodings:
+        print(f"{name} キーフレーム: {len(payloads[0])} bytes")
+    print()
+
+    print("CPU時間（1メッセージあたり）")
+    print(f"  JSONエンコード: {per_message_us(codec.encode_text, patches):.2f} µs")
+    print(f"  MessagePackエンコード: {per_message_us(msgpack_codec.pack, patches):.2f} µs")
+    print(f"  JSON・MessagePackの接続に{FANOUT_CLIENTS}件ずつ配信（形式ごとに1回エンコード）: "
+          f"{per_message_us(fan_out, patches):.2f} µs")
+    print()
+
+    print("転送量（1メッセージあたりの平均バイト数）と圧縮時間")
+    for setting, level, window_bits, mem_level in COMPRESSION_SETTINGS:
+        results = []
+        for name, payloads in encodings:
+            if level is None:
+                total, elapsed = sum(len(payload) for payload in payloads), 0.0
+            else:
+                total, elapsed = compress_all(payloads, level, window_bits, mem_level)
+            results.append(f"{name} {total / len(payloads):7.1f} B ({elapsed:5.2f} µs)")
+        print(f"  {setting:<32} " + "  ".join(results))
+
+if __name__ == "__main__":
+    main()
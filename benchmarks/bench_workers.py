@@ -0,0 +1,190 @@
+"""
+ワーカーモード（main.py --workers N）の配信能力を計測するベンチマーク
+
+ワーカー数ごとに main.py を起動し、オーバーレイクライアントの数を段階的に増やしながら
+一定のレートでフレームを送信する。受信レイテンシのp99が上限以内に収まった最大の
+クライアント数を、そのワーカー数での配信能力とする。
+
+クライアント側がボトルネックにならないよう、オーバーレイクライアントは複数の
+サブプロセスに分けて接続する。レイテンシはプロデューサーが player.damage に埋め込んだ
+送信時刻（CLOCK_MONOTONIC、プロセス間で共通）から求める。
+コア数に比例して配信能力が伸びることを確認するには、コアが複数あるマシンで実行する。
+
+使い方:
+    python -m benchmarks.bench_workers --workers 0,1,2,4 --steps 100,200,400,800
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import websockets
+from benchmarks.load_test import ROOT, SyntheticLobby, free_port, percentile, wait_for_port
+
+def now_us():
+    """プロセス間で共通の単調増加時刻（µs）"""
+    return time.monotonic_ns() // 1000
+
+async def consume(url, count, seconds):
+    """
+    クライアントプロセス: count個のオーバーレイ接続で受信レイテンシを記録
+
+    Returns:
+        dict: レイテンシ（ms）と受信メッセージ数
+    """
+    latencies = []
+    state = {"messages": 0}
+
+    async def client():
+        async with websockets.connect(url, max_size=None) as websocket:
+            async for message in websocket:
+                received = now_us()
+                state["messages"] += 1
+                data = json.loads(message)
+                if data.get("type") == "keyframe":
+                    sent = data.get("state", {}).get("player", {}).get("damage")
+                elif data.get("type") == "patch":
+                    sent = data.get("set", {}).get("player.damage")
+                else:
+                    sent = None
+                if sent:
+                    latencies.append((received - sent) / 1000)
+
+    tasks = [asyncio.ensure_future(client()) for _ in range(count)]
+    await asyncio.sleep(seconds)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {"latencies": latencies, "messages": state["messages"]}
+
+async def produce(url, rate, duration):
+    """送信時刻を player.damage に埋め込んだフレームを一定のレートで送信"""
+    lobby = SyntheticLobby()
+    interval = 1.0 / rate
+    seq = 0
+    async with websockets.connect(url, max_size=None) as websocket:
+        start = time.perf_counter()
+        next_send = start
+        while time.perf_counter() - start < duration:
+            seq += 1
+            frame = lobby.frame(seq)
+            frame["player"]["damage"] = now_us()
+            await websocket.send(json.dumps(frame))
+            next_send += interval
+            await asyncio.sleep(max(0, next_send - time.perf_counter()))
+    return seq
+
+async def run_step(overlay_url, game_url, consumers, args):
+    """
+    1段階分（クライアント数を固定）の計測
+
+    Returns:
+        dict: p99レイテンシ（ms）と1クライアントあたりの受信メッセージ数
+    """
+    processes = max(1, min(args.client_processes, consumers))
+    seconds = args.warmup + args.duration + args.drain
+    clients = [
+        await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.bench_workers",
+            "--consume", overlay_url, str(consumers // processes + (index < consumers % processes)), str(seconds),
+            cwd=ROOT, stdout=asyncio.subprocess.PIPE
+        )
+        for index in range(processes)
+    ]
+
+    # 全クライアントの接続を待ってから送信
+    await asyncio.sleep(args.warmup)
+    await produce(game_url, args.rate, args.duration)
+
+    latencies = []
+    messages = 0
+    for client in clients:
+        output, _ = await client.communicate()
+        result = json.loads(output)
+        latencies.extend(result["latencies"])
+        messages += result["messages"]
+
+    latencies.sort()
+    return {
+        "consumers": consumers,
+        "p99Ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "messagesPerConsumer": round(messages / consumers, 1)
+    }
+
+async def run_workers(workers, args):
+    """ワーカー数を固定してクライアント数を増やしていく"""
+    ws_port = free_port()
+    http_port = free_port()
+    command = [sys.executable, "main.py", "--ws-port", str(ws_port), "--http-port", str(http_port)]
+    if workers:
+        command += ["--workers", str(workers)]
+
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    steps = []
+    capacity = 0
+    try:
+        await wait_for_port(http_port)
+        await wait_for_port(ws_port)
+        await asyncio.sleep(1.0)
+
+        for consumers in args.steps:
+            step = await run_step(f"ws://localhost:{http_port}/ws", f"ws://localhost:{ws_port}", consumers, args)
+            steps.append(step)
+            print(f"  ワーカー {workers}: {consumers}クライアント p99 {step['p99Ms']} ms")
+            if step["p99Ms"] is None or step["p99Ms"] > args.budget:
+                break
+            capacity = consumers
+    finally:
+        server.terminate()
+        try:
+            server.wait(5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    return {"workers": workers, "capacity": capacity, "steps": steps}
+
+async def run(args):
+    results = []
+    for workers in args.workers:
+        results.append(await run_workers(workers, args))
+
+    print(f"CPUコア数: {os.cpu_count()}  p99の上限: {args.budget} ms")
+    for result in results:
+        print(f"ワーカー {result['workers']}: 最大 {result['capacity']} クライアント")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="ワーカーモードの配信能力を計測")
+    parser.add_argument("--workers", default=None, help="計測するワーカー数（カンマ区切り。0は単一プロセス）")
+    parser.add_argument("--steps", default="50,100,200,400,800,1600", help="クライアント数の段階（カンマ区切り）")
+    parser.add_argument("--rate", type=float, default=60, help="1秒あたりの送信フレーム数")
+    parser.add_argument("--duration", type=float, default=5, help="1段階あたりの送信秒数")
+    parser.add_argument("--warmup", type=float, default=3, help="クライアントの接続を待つ秒数")
+    parser.add_argument("--drain", type=float, default=1, help="送信終了後に受信を待つ秒数")
+    parser.add_argument("--budget", type=float, default=50, help="許容するp99レイテンシ（ms）")
+    parser.add_argument("--client-processes", type=int, default=os.cpu_count() or 1, help="クライアントのプロセス数")
+    parser.add_argument("--output", help="結果を書き出すJSONファイル")
+    parser.add_argument("--consume", nargs=3, metavar=("URL", "COUNT", "SECONDS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.consume:
+        url, count, seconds = args.consume
+        print(json.dumps(asyncio.run(consume(url, int(count), float(seconds)))))
+        return
+
+    cores = os.cpu_count() or 1
+    if args.workers is None:
+        args.workers = [0] + [count for count in (1, 2, 4, 8, 16) if count <= cores]
+    else:
+        args.workers = [int(value) for value in args.workers.split(",")]
+    args.steps = [int(value) for value in args.steps.split(",")]
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
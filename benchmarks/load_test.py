@@ -0,0 +1,357 @@
+"""
+main.py のエンドツーエンド負荷試験
+
+main.py をサブプロセスとしてlocalhostで起動し、合成したゲームフレームを一定のレートで
+送信するプロデューサーと、N個のオーバーレイクライアントを接続する。
+受信から配信までのレイテンシ（p50 / p95 / p99）、スループット、サーバーのCPU使用率と
+RSSを計測し、結果をJSONで書き出す（バージョン間の比較用）。
+
+レイテンシの計測のため、プロデューサーはフレームの通し番号を player.damage に埋め込み、
+送信時刻を記録する。クライアントは受信したキーフレーム / パッチから通し番号を取り出して
+送信時刻との差を求める（同一プロセス内なので同じ時計で計測できる）。
+
+使い方:
+    python -m benchmarks.load_test --consumers 50 --rate 60 --duration 20 --output result.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+import websockets
+
+# psutilがあればCPU / RSSの計測に使用（無ければ/procを直接読む）
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# リポジトリのルート
+ROOT = Path(__file__).resolve().parent.parent
+
+# レジェンド名（合成データ用）
+LEGENDS = ("Wraith", "Bangalore", "Bloodhound", "Lifeline", "Pathfinder", "Octane", "Horizon", "Valkyrie")
+
+# チームの人数
+TEAM_SIZE = 3
+
+def free_port():
+    """空いているポート番号を取得"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+def percentile(values, fraction):
+    """ソート済みの値からパーセンタイルを取得"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+class SyntheticLobby:
+    """ロビー全体のプレイヤー状態から観戦中プレイヤーのフレームを合成する"""
+
+    def __init__(self, players=60, switch_every=120):
+        """
+        Parameters:
+            players (int): ロビーの人数（最大60）
+            switch_every (int): 観戦対象を切り替えるフレーム間隔
+        """
+        self.players = [
+            {
+                "name": f"Player{index:02d}",
+                "health": 100,
+                "maxHealth": 100,
+                "shields": 100,
+                "maxShields": 100,
+                "kills": 0,
+                "damage": 0,
+                "legendName": LEGENDS[index % len(LEGENDS)],
+                "position": {"x": 0.0, "y": 0.0, "z": 0.0}
+            }
+            for index in range(players)
+        ]
+        self.switch_every = switch_every
+        self.remaining_squads = (players + TEAM_SIZE - 1) // TEAM_SIZE
+
+    def frame(self, seq):
+        """
+        通し番号seqのフレームを生成
+
+        Parameters:
+            seq (int): フレームの通し番号（player.damageに埋め込む）
+
+        Returns:
+            dict: ゲームから届くスナップショット形式のフレーム
+        """
+        observed_index = (seq // self.switch_every * TEAM_SIZE) % len(self.players)
+        team_start = observed_index - observed_index % TEAM_SIZE
+
+        # 全プレイヤーの状態を少しずつ変化させる
+        for index, player in enumerate(self.players):
+            player["health"] = 100 - (seq + index) % 100
+            player["shields"] = (seq * 3 + index) % 101
+            position = player["position"]
+            player["position"] = {"x": position["x"] + 1.5, "y": position["y"] - 0.5, "z": position["z"]}
+
+        observed = dict(self.players[observed_index])
+        observed["damage"] = seq
+
+        if seq % 600 == 0 and self.remaining_squads > 1:
+            self.remaining_squads -= 1
+
+        return {
+            "gameState": "Playing",
+            "player": observed,
+            "squad": [
+                {key: value for key, value in member.items() if key not in ("kills", "damage", "position")}
+                for member in self.players[team_start:team_start + TEAM_SIZE]
+                if member is not self.players[observed_index]
+            ],
+            "match": {
+                "inProgress": True,
+                "squadEliminated": False,
+                "phase": seq // 1800,
+                "remainingTime": max(0, 180 - (seq // 60) % 180),
+                "remainingSquads": self.remaining_squads
+            }
+        }
+
+class ProcessSampler:
+    """サーバープロセスのCPU使用率とRSSを定期的に計測"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.process = psutil.Process(pid) if psutil is not None else None
+        self.samples = []
+        self.clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self):
+        """プロセスの累計CPU時間（秒）"""
+        if self.process is not None:
+            times = self.process.cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self.pid}/stat", "r") as f:
+            # comm に空白が含まれる場合があるので最後の ')' 以降を使う
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+
+    def rss_bytes(self):
+        """プロセスのRSS（バイト）"""
+        if self.process is not None:
+            return self.process.memory_info().rss
+        with open(f"/proc/{self.pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    async def run(self, interval=0.5):
+        """interval秒ごとに計測"""
+        previous_cpu = self.cpu_seconds()
+        previous_time = time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            cpu = self.cpu_seconds()
+            now = time.perf_counter()
+            self.samples.append({
+                "cpuPercent": (cpu - previous_cpu) / (now - previous_time) * 100,
+                "rss": self.rss_bytes()
+            })
+            previous_cpu, previous_time = cpu, now
+
+    def summary(self):
+        """計測結果の集計"""
+        if not self.samples:
+            return {"cpuPercentMean": None, "cpuPercentMax": None, "rssMbPeak": None}
+        cpu = [sample["cpuPercent"] for sample in self.samples]
+        return {
+            "cpuPercentMean": round(sum(cpu) / len(cpu), 1),
+            "cpuPercentMax": round(max(cpu), 1),
+            "rssMbPeak": round(max(sample["rss"] for sample in self.samples) / 1024 / 1024, 1)
+        }
+
+class Consumer:
+    """オーバーレイクライアントを模擬して受信レイテンシを記録する"""
+
+    def __init__(self, sent_times):
+        self.sent_times = sent_times
+        self.latencies = []
+        self.messages = 0
+        self.bytes = 0
+
+    def _observe(self, seq, received):
+        sent = self.sent_times.get(seq)
+        if sent is not None:
+            self.latencies.append(received - sent)
+
+    async def run(self, url, ready):
+        """接続して受信を続ける（キャンセルされるまで）"""
+        async with websockets.connect(url, max_size=None) as websocket:
+            await websocket.send(json.dumps({"type": "hello"}))
+            ready.set()
+            async for message in websocket:
+                received = time.perf_counter()
+                self.messages += 1
+                self.bytes += len(message)
+
+                data = json.loads(message)
+                if data.get("type") == "keyframe":
+                    seq = data.get("state", {}).get("player", {}).get("damage")
+                elif data.get("type") == "patch":
+                    seq = data.get("set", {}).get("player.damage")
+                else:
+                    seq = None
+
+                if seq is not None:
+                    self._observe(seq, received)
+
+async def produce(url, lobby, rate, duration, sent_times):
+    """
+    一定のレートでフレームを送信
+
+    Returns:
+        int: 送信したフレーム数
+    """
+    interval = 1.0 / rate
+    seq = 0
+    async with websockets.connect(url, max_size=None) as websocket:
+        start = time.perf_counter()
+        next_send = start
+        while time.perf_counter() - start < duration:
+            seq += 1
+            message = json.dumps(lobby.frame(seq))
+            sent_times[seq] = time.perf_counter()
+            await websocket.send(message)
+
+            # 送信が遅れた場合は追いつくまで待たずに送る
+            next_send += interval
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+    return seq
+
+async def wait_for_port(port, timeout=15.0):
+    """サーバーが接続を受け付けるまで待機"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("localhost", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"サーバーが起動しませんでした (port {port})")
+
+def git_revision():
+    """計測対象のリビジョン"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_load_test(args):
+    """負荷試験を実行して結果のdictを返す"""
+    ws_port = free_port()
+    http_port = free_port()
+    url = f"ws://localhost:{ws_port}"
+
+    server = subprocess.Popen(
+        [sys.executable, "main.py", "--ws-port", str(ws_port), "--http-port", str(http_port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    sampler_task = None
+    consumer_tasks = []
+    try:
+        await wait_for_port(ws_port)
+        sampler = ProcessSampler(server.pid)
+
+        # オーバーレイクライアントを接続
+        sent_times = {}
+        consumers = [Consumer(sent_times) for _ in range(args.consumers)]
+        ready_events = []
+        for consumer in consumers:
+            ready = asyncio.Event()
+            ready_events.append(ready)
+            consumer_tasks.append(asyncio.ensure_future(consumer.run(url, ready)))
+        await asyncio.wait_for(asyncio.gather(*(ready.wait() for ready in ready_events)), 15)
+
+        # 計測開始
+        sampler_task = asyncio.ensure_future(sampler.run())
+        lobby = SyntheticLobby(args.players)
+        start = time.perf_counter()
+        sent = await produce(url, lobby, args.rate, args.duration, sent_times)
+
+        # 送信し終えたフレームが届くのを待つ
+        await asyncio.sleep(args.drain)
+        elapsed = time.perf_counter() - start
+    finally:
+        for task in consumer_tasks + ([sampler_task] if sampler_task else []):
+            task.cancel()
+        await asyncio.gather(*consumer_tasks, *([sampler_task] if sampler_task else []), return_exceptions=True)
+        server.terminate()
+        try:
+            server.wait(5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    latencies = sorted(latency for consumer in consumers for latency in consumer.latencies)
+    received = sum(consumer.messages for consumer in consumers)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "consumers": args.consumers,
+            "players": args.players,
+            "rate": args.rate,
+            "duration": args.duration
+        },
+        "latencyMs": {
+            "samples": len(latencies),
+            "p50": to_ms(percentile(latencies, 0.50)),
+            "p95": to_ms(percentile(latencies, 0.95)),
+            "p99": to_ms(percentile(latencies, 0.99)),
+            "max": to_ms(latencies[-1] if latencies else None)
+        },
+        "throughput": {
+            "framesSent": sent,
+            "framesPerSecond": round(sent / args.duration, 1),
+            "messagesDelivered": received,
+            "messagesPerSecond": round(received / elapsed, 1),
+            "bytesDelivered": sum(consumer.bytes for consumer in consumers)
+        },
+        "server": sampler.summary()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="main.py のエンドツーエンド負荷試験")
+    parser.add_argument("--consumers", type=int, default=10, help="オーバーレイクライアント数")
+    parser.add_argument("--players", type=int, default=60, help="ロビーの人数（最大60）")
+    parser.add_argument("--rate", type=float, default=60, help="1秒あたりの送信フレーム数")
+    parser.add_argument("--duration", type=float, default=10, help="送信を続ける秒数")
+    parser.add_argument("--drain", type=float, default=1.0, help="送信終了後に受信を待つ秒数")
+    parser.add_argument("--output", help="結果を書き出すJSONファイル")
+    args = parser.parse_args()
+    args.players = max(TEAM_SIZE, min(60, args.players))
+
+    result = asyncio.run(run_load_test(args))
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+/**
+ * MessagePackのデコーダー（サーバーの配信メッセージに使う型のみ）
+ *
+ * websocket.jsより前に読み込むと、WebSocketManagerがMessagePackのサブプロトコルを要求する。
+ */
+const decodeMsgpack = (() => {
+    const textDecoder = new TextDecoder('utf-8');
+
+    class Reader {
+        constructor(buffer) {
+            this.bytes = new Uint8Array(buffer);
+            this.view = new DataView(this.bytes.buffer, this.bytes.byteOffset, this.bytes.byteLength);
+            this.offset = 0;
+        }
+
+        uint(size) {
+            const offset = this.offset;
+            this.offset += size;
+            switch (size) {
+                case 1: return this.view.getUint8(offset);
+                case 2: return this.view.getUint16(offset);
+                case 4: return this.view.getUint32(offset);
+                default: return Number(this.view.getBigUint64(offset));
+            }
+        }
+
+        int(size) {
+            const offset = this.offset;
+            this.offset += size;
+            switch (size) {
+                case 1: return this.view.getInt8(offset);
+                case 2: return this.view.getInt16(offset);
+                case 4: return this.view.getInt32(offset);
+                default: return Number(this.view.getBigInt64(offset));
+            }
+        }
+
+        str(length) {
+            const value = textDecoder.decode(this.bytes.subarray(this.offset, this.offset + length));
+            this.offset += length;
+            return value;
+        }
+
+        bin(length) {
+            const value = this.bytes.slice(this.offset, this.offset + length);
+            this.offset += length;
+            return value;
+        }
+
+        array(length) {
+            const items = new Array(length);
+            for (let i = 0; i < length; i++) {
+                items[i] = this.value();
+            }
+            return items;
+        }
+
+        map(length) {
+            const result = {};
+            for (let i = 0; i < length; i++) {
+                const key = this.value();
+                result[key] = this.value();
+            }
+            return result;
+        }
+
+        value() {
+            const code = this.uint(1);
+
+            if (code < 0x80) return code;
+            if (code >= 0xe0) return code - 0x100;
+            if (code >= 0xa0 && code <= 0xbf) return this.str(code & 0x1f);
+            if (code >= 0x90 && code <= 0x9f) return this.array(code & 0x0f);
+            if (code >= 0x80 && code <= 0x8f) return this.map(code & 0x0f);
+
+            switch (code) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: return this.bin(this.uint(1));
+                case 0xc5: return this.bin(this.uint(2));
+                case 0xc6: return this.bin(this.uint(4));
+                case 0xca: { const v = this.view.getFloat32(this.offset); this.offset += 4; return v; }
+                case 0xcb: { const v = this.view.getFloat64(this.offset); this.offset += 8; return v; }
+                case 0xcc: return this.uint(1);
+                case 0xcd: return this.uint(2);
+                case 0xce: return this.uint(4);
+                case 0xcf: return this.uint(8);
+                case 0xd0: return this.int(1);
+                case 0xd1: return this.int(2);
+                case 0xd2: return this.int(4);
+                case 0xd3: return this.int(8);
+                case 0xd9: return this.str(this.uint(1));
+                case 0xda: return this.str(this.uint(2));
+                case 0xdb: return this.str(this.uint(4));
+                case 0xdc: return this.array(this.uint(2));
+                case 0xdd: return this.array(this.uint(4));
+                case 0xde: return this.map(this.uint(2));
+                case 0xdf: return this.map(this.uint(4));
+                default:
+                    throw new Error(`未対応のMessagePackの型です: 0x${code.toString(16)}`);
+            }
+        }
+    }
+
+    /**
+     * MessagePackのバイト列をデコード
+     *
+     * @param {ArrayBuffer|Uint8Array} buffer
+     */
+    return (buffer) => new Reader(buffer).value();
+})();
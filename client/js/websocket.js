@@ -1,6 +1,12 @@
 /**
  * WebSocket接続を管理するモジュール
  */
+
+// サーバーに要求するサブプロトコル（msgpack.jsが読み込まれていればMessagePackを優先）
+const WS_SUBPROTOCOLS = typeof decodeMsgpack === 'function'
+    ? ['apex-overlay.msgpack', 'apex-overlay.json']
+    : ['apex-overlay.json'];
+
 class WebSocketManager {
     constructor(url) {
         this.url = url;
@@ -9,8 +15,16 @@ class WebSocketManager {
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 5;
         this.reconnectDelay = 3000; // ms
+        
+        // 差分ストリームの状態（"チャンネル名" または "チャンネル名/トピック名" -> { state, seq, resyncRequested }）
+        this.streams = {};
+        
+        // サーバーから配信されたオーバーレイ設定とそのバージョン
+        this.overlaySettings = null;
+        this.settingsVersion = 0;
         this.eventHandlers = {
             'message': [],
+            'settings': [],
             'connect': [],
             'disconnect': [],
             'error': []
@@ -21,7 +35,8 @@ class WebSocketManager {
      * WebSocketサーバーに接続
      */
     connect() {
-        this.socket = new WebSocket(this.url);
+        this.socket = new WebSocket(this.url, WS_SUBPROTOCOLS);
+        this.socket.binaryType = 'arraybuffer';
         
         this.socket.onopen = () => {
             console.log('WebSocketサーバーに接続しました');
@@ -44,8 +59,14 @@ class WebSocketManager {
         
         this.socket.onmessage = (event) => {
             try {
-                const data = JSON.parse(event.data);
-                this._triggerEvent('message', data);
+                // MessagePackのサブプロトコルではバイナリフレームで届く（制御メッセージの送信はJSONのまま）
+                const message = typeof event.data === 'string'
+                    ? JSON.parse(event.data)
+                    : decodeMsgpack(event.data);
+                const data = this._applyStreamMessage(message);
+                if (data) {
+                    this._triggerEvent('message', data);
+                }
             } catch (error) {
                 console.error('メッセージの解析に失敗しました:', error);
             }
@@ -73,6 +94,30 @@ class WebSocketManager {
         }
     }
 
+    /**
+     * チャンネル・トピックを購読（購読したチャンネルのキーフレームが届く）
+     * topicsを指定した場合はそのトピック（'player'、'squad'、'match'、'gameState' など）だけを受け取る
+     */
+    subscribe(channels, topics) {
+        const message = { type: 'subscribe', channels: channels };
+        if (topics !== undefined) {
+            message.topics = topics;
+        }
+        this.send(message);
+    }
+
+    /**
+     * チャンネルの購読を解除
+     */
+    unsubscribe(channels) {
+        this.send({ type: 'unsubscribe', channels: channels });
+        Object.keys(this.streams).forEach(key => {
+            if (channels.includes(key.split('/')[0])) {
+                delete this.streams[key];
+            }
+        });
+    }
+
     /**
      * 接続を閉じる
      */
@@ -99,6 +144,119 @@ class WebSocketManager {
         }
     }
 
+    /**
+     * キーフレーム/パッチを適用して現在の状態全体を返す
+     * （シーケンス番号が飛んだ場合は再同期を要求してnullを返す）
+     */
+    _applyStreamMessage(data) {
+        // 設定の変更は 'settings' イベントとして通知（ゲームデータとしては扱わない）
+        if (data.type === 'settings') {
+            this._applySettingsMessage(data);
+            return null;
+        }
+        
+        const channel = data.channel || 'default';
+        const key = data.topic ? `${channel}/${data.topic}` : channel;
+        if (!this.streams[key]) {
+            this.streams[key] = { state: null, seq: 0, resyncRequested: false };
+        }
+        const stream = this.streams[key];
+        
+        if (data.type === 'keyframe') {
+            stream.state = data.state;
+            stream.seq = data.seq;
+            stream.resyncRequested = false;
+            return data.topic ? this._mergeTopicStates(channel) : stream.state;
+        }
+        
+        if (data.type !== 'patch') {
+            return data;
+        }
+        
+        if (!stream.state || data.seq !== stream.seq + 1) {
+            stream.state = null;
+            if (!stream.resyncRequested) {
+                stream.resyncRequested = true;
+                this.send({ type: 'resync', channel: channel, topic: data.topic });
+            }
+            return null;
+        }
+        
+        this._applyPatch(stream.state, data);
+        
+        stream.seq = data.seq;
+        return data.topic ? this._mergeTopicStates(channel) : stream.state;
+    }
+
+    /**
+     * トピックごとに受け取ったチャンネルの状態をまとめる
+     */
+    _mergeTopicStates(channel) {
+        const merged = {};
+        Object.entries(this.streams).forEach(([key, stream]) => {
+            if (key.startsWith(`${channel}/`) && stream.state) {
+                Object.assign(merged, stream.state);
+            }
+        });
+        return merged;
+    }
+
+    /**
+     * 設定の配信メッセージを適用して 'settings' イベントを発生させる
+     * （バージョンが飛んだ場合は設定を取得し直す）
+     */
+    async _applySettingsMessage(data) {
+        if (data.overlay) {
+            this.overlaySettings = data.overlay;
+        } else if (this.overlaySettings && data.version === this.settingsVersion + 1) {
+            this._applyPatch(this.overlaySettings, data);
+        } else {
+            try {
+                const response = await fetch('/api/settings');
+                const result = await response.json();
+                if (!result.success) {
+                    return;
+                }
+                this.overlaySettings = result.settings.overlay;
+            } catch (error) {
+                console.error('設定の取得に失敗しました:', error);
+                return;
+            }
+        }
+        this.settingsVersion = data.version;
+        this._triggerEvent('settings', this.overlaySettings);
+    }
+
+    /**
+     * パッチ（set / del）を状態に適用
+     */
+    _applyPatch(state, data) {
+        // 変更されたパスの値を更新
+        Object.entries(data.set || {}).forEach(([path, value]) => {
+            const keys = path.split('.');
+            let target = state;
+            for (let i = 0; i < keys.length - 1; i++) {
+                if (target[keys[i]] === undefined || target[keys[i]] === null) {
+                    target[keys[i]] = {};
+                }
+                target = target[keys[i]];
+            }
+            target[keys[keys.length - 1]] = value;
+        });
+        
+        // 削除されたパスを取り除く
+        (data.del || []).forEach(path => {
+            const keys = path.split('.');
+            let target = state;
+            for (let i = 0; i < keys.length - 1 && target; i++) {
+                target = target[keys[i]];
+            }
+            if (target) {
+                delete target[keys[keys.length - 1]];
+            }
+        });
+    }
+
     /**
      * イベントハンドラーを実行
      */
@@ -109,5 +267,9 @@ class WebSocketManager {
     }
 }
 
-// WebSocketマネージャーのインスタンスを作成
-const wsManager = new WebSocketManager('ws://localhost:8765');
\ No newline at end of file
+// WebSocketマネージャーのインスタンスを作成（HTTPで配信されている場合は同じポートの /ws に接続）
+const wsManager = new WebSocketManager(
+    location.protocol.startsWith('http')
+        ? `${location.protocol === 'https:' ? 'wss:' : 'ws:'}//${location.host}/ws`
+        : 'ws://localhost:8765'
+);
\ No newline at end of file
@@ -1,7 +1,49 @@
-// WebSocket接続
-const socket = new WebSocket('ws://localhost:8765');
+// サーバーに要求するサブプロトコル（js/msgpack.jsが読み込まれていればMessagePackを優先）
+const OVERLAY_SUBPROTOCOLS = typeof decodeMsgpack === 'function'
+    ? ['apex-overlay.msgpack', 'apex-overlay.json']
+    : ['apex-overlay.json'];
+
+// WebSocket接続（HTTPと同じポートの /ws に接続）
+const socket = openOverlaySocket(overlayWebSocketUrl());
 const statusEl = document.getElementById('status');
 
+/**
+ * オーバーレイを配信しているサーバーのWebSocket URLを取得
+ * （ファイルとして直接開いた場合は従来のポートに接続）
+ * ページのURLの ?channel=lobby1 / ?topics=match,squad はそのまま購読の指定として渡す
+ */
+function overlayWebSocketUrl() {
+    const params = new URLSearchParams(location.search);
+    const forwarded = new URLSearchParams();
+    ['channel', 'topics'].forEach(name => {
+        if (params.get(name)) {
+            forwarded.set(name, params.get(name));
+        }
+    });
+    const query = forwarded.toString() ? `?${forwarded}` : '';
+    if (location.protocol === 'http:' || location.protocol === 'https:') {
+        const scheme = location.protocol === 'https:' ? 'wss:' : 'ws:';
+        return `${scheme}//${location.host}/ws${query}`;
+    }
+    return `ws://localhost:8765/${query}`;
+}
+
+/**
+ * 配信を受け取るWebSocketを開く（MessagePackのバイナリフレームはArrayBufferで受け取る）
+ */
+function openOverlaySocket(url) {
+    const ws = new WebSocket(url, OVERLAY_SUBPROTOCOLS);
+    ws.binaryType = 'arraybuffer';
+    return ws;
+}
+
+/**
+ * 受信したフレームをデコード（テキストはJSON、バイナリはMessagePack）
+ */
+function decodeOverlayMessage(data) {
+    return typeof data === 'string' ? JSON.parse(data) : decodeMsgpack(data);
+}
+
 // プレイヤー要素
 const matchStatusEl = document.getElementById('match-status');
 const remainingSquadsEl = document.getElementById('remaining-squads');
@@ -15,6 +57,118 @@ const killsValueEl = document.getElementById('kills-value');
 const damageValueEl = document.getElementById('damage-value');
 const squadMembersEl = document.getElementById('squad-members');
 
+/**
+ * パッチ（set / del）を状態に適用
+ */
+function applyPatch(state, data) {
+    // 変更されたパスの値を更新
+    Object.entries(data.set || {}).forEach(([path, value]) => {
+        const keys = path.split('.');
+        let target = state;
+        for (let i = 0; i < keys.length - 1; i++) {
+            if (target[keys[i]] === undefined || target[keys[i]] === null) {
+                target[keys[i]] = {};
+            }
+            target = target[keys[i]];
+        }
+        target[keys[keys.length - 1]] = value;
+    });
+    
+    // 削除されたパスを取り除く
+    (data.del || []).forEach(path => {
+        const keys = path.split('.');
+        let target = state;
+        for (let i = 0; i < keys.length - 1 && target; i++) {
+            target = target[keys[i]];
+        }
+        if (target) {
+            delete target[keys[keys.length - 1]];
+        }
+    });
+}
+
+// サーバーから配信されたオーバーレイ設定とそのバージョン
+let overlaySettings = null;
+let overlaySettingsVersion = 0;
+
+/**
+ * 設定の配信メッセージを適用
+ * （全体または差分。バージョンが飛んだ場合は設定を取得し直す）
+ */
+async function applySettingsMessage(data) {
+    if (data.overlay) {
+        overlaySettings = data.overlay;
+    } else if (overlaySettings && data.version === overlaySettingsVersion + 1) {
+        applyPatch(overlaySettings, data);
+    } else {
+        overlaySettings = await loadSettings();
+        if (!overlaySettings) {
+            return;
+        }
+    }
+    overlaySettingsVersion = data.version;
+    applySettings(overlaySettings);
+}
+
+/**
+ * トピックごとに受け取ったチャンネルの状態をまとめる
+ */
+function mergeTopicStates(streams, channel) {
+    const merged = {};
+    Object.entries(streams).forEach(([key, stream]) => {
+        if (key.startsWith(`${channel}/`) && stream.state) {
+            Object.assign(merged, stream.state);
+        }
+    });
+    return merged;
+}
+
+/**
+ * キーフレーム/パッチを適用して現在の状態全体を返す
+ * （状態は接続・チャンネル・トピックごとに保持し、シーケンス番号が飛んだ場合は再同期を要求してnullを返す）
+ */
+function applyStreamMessage(data, ws) {
+    // 設定の変更はその場で反映（ゲームデータとしては扱わない）
+    if (data.type === 'settings') {
+        applySettingsMessage(data);
+        return null;
+    }
+    
+    if (!ws.streams) {
+        ws.streams = {};
+    }
+    const channel = data.channel || 'default';
+    const key = data.topic ? `${channel}/${data.topic}` : channel;
+    if (!ws.streams[key]) {
+        ws.streams[key] = { state: null, seq: 0, resyncRequested: false };
+    }
+    const stream = ws.streams[key];
+    
+    if (data.type === 'keyframe') {
+        stream.state = data.state;
+        stream.seq = data.seq;
+        stream.resyncRequested = false;
+        return data.topic ? mergeTopicStates(ws.streams, channel) : stream.state;
+    }
+    
+    if (data.type !== 'patch') {
+        return data;
+    }
+    
+    if (!stream.state || data.seq !== stream.seq + 1) {
+        stream.state = null;
+        if (!stream.resyncRequested) {
+            stream.resyncRequested = true;
+            ws.send(JSON.stringify({ type: 'resync', channel: channel, topic: data.topic }));
+        }
+        return null;
+    }
+    
+    applyPatch(stream.state, data);
+    stream.seq = data.seq;
+    return data.topic ? mergeTopicStates(ws.streams, channel) : stream.state;
+}
+
 // 接続イベント
 socket.onopen = function() {
     statusEl.textContent = '接続しました';
@@ -40,7 +194,10 @@ socket.onerror = function(error) {
 // メッセージ受信イベント
 socket.onmessage = function(event) {
     try {
-        const data = JSON.parse(event.data);
+        const data = applyStreamMessage(decodeOverlayMessage(event.data), socket);
+        if (!data) {
+            return;
+        }
         
         // ゲーム状態の更新
         if (data.gameState) {
@@ -257,12 +414,12 @@ async function connectWebSocket() {
         console.error('設定の読み込みに失敗しました:', error);
     }
     
-    // WebSocket接続の設定
+    // WebSocket接続の設定（HTTPで配信されている場合は同じポートの /ws）
     const host = settings?.websocket?.host || 'localhost';
     const port = settings?.websocket?.port || 7777;
-    const wsUrl = `ws://${host}:${port}`;
+    const wsUrl = location.protocol.startsWith('http') ? overlayWebSocketUrl() : `ws://${host}:${port}`;
     
-    const socket = new WebSocket(wsUrl);
+    const socket = openOverlaySocket(wsUrl);
     const statusEl = document.getElementById('status');
     
     // プレイヤー要素
@@ -306,7 +463,10 @@ async function connectWebSocket() {
     // メッセージ受信イベント
     socket.onmessage = function(event) {
         try {
-            const data = JSON.parse(event.data);
+            const data = applyStreamMessage(decodeOverlayMessage(event.data), socket);
+            if (!data) {
+                return;
+            }
             
             // ゲーム状態の更新
             if (data.gameState) {
@@ -210,8 +210,12 @@ function saveSettings() {
     });
 }
 
+// 表示中の名前オーバーライド（追加・削除の結果を反映する）
+let currentNameOverrides = {};
+
 // 名前オーバーライドの表示
 function loadNameOverrides(overrides = {}) {
+    currentNameOverrides = { ...overrides };
     const listContainer = document.getElementById('name-override-list');
     listContainer.innerHTML = '';
     
@@ -259,8 +263,8 @@ function addNameOverride() {
             document.getElementById('player-id').value = '';
             document.getElementById('display-name').value = '';
             
-            // 名前オーバーライドリストを更新
-            loadNameOverrides(result.overrides);
+            // 追加した1件だけをリストに反映
+            loadNameOverrides({ ...currentNameOverrides, [result.playerId]: result.displayName });
         } else {
             alert('名前オーバーライドの追加に失敗しました: ' + result.message);
         }
@@ -285,8 +289,10 @@ function deleteNameOverride(playerId) {
     .then(response => response.json())
     .then(result => {
         if (result.success) {
-            // 名前オーバーライドリストを更新
-            loadNameOverrides(result.overrides);
+            // 削除した1件だけをリストから取り除く
+            const overrides = { ...currentNameOverrides };
+            delete overrides[result.playerId];
+            loadNameOverrides(overrides);
         } else {
             alert('名前オーバーライドの削除に失敗しました: ' + result.message);
         }
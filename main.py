@@ -1,139 +1,641 @@
+import argparse
 import asyncio
 import websockets
-import http.server
-import socketserver
-import threading
 import os
-import json
+import shutil
+import signal
+import sys
+import tempfile
+from datetime import datetime
+from urllib.parse import parse_qs
+from time import perf_counter_ns
 from pathlib import Path
-from apex_api import ApexAPI
-from simple_settings import load_settings, save_settings
+from utils.settings import SettingsManager
 from simple_name_override import SimpleNameOverride
+from server import codec
+from server.broadcast_hub import BroadcastHub, is_game_frame, DEFAULT_QUEUE_SIZE
+from server.liveapi_proto import is_protobuf_frame, decode_event
+from server.conflation import DEFAULT_TICK_RATE
+from server.channels import (
+    ChannelRouter, DEFAULT_CHANNEL, parse_channels, parse_topics, parse_query_topics, is_valid_channel
+)
+from server.recorder import MatchRecorder, MatchReader, replay, SNAPSHOT_TYPE
+from server.analytics import AnalyticsStore
+from server.log_tail import LogTail, DEFAULT_PATTERN
+from server.api_routes import init_api_routes, handle_api_request, PROMETHEUS_CONTENT_TYPE
+from server.async_http import serve, deflate_extensions, response as http_response
+from server.static_cache import StaticCache
+from server.settings_push import SettingsPublisher
+from server.workers import IngestBus, WorkerFanout
+from utils.file_watcher import FileWatcher
+from utils.apex_config import get_apex_liveapi_path
+from utils.logger import get_logger, get_level, setup_logger, set_level, frame_logger
+from utils.metrics import (
+    metrics, timing_sampler, RECEIVE_SECONDS, DECODE_SECONDS, PROCESS_SECONDS, ERRORS
+)
+
+# ロガーの取得
+logger = get_logger()
 
 # クライアント接続を保持するセット
 connected_clients = set()
 
-# 設定を読み込み
-settings = load_settings()
+# 設定を読み込み（settingsは起動時点のスナップショット）
+settings_manager = SettingsManager()
+settings = settings_manager.settings
+
+# ゲームからの入力をオーバーレイへ配信するハブ
+hub = BroadcastHub(settings.get("websocket", {}).get("sendQueueSize", DEFAULT_QUEUE_SIZE))
+
+# オーバーレイ設定の変更の配信
+settings_publisher = SettingsPublisher(settings_manager, hub.publish)
 
-# ApexAPIのインスタンス
-apex_api = ApexAPI()
+# マッチ（オブザーバー）ごとのチャンネル（処理状態を分離し、購読者だけに差分を配信）
+router = ChannelRouter(hub.send_to, settings.get("stream", {}).get("tickRate", DEFAULT_TICK_RATE))
+
+# 処理時間を計測するフレームを間引く
+should_time = timing_sampler()
+
+# 接続数・キューの状態のメトリクス
+metrics.gauge("connected_clients", "接続中のクライアント数", lambda: len(connected_clients))
+metrics.gauge("producers", "ゲーム側の接続数", lambda: len(hub.producers))
+metrics.gauge("consumers", "オーバーレイ側の接続数", lambda: len(hub.consumers))
+metrics.gauge("queue_depth", "全送信キューに積まれたフレーム数", lambda: sum(len(c.queue) for c in hub.consumers.values()))
+metrics.gauge("queue_depth_max", "最も深い送信キューのフレーム数", lambda: max((len(c.queue) for c in hub.consumers.values()), default=0))
+metrics.gauge("channels", "チャンネル数", lambda: len(router.channels))
+metrics.counter("dropped_frames_total", "送信キューが満杯で破棄したフレーム数", lambda: hub.get_stats()["dropped"])
+metrics.counter("log_suppressed_total", "間引いたフレーム単位のログの件数", lambda: frame_logger.suppressed)
 
 # Name Override Toolのインスタンス
 name_override = SimpleNameOverride()
 
+def apply_logging_settings(current):
+    """ログの設定（レベル・フレーム単位のログの間引き）を反映（正しくない値は警告を出して無視する）"""
+    logging_settings = current.get("logging", {})
+    if not isinstance(logging_settings, dict):
+        logging_settings = {}
+    level = logging_settings.get("level", "INFO")
+    setup_logger(level)
+    if not set_level(level):
+        # 起動時はデフォルトのレベル、実行中は現在のレベルのまま
+        if get_level() == "NOTSET":
+            set_level("INFO")
+        logger.warning(f"不明なログレベルのため設定を無視しました: {level!r}")
+    frame_logger.configure(
+        logging_settings.get("frameSampleEvery"),
+        logging_settings.get("frameRateLimit"),
+        logging_settings.get("frameSampleOverrides")
+    )
+
+def on_logging_change(old, new):
+    """設定の変更通知（ログの設定が変わった場合のみ反映）"""
+    if old.get("logging") != new.get("logging"):
+        apply_logging_settings(new)
+
+def match_stats(name):
+    """チャンネルのマッチの統計（/api/stats用。チャンネルがなければNone）"""
+    channel = router.channels.get(name or DEFAULT_CHANNEL)
+    return channel.api.stats.to_dict() if channel is not None else None
+
+def match_events(name):
+    """チャンネルの直近のイベント（/api/events用。チャンネルがなければNone）"""
+    channel = router.channels.get(name or DEFAULT_CHANNEL)
+    return channel.api.events if channel is not None else None
+
+# マッチをまたいだ分析ストア（CLIで取り込んだ記録もAPIから集計できるよう常に読み込む）
+analytics_store = AnalyticsStore(settings.get("analytics", {}).get("directory", "analytics"))
+
+# 終了したマッチを分析ストアに取り込むかどうか
+analytics_enabled = settings.get("analytics", {}).get("enabled", False)
+
+# APIルートの初期化
+init_api_routes(settings_manager, name_override, match_stats, analytics_store, match_events)
+
+# オーバーレイの静的ファイル（起動時にメモリへ読み込む）
+static_cache = StaticCache("client")
+
+# 受信フレームを記録するディレクトリ（記録が有効な場合のみ）
+recording_directory = None
+
+def start_recording(channel):
+    """チャンネルの受信フレームの記録を開始"""
+    name = None if channel.name == DEFAULT_CHANNEL else channel.name
+    channel.recorder = MatchRecorder.create(recording_directory, name)
+    print(f"受信したフレームを記録します: {channel.recorder.path}")
+
+def ingest_frame(message, data=None, record=True, timed=False, channel=None):
+    """
+    ゲームからの1フレームを処理して配信に回す（WebSocket受信と記録の再生で共通）
+    
+    Parameters:
+        message (str | bytes): 受信した生のメッセージ
+        data (dict): デコード済みのデータ（受信時にデコード済みの場合。protobufフレームはイベントのdict）
+        record (bool): 記録が有効な場合に記録するかどうか
+        timed (bool): 各段階の処理時間を計測するかどうか
+        channel (Channel): フレームを処理するチャンネル（省略時はデフォルト）
+    """
+    if channel is None:
+        channel = router.get(DEFAULT_CHANNEL)
+    if timed:
+        started = perf_counter_ns()
+    protobuf = is_protobuf_frame(message)
+    if data is None:
+        # LiveAPIのprotobufフレームはJSONを経由せずにイベントをデコード
+        data = decode_event(message) if protobuf else codec.decode(message)
+        if timed:
+            DECODE_SECONDS.observe_ns(perf_counter_ns() - started)
+    if protobuf:
+        event_type = data.get("category") or "unknown"
+    else:
+        event_type = data.get("category") or SNAPSHOT_TYPE
+    
+    if record and channel.recorder is not None:
+        channel.recorder.record(message, event_type)
+    
+    # APEXデータの処理（LiveAPIのイベント形式とスナップショット形式）
+    if timed:
+        started = perf_counter_ns()
+    if event_type == SNAPSHOT_TYPE:
+        processed_data = channel.api.process_data(data)
+    else:
+        processed_data = channel.api.apply_event(data)
+    if timed:
+        PROCESS_SECONDS.observe_ns(perf_counter_ns() - started)
+    
+    # 状態に影響しないイベント
+    if processed_data is None:
+        return
+    
+    # エラーはそのまま配信
+    if processed_data.get("type") == "error":
+        ERRORS.inc()
+        channel.publish(codec.OutgoingMessage(processed_data))
+        return
+    
+    # ティックごとにまとめて差分を配信
+    channel.conflator.submit(processed_data)
+    
+    # 終了したマッチの統計を分析ストアに取り込む（ファイルへの書き込みはスレッドで行う）
+    if event_type == "matchStateEnd" and analytics_enabled:
+        name = f"{channel.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if analytics_store.add_match(channel.api.stats, name, save=False):
+            analytics_store.save_in_background()
+
+def handle_control(websocket, data):
+    """
+    オーバーレイからの制御メッセージを処理
+    
+    Parameters:
+        websocket: 送信元の接続
+        data (dict): デコード済みのメッセージ
+    """
+    message_type = data.get("type")
+    
+    # チャンネル・トピックの購読（購読の内容が変わったチャンネルのキーフレームを返す）
+    # {"type": "subscribe", "channels": [...], "topics": ["match", "squad"]}
+    if message_type == "subscribe":
+        if "topics" in data:
+            for channel in router.set_topics(websocket, parse_topics(data["topics"])):
+                send_keyframe(websocket, channel)
+        for channel in router.subscribe(websocket, data.get("channels", [])):
+            send_keyframe(websocket, channel)
+    
+    # チャンネルの購読解除
+    elif message_type == "unsubscribe":
+        router.unsubscribe(websocket, data.get("channels", []))
+    
+    # 再同期リクエストにはキーフレームを返す（チャンネル・トピックの指定がなければ購読中のすべて）
+    elif message_type == "resync":
+        name = data.get("channel")
+        topic = data.get("topic")
+        for channel in router.subscribed_channels(websocket):
+            if name is None or channel.name == name:
+                send_keyframe(websocket, channel, topic)
+
+def send_keyframe(websocket, channel, topic=None):
+    """チャンネルの状態（購読しているトピックのみ）をオーバーレイに送信"""
+    topics = router.topics.get(websocket)
+    if topic is not None and topics is not None and topic in topics:
+        topics = (topic,)
+    for keyframe in channel.keyframe_messages(topics):
+        hub.send_to(websocket, keyframe)
+
 # WebSocketハンドラー
 async def handle_client(websocket, path):
-    print(f"クライアント接続: {websocket.remote_address}")
+    logger.info(f"クライアント接続: {websocket.remote_address}")
     connected_clients.add(websocket)
     
+    # 接続パスのクエリで指定されたチャンネル（"/ws?channel=lobby1,lobby2"）
+    # ゲーム接続は最初のチャンネルにデータを送り、オーバーレイはすべてを購読する
+    channels = parse_channels(path)
+    channel = None
+    
+    # 購読するトピック（"/ws?topics=match,squad"。指定がなければすべて）
+    router.set_topics(websocket, parse_query_topics(path))
+    
+    # 最初はオーバーレイとして登録し、ゲームデータを送ってきた時点でゲーム接続に切り替える
+    hub.add_consumer(websocket)
+    
+    # 接続直後に現在のオーバーレイ設定と各チャンネルの状態全体を送信
+    hub.send_to(websocket, settings_publisher.snapshot_message())
+    for subscribed in router.subscribe(websocket, channels):
+        send_keyframe(websocket, subscribed)
+    
     try:
         async for message in websocket:
-            print(f"メッセージ受信: {message}")
+            timed = should_time()
+            if timed:
+                received = perf_counter_ns()
             try:
-                # JSONデータの処理
-                data = json.loads(message)
+                if is_protobuf_frame(message):
+                    # ゲーム接続に切り替える前にデコードする（デコードできないフレームでは切り替えない）
+                    data = decode_event(message)
+                    if timed:
+                        DECODE_SECONDS.observe_ns(perf_counter_ns() - received)
+                    frame_logger.log("protobuf", "メッセージ受信: %s", message)
+                else:
+                    data = codec.decode(message)
+                    if timed:
+                        DECODE_SECONDS.observe_ns(perf_counter_ns() - received)
+                    
+                    # オーバーレイからの制御メッセージ（helloなど）は配信しない
+                    if not is_game_frame(data):
+                        frame_logger.log("control", "メッセージ受信: %s", message)
+                        if isinstance(data, dict) and channel is None:
+                            handle_control(websocket, data)
+                        continue
+                    frame_logger.log(data.get("category") or SNAPSHOT_TYPE, "メッセージ受信: %s", message)
                 
-                # APEXデータの処理
-                processed_data = apex_api.process_data(data)
-                
-                # クライアントに送信
-                await websocket.send(json.dumps(processed_data))
+                if channel is None:
+                    # チャンネルを作成できない場合（上限）はゲーム接続に切り替えない
+                    producing = router.set_producer(websocket, channels[0])
+                    await hub.promote_to_producer(websocket)
+                    channel = producing
+                ingest_frame(message, data, timed=timed, channel=channel)
+                if timed:
+                    RECEIVE_SECONDS.observe_ns(perf_counter_ns() - received)
             except Exception as e:
-                print(f"エラー: {e}")
+                ERRORS.inc()
+                logger.error(f"エラー: {e}")
                 error_response = {
                     "type": "error",
                     "message": str(e)
                 }
-                await websocket.send(json.dumps(error_response))
+                if hub.is_producer(websocket):
+                    await websocket.send(codec.encode_text(error_response))
+                else:
+                    hub.send_to(websocket, codec.OutgoingMessage(error_response))
     
     except websockets.exceptions.ConnectionClosed:
-        print("クライアント切断")
+        pass
     finally:
+        logger.info(f"クライアント切断: {websocket.remote_address}")
         connected_clients.remove(websocket)
+        router.remove(websocket)
+        await hub.remove(websocket)
 
-# HTTPサーバーハンドラー
-class SimpleHTTPHandler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory="client", **kwargs)
-    
-    def log_message(self, format, *args):
-        print(format % args)
-    
-    def do_GET(self):
-        # 設定ファイルへのリクエスト
-        if self.path == '/settings.json':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(settings).encode())
-            return
-        
-        # その他のリクエスト
-        return super().do_GET()
-    
-    def do_POST(self):
-        # 設定保存リクエスト
-        if self.path == '/save-settings':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length).decode('utf-8')
-            
+# /api/state のlong-pollで待つ時間（秒）のデフォルトと上限
+STATE_POLL_TIMEOUT = 25
+STATE_POLL_MAX_TIMEOUT = 60
+
+# ワーカープロセスとして動作しているかどうか（ワーカーはチャンネルの状態を持たない）
+is_worker = False
+
+async def handle_state_request(request):
+    """
+    最新の状態を返す（/api/state?channel=<名前>&since=<バージョン>&topics=<トピック>&timeout=<秒>）
+    
+    sinceを指定した場合は、それより新しい状態があればすぐに、なければ届くまで
+    （timeoutまで）待ってから返す。タイムアウトした場合は "changed": false を返す。
+    """
+    if is_worker:
+        return http_response(200, codec.encode({
+            'success': False,
+            'message': 'ワーカーでは状態を取得できません。ゲーム用のポートの /api/state を使用してください。'
+        }), 'application/json')
+    
+    query = parse_qs(request.query)
+    name = query.get('channel', [DEFAULT_CHANNEL])[0]
+    if not is_valid_channel(name):
+        return http_response(400, 'Invalid channel')
+    try:
+        since = int(query['since'][0]) if 'since' in query else None
+        timeout = float(query.get('timeout', [STATE_POLL_TIMEOUT])[0])
+    except ValueError:
+        return http_response(400, 'Invalid since / timeout')
+    timeout = min(max(timeout, 0), STATE_POLL_MAX_TIMEOUT)
+    topics = parse_topics(",".join(query.get('topics', [])))
+    
+    # チャンネルはデータを送る側の登録時にだけ作成する（存在しないチャンネルは作成しない）
+    channel = router.channels.get(name)
+    if channel is None:
+        return http_response(404, 'Channel not found')
+    changed = await channel.wait_for_state(since, timeout)
+    result = channel.state_snapshot(topics) if changed else {"channel": name, "version": channel.stream.seq}
+    return http_response(200, codec.encode({'success': True, 'changed': changed, **result}), 'application/json')
+
+# HTTPリクエストの処理（WebSocketと同じイベントループ・同じポートで処理する）
+async def handle_http(request):
+    """
+    HTTPリクエストを処理
+    
+    Parameters:
+        request (HTTPRequest): 受信したリクエスト
+    
+    Returns:
+        tuple: (ステータスコード, ヘッダー, ボディ)
+    """
+    # 最新の状態（long-poll）
+    if request.path == '/api/state' and request.method == 'GET':
+        return await handle_state_request(request)
+    
+    # APIリクエスト
+    if request.path.startswith('/api/'):
+        if request.method == 'POST':
             try:
-                new_settings = json.loads(post_data)
-                save_settings(new_settings)
-                
-                # レスポンス
-                self.send_response(200)
-                self.send_header('Content-Type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(b'OK')
-            except Exception as e:
-                self.send_response(500)
-                self.send_header('Content-Type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(str(e).encode())
-            
-            return
+                request_data = codec.decode(request.body)
+            except ValueError:
+                return http_response(400, 'Invalid JSON')
+            result = handle_api_request(request.path, request_data)
+        else:
+            result = handle_api_request(request.path)
         
-        # その他のPOSTリクエスト
-        self.send_error(404)
+        # Prometheusのメトリクスのみテキスト形式
+        if isinstance(result, str):
+            return http_response(200, result, PROMETHEUS_CONTENT_TYPE)
+        return http_response(200, codec.encode(result), 'application/json')
+    
+    # 設定ファイルへのリクエスト（現在のスナップショット）
+    if request.path == '/settings.json' and request.method in ('GET', 'HEAD'):
+        return http_response(200, codec.encode(settings_manager.settings), 'application/json')
+    
+    # 設定保存リクエスト（書き込みはまとめてバックグラウンドで行う）
+    if request.path == '/save-settings' and request.method == 'POST':
+        try:
+            new_settings = codec.decode(request.body)
+            settings_manager.replace_settings(new_settings)
+            settings_manager.save_settings()
+            return http_response(200, 'OK')
+        except Exception as e:
+            return http_response(500, str(e))
+    
+    # 静的ファイル（メモリ上のキャッシュから配信）
+    if request.method in ('GET', 'HEAD'):
+        return static_cache.response(request.path, request.headers)
+    
+    return http_response(404, 'Not Found')
+
+async def run_replay(args):
+    """記録したマッチをパイプラインに流し直す"""
+    reader = MatchReader(args.replay)
+    try:
+        if args.rebuild:
+            # 最後のマッチ開始（またはスナップショット）から最大速度で再生して状態を復元
+            start = reader.resume_position()
+            speed = 0
+        else:
+            start = reader.seek(args.seek)
+            speed = args.speed
+        
+        print(f"記録を再生します: {args.replay} (位置 {start}/{reader.count}, 速度 {speed or '最大'})")
+        channel = router.get(args.channel)
+        played = await replay(reader, lambda message: ingest_frame(message, record=False, channel=channel), speed, start)
+        print(f"記録の再生が完了しました: {played}フレーム")
+    finally:
+        reader.close()
+
+def start_log_tail(args):
+    """
+    LiveAPIのログファイルの読み込みを開始（WebSocketで受信したフレームと同じ処理に回す）
+    
+    Returns:
+        LogTail: 読み込み中のLogTail
+    """
+    log_source = settings.get("logSource", {})
+    directory = args.follow_logs or log_source.get("directory") or get_apex_liveapi_path()
+    channel = router.get(log_source.get("channel", DEFAULT_CHANNEL))
+    tail = LogTail(
+        directory,
+        lambda message, data: ingest_frame(message, data, channel=channel),
+        log_source.get("pattern", DEFAULT_PATTERN),
+        log_source.get("offsetsFile", "liveapi_offsets.json"),
+        log_source.get("pollInterval", 1.0),
+        log_source.get("forcePolling", False)
+    ).start()
+    metrics.counter("liveapi_log_records_total", "LiveAPIのログファイルから読み込んだイベント数", lambda: tail.records)
+    print(f"LiveAPIのログファイルを読み込みます: {directory} (チャンネル {channel.name})")
+    return tail
+
+async def run_workers(count, bus_path, http_port):
+    """ワーカープロセスを起動し、異常終了した場合は起動し直す"""
+    async def run_worker_process(index):
+        while True:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__),
+                "--worker-bus", bus_path, "--http-port", str(http_port)
+            )
+            try:
+                code = await process.wait()
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    process.terminate()
+                    await process.wait()
+                raise
+            print(f"ワーカー{index}が終了しました（終了コード {code}）。再起動します")
+            await asyncio.sleep(1)
+    
+    await asyncio.gather(*(run_worker_process(index) for index in range(count)))
+
+def websocket_options():
+    """
+    WebSocketの接続オプション（サブプロトコルの選択肢と圧縮の設定）
+
+    オーバーレイは接続時にサブプロトコルでエンコーディング（JSON / MessagePack）を選ぶ。
+    圧縮は配信環境ごとに設定する（同じマシンのブラウザソースなら無効にしてCPUを節約できる）。
+    """
+    return {
+        "subprotocols": codec.SUBPROTOCOLS,
+        "extensions": deflate_extensions(settings.get("compression"))
+    }
+
+async def run_worker(args, host, http_port):
+    """
+    ワーカープロセスの処理
+    
+    SO_REUSEPORTでHTTP（オーバーレイ）のポートを他のワーカーと共有して待ち受け、
+    取り込みプロセスから届くシリアライズ済みの差分を自分のオーバーレイに配信する。
+    取り込みプロセスとの接続が閉じたら終了する。
+    """
+    global is_worker
+    is_worker = True
+    fanout = await WorkerFanout(hub, settings_publisher).connect(args.worker_bus)
+    
+    # 統計・直近のイベントは取り込みプロセスだけが持つ（ゲーム用のポートの /api/stats・/api/events で取得する）
+    init_api_routes(settings_manager, name_override, analytics=analytics_store)
+    server = await serve(handle_http, fanout.handle_client, host, http_port, reuse_port=True, **websocket_options())
+    
+    static_cache.start()
+    settings_publisher.attach()
+    
+    # 他のワーカーによる設定・名前オーバーライドの変更を反映
+    watchers = [
+        FileWatcher(settings_manager.settings_file, settings_manager.reload).start(),
+        FileWatcher(analytics_store.meta_file, analytics_store.reload).start()
+    ]
+    if name_override.temp_path.exists():
+        name_override.load()
+        watchers.append(FileWatcher(name_override.override_file, name_override.load).start())
+    
+    try:
+        await fanout.run()
+    finally:
+        for watcher in watchers:
+            watcher.stop()
+        server.close()
+        settings_manager.flush()
+
+def parse_args():
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="Apex Legends Python Overlay Tool")
+    parser.add_argument("--ws-port", type=int, help="WebSocketサーバーのポート（設定より優先）")
+    parser.add_argument("--http-port", type=int, help="HTTPサーバーのポート（設定より優先）")
+    parser.add_argument("--record", action="store_true", help="受信したフレームを記録する")
+    parser.add_argument("--replay", help="記録ファイル（.apexrec）を再生する")
+    parser.add_argument("--speed", type=float, default=1.0, help="再生速度（1で等速、0で最大速度）")
+    parser.add_argument("--seek", type=float, default=0.0, help="再生を開始する位置（記録開始からの秒数）")
+    parser.add_argument("--rebuild", action="store_true", help="最後のマッチの状態を最大速度で復元する")
+    parser.add_argument("--channel", default=DEFAULT_CHANNEL, help="記録を再生するチャンネル")
+    parser.add_argument("--follow-logs", nargs="?", const="", metavar="DIR",
+                        help="LiveAPIのログファイルを追いかけて読み込む（省略時は設定またはLiveAPIのディレクトリ）")
+    parser.add_argument("--workers", type=int, default=0, help="オーバーレイへの配信を行うワーカープロセス数（0で単一プロセス）")
+    parser.add_argument("--worker-bus", help=argparse.SUPPRESS)
+    return parser.parse_args()
 
 # メイン処理
-async def main():
+async def main(args=None):
+    global recording_directory
+    
+    if args is None:
+        args = parse_args()
+    if not is_valid_channel(args.channel):
+        print(f"無効なチャンネル名です: {args.channel}")
+        return
+    
     # 設定から接続情報を取得
     host = settings.get("websocket", {}).get("host", "localhost")
     ws_port = settings.get("websocket", {}).get("port", 7777)
     http_port = settings.get("http", {}).get("port", 8080)
+    if args.ws_port:
+        ws_port = args.ws_port
+    if args.http_port:
+        http_port = args.http_port
+    
+    # ログの書き出しをバックグラウンドスレッドで開始（設定の変更は実行中に反映）
+    apply_logging_settings(settings_manager.settings)
+    settings_manager.add_listener(on_logging_change)
+    
+    # ワーカープロセスとして起動された場合
+    if args.worker_bus:
+        await run_worker(args, host, http_port)
+        return
+    
+    if args.workers and ws_port == http_port:
+        print("ワーカーモードではWebSocketとHTTPに別のポートを指定してください")
+        return
     
     # APEXの設定
-    apex_api.setup()
+    router.get(DEFAULT_CHANNEL).api.setup()
     
     # Name Override Toolのセットアップ
     if name_override.setup():
-        # サンプルのオーバーライドファイルを作成（デモ用）
+        # オーバーライドファイルがなければサンプルを作成（デモ用）
         name_override.create_sample_override()
     
     print(f"Apex Legends Python Overlay Tool")
     print(f"================================")
     
-    # HTTPサーバーの起動
-    handler = SimpleHTTPHandler
-    http_server = socketserver.ThreadingTCPServer((host, http_port), handler)
-    http_thread = threading.Thread(target=http_server.serve_forever)
-    http_thread.daemon = True
-    http_thread.start()
-    print(f"HTTPサーバーを起動しました - http://{host}:{http_port}")
+    # 受信フレームの記録（チャンネルごとに別のファイル）
+    recording = settings.get("recording", {})
+    if args.record or recording.get("enabled", False):
+        recording_directory = recording.get("directory", "recordings")
+        for channel in router.channels.values():
+            start_recording(channel)
+        router.on_create = start_recording
+    
+    servers = []
+    bus = None
+    workers_task = None
+    if args.workers:
+        # ワーカーモード: このプロセスはゲームからの取り込みに専念し、
+        # HTTPのポートはワーカーがSO_REUSEPORTで共有して待ち受ける
+        bus_path = os.path.join(tempfile.mkdtemp(prefix="apex-overlay-"), "bus.sock")
+        bus = await IngestBus(
+            lambda message, name: ingest_frame(message, channel=router.get(name)),
+            router.keyframe_for
+        ).start(bus_path)
+        router.set_relay(bus.publish)
+        metrics.gauge("workers", "接続中のワーカープロセス数", lambda: len(bus.writers))
+        metrics.counter("worker_dropped_total", "ワーカーへの書き込みが溜まり破棄したメッセージ数", lambda: bus.dropped)
+        workers_task = asyncio.ensure_future(run_workers(args.workers, bus_path, http_port))
+        print(f"ワーカーを{args.workers}個起動します - http://{host}:{http_port} (WebSocket: ws://{host}:{http_port}/ws)")
+    else:
+        # HTTPとWebSocketを同じポートで起動
+        servers.append(await serve(handle_http, handle_client, host, http_port, **websocket_options()))
+        print(f"サーバーを起動しました - http://{host}:{http_port} (WebSocket: ws://{host}:{http_port}/ws)")
     
-    # WebSocketサーバーの起動
-    async with websockets.serve(handle_client, host, ws_port):
+    # 従来のWebSocketポートに接続するゲームのために同じサーバーを待ち受ける
+    if ws_port != http_port:
+        servers.append(await serve(handle_http, handle_client, host, ws_port, **websocket_options()))
         print(f"WebSocketサーバーを起動しました - ws://{host}:{ws_port}")
-        print(f"ブラウザで http://{host}:{http_port} にアクセスしてください")
-        print(f"設定ページ: http://{host}:{http_port}/settings.html")
-        print(f"Alt+Oでオーバーレイの表示/非表示を切り替えられます")
-        print(f"Ctrl+Cで終了します")
-        
+    
+    print(f"ブラウザで http://{host}:{http_port} にアクセスしてください")
+    print(f"設定ページ: http://{host}:{http_port}/settings.html")
+    print(f"Alt+Oでオーバーレイの表示/非表示を切り替えられます")
+    print(f"Ctrl+Cで終了します")
+    
+    # 静的ファイルの変更をキャッシュに反映
+    static_cache.start()
+    
+    # 設定ファイルの外部編集を反映し、オーバーレイ設定の変更を配信
+    settings_publisher.attach()
+    settings_watcher = FileWatcher(settings_manager.settings_file, settings_manager.reload).start()
+    analytics_watcher = FileWatcher(analytics_store.meta_file, analytics_store.reload).start()
+    
+    # 記録の再生
+    if args.replay:
+        asyncio.ensure_future(run_replay(args))
+    
+    # LiveAPIのログファイルの読み込み
+    log_tail = None
+    if args.follow_logs is not None or settings.get("logSource", {}).get("enabled", False):
+        log_tail = start_log_tail(args)
+    
+    # SIGTERMでも終了処理（設定の書き込み、ワーカーの停止）を行う（Windowsでは未対応）
+    stop = asyncio.get_running_loop().create_future()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set_result, None)
+    except NotImplementedError:
+        pass
+    
+    try:
         # サーバーを永続的に実行
-        await asyncio.Future()
+        await stop
+    finally:
+        settings_watcher.stop()
+        analytics_watcher.stop()
+        if log_tail is not None:
+            await log_tail.stop()
+        if workers_task is not None:
+            workers_task.cancel()
+            await asyncio.gather(workers_task, return_exceptions=True)
+            bus.close()
+            shutil.rmtree(os.path.dirname(bus_path), ignore_errors=True)
+        for server in servers:
+            server.close()
+        settings_manager.flush()
+        for channel in router.channels.values():
+            if channel.recorder is not None:
+                channel.recorder.close()
 
 if __name__ == "__main__":
     try:
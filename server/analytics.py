@@ -0,0 +1,487 @@
+import array
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from server import codec
+from server.liveapi_proto import is_protobuf_frame, decode_event
+from server.match_stats import MatchStats
+from server.projection import project_frame
+from server.recorder import MatchReader, SNAPSHOT_TYPE
+from utils.file_watcher import file_signature
+from utils.logger import get_logger
+
+# NumPyがインストールされていればベクトル化した集計を使用
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# ロガーの取得
+logger = get_logger()
+
+# 使用中の集計バックエンド名
+BACKEND = "numpy" if numpy is not None else "array"
+
+# マッチをまたいだ集計用の列指向ストア
+#
+# 1行が「1マッチ x 1プレイヤー」で、列ごとに array.array（NumPyがあれば集計時にndarray）へ
+# 格納する。プレイヤー名・レジェンド名は辞書エンコードして整数の列で持つ。
+# 保存時は列ごとのファイルに新しい行を追記し、辞書とマッチ一覧を meta.json に書き出す。
+
+# 列の定義（列名, array.arrayの型コード）
+COLUMNS = (
+    ("match", "i"),
+    ("player", "i"),
+    ("legend", "i"),
+    ("team", "i"),
+    ("kills", "i"),
+    ("knockdowns", "i"),
+    ("damage", "d"),
+    ("damageTaken", "d"),
+    ("timeAlive", "d")
+)
+
+# 文字列を辞書エンコードする列
+DICTIONARY_COLUMNS = ("player", "legend")
+
+# グループ化・絞り込みに使える列
+GROUP_COLUMNS = ("player", "legend", "team", "match")
+
+# 集計する数値列
+METRICS = ("kills", "knockdowns", "damage", "damageTaken", "timeAlive")
+
+# 整数で集計する数値列
+INTEGER_METRICS = tuple(name for name, typecode in COLUMNS if name in METRICS and typecode == "i")
+
+# メタデータのファイル名
+META_FILE = "meta.json"
+
+# 列ファイルの拡張子
+COLUMN_SUFFIX = ".col"
+
+def match_id(stats):
+    """マッチの識別子（開始時刻と参加プレイヤー。記録からの取り込みとライブの取り込みで同じ値）"""
+    names = "\n".join(sorted(stats.players)).encode("utf-8")
+    return f"{int(stats.started_at or 0)}-{hashlib.sha1(names).hexdigest()[:12]}"
+
+class StringDictionary:
+    """文字列と整数コードの対応"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, value):
+        """文字列のコードを取得（新しい文字列は追加）"""
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def lookup(self, value):
+        """文字列のコードを取得（未登録の場合はNone）"""
+        return self.codes.get(value)
+
+class AnalyticsStore:
+    """記録済みマッチの統計を列指向で保持して集計する"""
+
+    def __init__(self, directory=None):
+        """
+        Parameters:
+            directory (str | Path): 保存先のディレクトリ（Noneの場合はメモリ上のみ）
+        """
+        self.directory = Path(directory) if directory is not None else None
+        self.columns = {name: array.array(typecode) for name, typecode in COLUMNS}
+        self.dictionaries = {name: StringDictionary() for name in DICTIONARY_COLUMNS}
+
+        # 取り込んだマッチ（行の match 列はこの一覧の位置）
+        self.matches = []
+        self.match_index = {}
+
+        # 集計用のndarray（NumPy使用時。行を追加したら作り直す）
+        self._arrays = None
+
+        # 最後に読み書きしたメタデータのファイルの状態（他のプロセスによる更新の検知用）
+        self.signature = None
+
+        # ファイルに書き出し済みの行数
+        self.saved_rows = 0
+
+        # バックグラウンドでの書き込み（スレッドは最初の書き込み時に作成）と実行中の件数
+        self.executor = None
+        self.saving = 0
+
+        if self.directory is not None:
+            self.load()
+
+    @property
+    def rows(self):
+        return len(self.columns["match"])
+
+    # 保存・読み込み
+
+    def load(self):
+        """保存済みのストアを読み込む（なければ空のまま）"""
+        meta_file = self.meta_file
+        if not meta_file.exists():
+            return
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+            rows = meta["rows"]
+            for name, typecode in COLUMNS:
+                column = array.array(typecode)
+                column_file = self.directory / f"{name}{COLUMN_SUFFIX}"
+                if rows:
+                    with open(column_file, "rb") as f:
+                        # 追記が途中で止まった行はメタデータの行数までで切り捨てる
+                        column.frombytes(f.read(rows * column.itemsize))
+                if len(column) != rows:
+                    raise ValueError(f"列 {name} の行数が一致しません")
+                self.columns[name] = column
+
+            self.dictionaries = {
+                name: StringDictionary(meta["dictionaries"].get(name, [])) for name in DICTIONARY_COLUMNS
+            }
+            self.matches = meta["matches"]
+            self.match_index = {match["id"]: index for index, match in enumerate(self.matches)}
+            self._arrays = None
+            self.signature = file_signature(meta_file)
+            self.saved_rows = rows
+            logger.info(f"分析ストアを読み込みました: {len(self.matches)}マッチ / {rows}行")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"分析ストアの読み込みに失敗しました: {str(e)}")
+
+    def save(self):
+        """未保存の行を列ファイルに追記してメタデータを書き直す"""
+        if self.directory is None:
+            return
+        try:
+            self._saved(*self._write(*self._pending()))
+        except OSError as e:
+            logger.error(f"分析ストアの保存に失敗しました: {str(e)}")
+
+    def save_in_background(self):
+        """
+        未保存の行を書き込み用のスレッドで保存（イベントループ上から呼び出す）
+
+        書き込む内容は呼び出した時点で取り出すため、書き込み中に行が追加されても影響しない。
+        書き込みは1つのスレッドで順番に行い、完了はイベントループ上で反映する。
+
+        Returns:
+            asyncio.Future: 書き込みの完了（保存先がない場合はNone）
+        """
+        if self.directory is None:
+            return None
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analytics-writer")
+
+        self.saving += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self._write, *self._pending())
+        future.add_done_callback(self._on_written)
+        return future
+
+    def _on_written(self, future):
+        self.saving -= 1
+        if future.cancelled():
+            return
+        try:
+            self._saved(*future.result())
+        except OSError as e:
+            logger.error(f"分析ストアの保存に失敗しました: {str(e)}")
+
+    def _pending(self):
+        """保存する内容（書き込み開始行・行数・列ごとの未保存のバイト列・メタデータ）を取り出す"""
+        start = self.saved_rows
+        chunks = {name: column[start:].tobytes() for name, column in self.columns.items()}
+        meta = {
+            "rows": self.rows,
+            "columns": dict(COLUMNS),
+            "dictionaries": {name: list(dictionary.values) for name, dictionary in self.dictionaries.items()},
+            "matches": [dict(match) for match in self.matches]
+        }
+        return start, chunks, meta
+
+    def _write(self, start, chunks, meta):
+        """取り出した内容をファイルに書き込む（書き込み用のスレッドからも呼び出す）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for name, typecode in COLUMNS:
+            column_file = self.directory / f"{name}{COLUMN_SUFFIX}"
+            with open(column_file, "r+b" if column_file.exists() else "wb") as f:
+                # 前回の追記が途中で止まっていた場合に備えて書き込み位置を行数から決める
+                f.seek(start * array.array(typecode).itemsize)
+                f.write(chunks[name])
+                f.truncate()
+
+        temp_file = self.directory / (META_FILE + ".tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_file, self.meta_file)
+        return file_signature(self.meta_file), meta["rows"]
+
+    def _saved(self, signature, rows):
+        """書き込みが完了した内容を反映"""
+        self.signature = signature
+        self.saved_rows = rows
+
+    @property
+    def meta_file(self):
+        return self.directory / META_FILE
+
+    def reload(self):
+        """他のプロセス（CLIでの取り込みなど）が更新した場合に読み込み直す"""
+        # 自分の書き込みが完了するまでは、ファイルの変更を他のプロセスによるものと区別できない
+        if self.saving:
+            return
+        if file_signature(self.meta_file) != self.signature:
+            self.load()
+
+    # 取り込み
+
+    def add_match(self, stats, name=None, save=True):
+        """
+        終了したマッチの統計を取り込む
+
+        Parameters:
+            stats (MatchStats): マッチの集計
+            name (str): マッチの表示名（記録ファイル名など）
+            save (bool): すぐに保存するかどうか（まとめて取り込む場合は最後に save() を呼ぶ）
+
+        Returns:
+            bool: 取り込んだかどうか（取り込み済み・プレイヤーなしの場合はFalse）
+        """
+        identifier = match_id(stats)
+        if not stats.players or identifier in self.match_index:
+            return False
+
+        match = len(self.matches)
+        now = stats.ended_at if stats.ended_at is not None else time.time()
+        columns = self.columns
+        players = self.dictionaries["player"]
+        legends = self.dictionaries["legend"]
+        for player in stats.players.values():
+            columns["match"].append(match)
+            columns["player"].append(players.encode(player.name))
+            columns["legend"].append(legends.encode(player.legend or ""))
+            columns["team"].append(player.team_id if isinstance(player.team_id, int) else -1)
+            columns["kills"].append(player.kills)
+            columns["knockdowns"].append(player.knockdowns)
+            columns["damage"].append(player.damage)
+            columns["damageTaken"].append(player.damage_taken)
+            columns["timeAlive"].append(player.time_alive(now))
+
+        self.matches.append({
+            "id": identifier,
+            "name": name or identifier,
+            "startedAt": stats.started_at,
+            "players": len(stats.players)
+        })
+        self.match_index[identifier] = match
+        self._arrays = None
+
+        if save:
+            self.save()
+        return True
+
+    # 集計
+
+    def _resolve_filters(self, filters):
+        """
+        絞り込み条件を列の条件に変換
+
+        グループ化できる列は値（またはそのリスト）との一致、数値列は {"min": x, "max": y} の範囲。
+
+        Returns:
+            list: (列名, "in", コードの集合) または (列名, "range", 下限, 上限)
+        """
+        conditions = []
+        for column, condition in (filters or {}).items():
+            if column in GROUP_COLUMNS:
+                values = condition if isinstance(condition, list) else [condition]
+                if column in DICTIONARY_COLUMNS:
+                    codes = {self.dictionaries[column].lookup(value) for value in values}
+                elif column == "match":
+                    codes = {self.match_index.get(value) for value in values}
+                else:
+                    codes = {int(value) for value in values}
+                codes.discard(None)
+                conditions.append((column, "in", codes))
+            elif column in METRICS and isinstance(condition, dict):
+                low = condition.get("min")
+                high = condition.get("max")
+                conditions.append((column, "range", float("-inf") if low is None else low,
+                                   float("inf") if high is None else high))
+            else:
+                raise ValueError(f"絞り込みできない条件です: {column}")
+        return conditions
+
+    def _label(self, column, code):
+        """グループのコードを表示用の値に変換"""
+        if column in DICTIONARY_COLUMNS:
+            return self.dictionaries[column].values[code]
+        if column == "match":
+            return self.matches[code]["name"]
+        return code
+
+    def _group_numpy(self, group_by, conditions):
+        """NumPyで絞り込みと集計を行う"""
+        if self._arrays is None:
+            self._arrays = {name: numpy.array(column) for name, column in self.columns.items()}
+        arrays = self._arrays
+
+        mask = None
+        for condition in conditions:
+            values = arrays[condition[0]]
+            if condition[1] == "in":
+                selected = numpy.isin(values, numpy.fromiter(condition[2], dtype=values.dtype))
+            else:
+                selected = (values >= condition[2]) & (values <= condition[3])
+            mask = selected if mask is None else mask & selected
+
+        keys = arrays[group_by] if mask is None else arrays[group_by][mask]
+        groups, inverse = numpy.unique(keys, return_inverse=True)
+        counts = numpy.bincount(inverse, minlength=len(groups))
+        sums = {
+            metric: numpy.bincount(
+                inverse, weights=arrays[metric] if mask is None else arrays[metric][mask], minlength=len(groups)
+            )
+            for metric in METRICS
+        }
+        return [
+            (int(code), int(counts[index]), {metric: float(sums[metric][index]) for metric in METRICS})
+            for index, code in enumerate(groups)
+        ]
+
+    def _group_array(self, group_by, conditions):
+        """array.arrayの列を1回ずつ走査して絞り込みと集計を行う"""
+        columns = self.columns
+        indices = range(self.rows)
+        for condition in conditions:
+            values = columns[condition[0]]
+            if condition[1] == "in":
+                codes = condition[2]
+                indices = [index for index in indices if values[index] in codes]
+            else:
+                low, high = condition[2], condition[3]
+                indices = [index for index in indices if low <= values[index] <= high]
+
+        keys = columns[group_by]
+        counts = {}
+        for index in indices:
+            key = keys[index]
+            counts[key] = counts.get(key, 0) + 1
+
+        sums = {}
+        for metric in METRICS:
+            values = columns[metric]
+            totals = dict.fromkeys(counts, 0)
+            for index in indices:
+                totals[keys[index]] += values[index]
+            sums[metric] = totals
+
+        return [
+            (code, count, {metric: sums[metric][code] for metric in METRICS})
+            for code, count in counts.items()
+        ]
+
+    def query(self, group_by="legend", filters=None, sort="games", limit=None):
+        """
+        絞り込んだ行をグループごとに集計
+
+        Parameters:
+            group_by (str): グループ化する列（player / legend / team / match）
+            filters (dict): 絞り込み条件（例: {"legend": ["Wraith"], "kills": {"min": 3}}）
+            sort (str): 降順に並べる項目（games、合計の列名、"avg" + 列名）
+            limit (int): 返すグループ数の上限
+
+        Returns:
+            list: グループごとの試合数・合計・1試合あたりの平均
+        """
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"グループ化できない列です: {group_by}")
+        conditions = self._resolve_filters(filters)
+
+        if numpy is not None:
+            groups = self._group_numpy(group_by, conditions)
+        else:
+            groups = self._group_array(group_by, conditions)
+
+        results = []
+        for code, count, sums in groups:
+            row = {group_by: self._label(group_by, code), "games": count}
+            for metric in METRICS:
+                total = sums[metric]
+                row[metric] = int(total) if metric in INTEGER_METRICS else round(total, 1)
+                row["avg" + metric[0].upper() + metric[1:]] = round(total / count, 2)
+            results.append(row)
+
+        if sort is not None:
+            if results and sort not in results[0]:
+                raise ValueError(f"並べ替えできない項目です: {sort}")
+            results.sort(key=lambda row: row[sort], reverse=True)
+        if limit is not None:
+            results = results[:limit]
+        return results
+
+    def get_summary(self):
+        """ストアの概要"""
+        return {
+            "backend": BACKEND,
+            "matches": len(self.matches),
+            "rows": self.rows,
+            "players": len(self.dictionaries["player"].values),
+            "legends": len(self.dictionaries["legend"].values)
+        }
+
+def iter_recorded_matches(path):
+    """
+    記録ファイルを集計し直してマッチごとの統計を返す
+
+    マッチの開始（matchSetup）ごとに区切り、途中で記録が終わったマッチも含める。
+
+    Returns:
+        generator: (マッチ名, MatchStats)
+    """
+    reader = MatchReader(path)
+    stats = MatchStats()
+    count = 0
+    last_time = None
+    try:
+        for timestamp, event_type, message in reader.iter_records():
+            last_time = timestamp
+            try:
+                if is_protobuf_frame(message):
+                    data = decode_event(message)
+                else:
+                    data = codec.decode(message)
+            except ValueError:
+                continue
+
+            if event_type == SNAPSHOT_TYPE:
+                stats.on_snapshot(project_frame(data), timestamp)
+                continue
+
+            if data.get("category") == "matchSetup" and stats.players:
+                if stats.ended_at is None:
+                    stats.ended_at = timestamp
+                count += 1
+                yield f"{Path(path).stem}#{count}", stats
+                stats = MatchStats()
+            event_timestamp = data.get("timestamp")
+            stats.on_event(data, event_timestamp if isinstance(event_timestamp, (int, float)) and event_timestamp > 0 else timestamp)
+    finally:
+        reader.close()
+
+    if stats.players:
+        # 終了前に記録が止まったマッチは最後のレコードの時刻で締める
+        if stats.ended_at is None:
+            stats.ended_at = last_time
+        count += 1
+        yield f"{Path(path).stem}#{count}", stats
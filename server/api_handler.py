@@ -1,5 +1,6 @@
 import json
 from utils.logger import get_logger
+from server.projection import project_frame, project_player, project_squad, project_match
 
 # ロガーの取得
 logger = get_logger()
@@ -20,13 +21,8 @@ def process_game_data(data):
             logger.warning(f"予期しないデータ形式です: {type(data)}")
             return {"error": "予期しないデータ形式です"}
         
-        # 必要なデータを抽出
-        processed_data = {
-            "gameState": data.get("gameState", ""),
-            "player": extract_player_data(data),
-            "squad": extract_squad_data(data),
-            "match": extract_match_data(data)
-        }
+        # 必要なデータを抽出（ApexAPIと共通の射影関数を使用）
+        processed_data = project_frame(data)
         
         return processed_data
     
@@ -36,43 +32,12 @@ def process_game_data(data):
 
 def extract_player_data(data):
     """プレイヤーデータの抽出"""
-    player_data = data.get("player", {})
-    return {
-        "name": player_data.get("name", ""),
-        "health": player_data.get("health", 0),
-        "maxHealth": player_data.get("maxHealth", 100),
-        "shields": player_data.get("shields", 0),
-        "maxShields": player_data.get("maxShields", 0),
-        "kills": player_data.get("kills", 0),
-        "damage": player_data.get("damage", 0),
-        "legend": player_data.get("legendName", ""),
-        "position": player_data.get("position", {"x": 0, "y": 0, "z": 0})
-    }
+    return project_player(data.get("player", {}))
 
 def extract_squad_data(data):
     """スクワッドデータの抽出"""
-    squad_data = data.get("squad", [])
-    processed_squad = []
-    
-    for member in squad_data:
-        processed_squad.append({
-            "name": member.get("name", ""),
-            "health": member.get("health", 0),
-            "maxHealth": member.get("maxHealth", 100),
-            "shields": member.get("shields", 0),
-            "maxShields": member.get("maxShields", 0),
-            "legend": member.get("legendName", "")
-        })
-    
-    return processed_squad
+    return project_squad(data.get("squad", []))
 
 def extract_match_data(data):
     """マッチデータの抽出"""
-    match_data = data.get("match", {})
-    return {
-        "inProgress": match_data.get("inProgress", False),
-        "squadEliminated": match_data.get("squadEliminated", False),
-        "phase": match_data.get("phase", 0),
-        "remainingTime": match_data.get("remainingTime", 0),
-        "remainingSquads": match_data.get("remainingSquads", 0)
-    }
\ No newline at end of file
+    return project_match(data.get("match", {}))
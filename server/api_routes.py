@@ -1,19 +1,46 @@
 import json
+import logging
 from pathlib import Path
-from utils.logger import get_logger
+from utils.logger import get_logger, get_level, frame_logger, validate_frame_settings
+from utils.metrics import metrics
+from simple_name_override import parse_overrides, parse_player_ids
 
 # ロガーの取得
 logger = get_logger()
 
+# Prometheusのテキスト形式のContent-Type
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
 # 設定マネージャーと名前オーバーライドツールへの参照
 settings_manager = None
 name_override_tool = None
 
-def init_api_routes(app_settings, app_name_override):
+# チャンネル名からマッチの統計を返す関数（チャンネルがなければNone）
+match_stats_provider = None
+
+# チャンネル名から直近のイベント（EventRing）を返す関数（チャンネルがなければNone）
+match_events_provider = None
+
+# マッチをまたいだ分析ストア
+analytics_store = None
+
+# 統計を取得するパス（/api/stats はデフォルトのチャンネル、/api/stats/<チャンネル名>）
+STATS_PATH = '/api/stats'
+
+# 直近のイベントを取得するパス（/api/events はデフォルトのチャンネル、/api/events/<チャンネル名>）
+EVENTS_PATH = '/api/events'
+
+# 直近のイベントの取得でsecondsを指定しない場合の範囲（秒）
+DEFAULT_EVENT_SECONDS = 30
+
+def init_api_routes(app_settings, app_name_override, app_match_stats=None, analytics=None, app_match_events=None):
     """APIルートの初期化"""
-    global settings_manager, name_override_tool
+    global settings_manager, name_override_tool, match_stats_provider, analytics_store, match_events_provider
     settings_manager = app_settings
     name_override_tool = app_name_override
+    match_stats_provider = app_match_stats
+    analytics_store = analytics
+    match_events_provider = app_match_events
 
 def handle_api_request(path, request_data=None):
     """
@@ -24,7 +51,7 @@ def handle_api_request(path, request_data=None):
         request_data (dict): リクエストデータ（POSTリクエストの場合）
         
     Returns:
-        dict: レスポンスデータ
+        dict | str: レスポンスデータ（Prometheus形式のメトリクスのみ文字列）
     """
     try:
         # 設定取得
@@ -35,15 +62,14 @@ def handle_api_request(path, request_data=None):
             }
         # 設定保存
         elif path == '/api/settings' and request_data is not None:
-            # 設定の更新
-            if 'overlay' in request_data:
-                settings_manager.settings['overlay'] = request_data['overlay']
-            if 'websocket' in request_data:
-                settings_manager.settings['websocket'] = request_data['websocket']
-            if 'http' in request_data:
-                settings_manager.settings['http'] = request_data['http']
+            # 設定の更新（まとめて1つのスナップショットに反映）
+            changes = {}
+            for key in ('overlay', 'websocket', 'http'):
+                if key in request_data:
+                    changes[key] = request_data[key]
             if 'nameOverride' in request_data:
-                settings_manager.settings['nameOverride']['enabled'] = request_data['nameOverride']['enabled']
+                changes['nameOverride.enabled'] = request_data['nameOverride']['enabled']
+            settings_manager.update_settings(changes)
             
             # 設定を保存
             if settings_manager.save_settings():
@@ -66,11 +92,16 @@ def handle_api_request(path, request_data=None):
                 return {'success': False, 'message': 'プレイヤーIDと表示名が必要です。'}
             
             if name_override_tool.add_override(player_id, display_name):
-                # 更新された一覧を返す
-                overrides = name_override_tool.get_all_overrides()
+                # 一覧全体ではなく追加した1件だけを返す
+                player_id = str(player_id).strip()
+                display_name = name_override_tool.get_override(player_id)
+                if display_name is None:
+                    return {'success': False, 'message': 'プレイヤーIDまたは表示名が正しくありません。'}
                 return {
                     'success': True,
-                    'overrides': overrides
+                    'playerId': player_id,
+                    'displayName': display_name,
+                    'total': len(name_override_tool.overrides)
                 }
             else:
                 return {'success': False, 'message': '名前オーバーライドの追加に失敗しました。'}
@@ -81,15 +112,49 @@ def handle_api_request(path, request_data=None):
             if not player_id:
                 return {'success': False, 'message': 'プレイヤーIDが必要です。'}
             
+            if name_override_tool.get_override(player_id) is None:
+                return {'success': False, 'message': f'プレイヤーID {player_id} は登録されていません。'}
+            
             if name_override_tool.remove_override(player_id):
-                # 更新された一覧を返す
-                overrides = name_override_tool.get_all_overrides()
+                # 一覧全体ではなく削除した1件だけを返す
                 return {
                     'success': True,
-                    'overrides': overrides
+                    'playerId': str(player_id),
+                    'total': len(name_override_tool.overrides)
                 }
             else:
                 return {'success': False, 'message': '名前オーバーライドの削除に失敗しました。'}
+        # Name Override一括追加（CSV / JSON。ファイルの書き込みは1回だけ）
+        elif path == '/api/name-override/bulk-add' and request_data is not None:
+            try:
+                overrides, invalid = parse_overrides(request_data)
+            except (ValueError, TypeError, IndexError, KeyError):
+                return {'success': False, 'message': '一括登録のデータを解析できません。'}
+            
+            changed = name_override_tool.add_overrides(overrides)
+            if changed is None:
+                return {'success': False, 'message': '名前オーバーライドの一括追加に失敗しました。'}
+            return {
+                'success': True,
+                'changed': changed,
+                'invalid': invalid,
+                'total': len(name_override_tool.overrides)
+            }
+        # Name Override一括削除
+        elif path == '/api/name-override/bulk-remove' and request_data is not None:
+            try:
+                player_ids = parse_player_ids(request_data)
+            except (ValueError, TypeError, IndexError):
+                return {'success': False, 'message': '一括削除のデータを解析できません。'}
+            
+            removed = name_override_tool.remove_overrides(player_ids)
+            if removed is None:
+                return {'success': False, 'message': '名前オーバーライドの一括削除に失敗しました。'}
+            return {
+                'success': True,
+                'removed': removed,
+                'total': len(name_override_tool.overrides)
+            }
         # プリセット保存
         elif path == '/api/name-override/save-preset' and request_data is not None:
             preset_name = request_data.get('presetName')
@@ -152,6 +217,113 @@ def handle_api_request(path, request_data=None):
                 }
             else:
                 return {'success': False, 'message': 'プリセットの削除に失敗しました。'}
+        # メトリクス取得（JSON）
+        elif path == '/api/metrics' and request_data is None:
+            return {
+                'success': True,
+                'metrics': metrics.to_dict()
+            }
+        # マッチの統計取得（集計済みの値を返すだけで履歴は走査しない）
+        elif (path == STATS_PATH or path.startswith(STATS_PATH + '/')) and request_data is None:
+            if match_stats_provider is None:
+                return {'success': False, 'message': 'このプロセスでは統計を取得できません。'}
+            channel = path[len(STATS_PATH) + 1:] or None
+            stats = match_stats_provider(channel)
+            if stats is None:
+                return {'success': False, 'message': f"チャンネル '{channel}' が見つかりません。"}
+            return {
+                'success': True,
+                'stats': stats
+            }
+        # 直近のイベント（GETは直近30秒、POSTは seconds / player / types / limit で絞り込み）
+        elif path == EVENTS_PATH or path.startswith(EVENTS_PATH + '/'):
+            if match_events_provider is None:
+                return {'success': False, 'message': 'このプロセスではイベントを取得できません。'}
+            channel = path[len(EVENTS_PATH) + 1:] or None
+            events = match_events_provider(channel)
+            if events is None:
+                return {'success': False, 'message': f"チャンネル '{channel}' が見つかりません。"}
+            options = request_data or {}
+            try:
+                seconds = options.get('seconds', DEFAULT_EVENT_SECONDS)
+                limit = options.get('limit')
+                types = options.get('types')
+                results = events.query(
+                    float(seconds) if seconds is not None else None,
+                    options.get('player'),
+                    [types] if isinstance(types, str) else types,
+                    int(limit) if limit is not None else None
+                )
+            except (ValueError, TypeError) as e:
+                return {'success': False, 'message': f"イベントの取得条件が正しくありません: {str(e)}"}
+            return {
+                'success': True,
+                'events': results,
+                'buffer': events.get_stats()
+            }
+        # 分析ストアの概要
+        elif path == '/api/analytics' and request_data is None:
+            if analytics_store is None:
+                return {'success': False, 'message': '分析ストアが利用できません。'}
+            return {
+                'success': True,
+                'summary': analytics_store.get_summary()
+            }
+        # 分析ストアの集計（グループ化・絞り込み）
+        elif path == '/api/analytics/query' and request_data is not None:
+            if analytics_store is None:
+                return {'success': False, 'message': '分析ストアが利用できません。'}
+            try:
+                results = analytics_store.query(
+                    request_data.get('groupBy', 'legend'),
+                    request_data.get('filters'),
+                    request_data.get('sort', 'games'),
+                    request_data.get('limit')
+                )
+            except (ValueError, TypeError) as e:
+                return {'success': False, 'message': f"集計の条件が正しくありません: {str(e)}"}
+            return {
+                'success': True,
+                'results': results
+            }
+        # ログの設定取得
+        elif path == '/api/logging' and request_data is None:
+            return {
+                'success': True,
+                'level': get_level(),
+                'frames': frame_logger.get_config()
+            }
+        # ログの設定変更（実行中に反映。設定ファイル経由で他のワーカーにも反映される）
+        elif path == '/api/logging' and request_data is not None:
+            changes = {}
+            if 'level' in request_data:
+                level = str(request_data['level']).upper()
+                if not isinstance(logging.getLevelName(level), int):
+                    return {'success': False, 'message': f"不明なログレベルです: {request_data['level']}"}
+                changes['logging.level'] = level
+            error = validate_frame_settings(
+                request_data.get('frameSampleEvery'),
+                request_data.get('frameRateLimit'),
+                request_data.get('frameSampleOverrides')
+            )
+            if error is not None:
+                return {'success': False, 'message': error}
+            for key in ('frameSampleEvery', 'frameRateLimit', 'frameSampleOverrides'):
+                if key in request_data:
+                    changes[f'logging.{key}'] = request_data[key]
+            settings_manager.update_settings(changes)
+            
+            if settings_manager.save_settings():
+                return {
+                    'success': True,
+                    'level': get_level(),
+                    'frames': frame_logger.get_config()
+                }
+            else:
+                return {'success': False, 'message': '設定の保存に失敗しました。'}
+        # メトリクス取得（Prometheusのテキスト形式）
+        elif path == '/api/metrics/prometheus' and request_data is None:
+            return metrics.to_prometheus()
         else:
             return {'success': False, 'message': '無効なAPIリクエストです。'}
     except Exception as e:
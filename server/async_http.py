@@ -0,0 +1,370 @@
+import asyncio
+import functools
+import re
+from http import HTTPStatus
+from urllib.parse import unquote, urlsplit
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+from websockets.legacy.server import WebSocketServer, WebSocketServerProtocol
+from utils.logger import get_logger
+
+# ロガーの取得
+logger = get_logger()
+
+# 1つのポートでHTTPとWebSocketを提供するasyncioサーバー
+# HTTP/1.1のリクエストを同じイベントループ上で処理し（keep-alive対応）、
+# WebSocketのアップグレード要求は接続をwebsocketsのプロトコルに引き渡す
+
+# リクエストヘッダーの最大サイズ
+MAX_HEADER_SIZE = 64 * 1024
+
+# リクエストボディの最大サイズ
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+# chunked形式のチャンクサイズ（16進数）
+_CHUNK_SIZE = re.compile(rb"[0-9A-Fa-f]{1,16}")
+
+# keep-alive接続のアイドルタイムアウト（秒）
+KEEP_ALIVE_TIMEOUT = 15
+
+# WebSocketのアップグレードを受け付けるパス（ゲームは "/"、オーバーレイは "/ws" に接続）
+WEBSOCKET_PATHS = ("/", "/ws")
+
+def _parse_chunked(buffer, start):
+    """
+    chunked形式のボディをデコード
+
+    Parameters:
+        buffer (bytearray): 受信済みのデータ
+        start (int): ボディの開始位置
+
+    Returns:
+        tuple: (ボディ, ボディの終了位置)。データが足りない場合は (None, 0)
+    """
+    chunks = []
+    size = 0
+    position = start
+    while True:
+        line_end = buffer.find(b"\r\n", position)
+        if line_end < 0:
+            return None, 0
+        # チャンク拡張（";"以降）は無視する
+        size_text = bytes(buffer[position:line_end]).split(b";", 1)[0].strip()
+        if not _CHUNK_SIZE.fullmatch(size_text):
+            raise ValueError("chunked形式のチャンクサイズが不正です")
+        chunk_size = int(size_text, 16)
+        size += chunk_size
+        if size > MAX_BODY_SIZE:
+            raise ValueError("リクエストボディが大きすぎます")
+        position = line_end + 2
+
+        if chunk_size == 0:
+            break
+
+        chunk_end = position + chunk_size
+        if len(buffer) < chunk_end + 2:
+            return None, 0
+        if buffer[chunk_end:chunk_end + 2] != b"\r\n":
+            raise ValueError("chunked形式のチャンクの終端が不正です")
+        chunks.append(bytes(buffer[position:chunk_end]))
+        position = chunk_end + 2
+
+    # トレーラー（空行まで）は読み飛ばす
+    while True:
+        line_end = buffer.find(b"\r\n", position)
+        if line_end < 0:
+            if len(buffer) - position > MAX_HEADER_SIZE:
+                raise ValueError("リクエストヘッダーが大きすぎます")
+            return None, 0
+        if line_end == position:
+            return b"".join(chunks), line_end + 2
+        position = line_end + 2
+
+class HTTPRequest:
+    """受信したHTTPリクエスト"""
+
+    def __init__(self, method, target, version, headers, body=b""):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+        parts = urlsplit(target)
+        self.path = unquote(parts.path)
+        self.query = parts.query
+
+    @property
+    def keep_alive(self):
+        """レスポンス後も接続を維持するかどうか"""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @property
+    def is_websocket_upgrade(self):
+        """WebSocketへのアップグレード要求かどうか"""
+        return (
+            self.method == "GET"
+            and self.headers.get("upgrade", "").lower() == "websocket"
+            and "upgrade" in self.headers.get("connection", "").lower()
+        )
+
+def response(status, body=b"", content_type="text/plain; charset=utf-8", headers=None):
+    """
+    レスポンスを作成
+
+    Parameters:
+        status (int): ステータスコード
+        body (bytes | str): レスポンスボディ
+        content_type (str): Content-Type
+        headers (dict): 追加のヘッダー
+
+    Returns:
+        tuple: (ステータスコード, ヘッダー, ボディ)
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    response_headers = {"Content-Type": content_type}
+    if headers:
+        response_headers.update(headers)
+    return status, response_headers, body
+
+class HTTPProtocol(asyncio.Protocol):
+    """1つの接続でHTTPリクエストを順番に処理し、必要に応じてWebSocketに切り替える"""
+
+    def __init__(self, app, ws_factory, ws_paths=WEBSOCKET_PATHS):
+        """
+        Parameters:
+            app (callable): HTTPRequestを受け取りレスポンスを返すコルーチン関数
+            ws_factory (callable): WebSocketServerProtocolを作成する関数
+            ws_paths (tuple): WebSocketのアップグレードを受け付けるパス
+        """
+        self.app = app
+        self.ws_factory = ws_factory
+        self.ws_paths = ws_paths
+        self.transport = None
+        self.buffer = bytearray()
+        self.task = None
+        self.idle_handle = None
+        self.paused = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._reset_idle_timer()
+
+    def connection_lost(self, exc):
+        self.transport = None
+        if self.idle_handle is not None:
+            self.idle_handle.cancel()
+        if self.task is not None:
+            self.task.cancel()
+
+    def data_received(self, data):
+        self.buffer += data
+
+        # 処理中のリクエストがあれば完了後に続きを処理する（パイプライン）
+        if self.task is None:
+            self._process_buffer()
+        elif len(self.buffer) > MAX_BODY_SIZE and not self.paused:
+            self.transport.pause_reading()
+            self.paused = True
+
+    def _reset_idle_timer(self):
+        """keep-aliveのアイドルタイムアウトを設定し直す"""
+        if self.idle_handle is not None:
+            self.idle_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self.idle_handle = loop.call_later(KEEP_ALIVE_TIMEOUT, self._close)
+
+    def _close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def _parse_request(self):
+        """
+        バッファから1件分のリクエストを取り出す
+
+        Returns:
+            tuple: (HTTPRequest, 消費したバイト数)。データが足りない場合は (None, 0)
+        """
+        header_end = self.buffer.find(b"\r\n\r\n")
+        if header_end < 0:
+            if len(self.buffer) > MAX_HEADER_SIZE:
+                raise ValueError("リクエストヘッダーが大きすぎます")
+            return None, 0
+
+        lines = bytes(self.buffer[:header_end]).decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body_start = header_end + 4
+        transfer_encoding = headers.get("transfer-encoding")
+        if transfer_encoding is not None:
+            # Transfer-EncodingはContent-Lengthより優先する（chunked以外には対応しない）
+            if transfer_encoding.lower() != "chunked":
+                raise NotImplementedError(f"未対応のTransfer-Encodingです: {transfer_encoding}")
+            body, body_end = _parse_chunked(self.buffer, body_start)
+            if body is None:
+                return None, 0
+            return HTTPRequest(method, target, version, headers, body), body_end
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise ValueError("Content-Lengthが不正です")
+        if length < 0:
+            raise ValueError("Content-Lengthが不正です")
+        if length > MAX_BODY_SIZE:
+            raise ValueError("リクエストボディが大きすぎます")
+
+        if len(self.buffer) < body_start + length:
+            return None, 0
+
+        body = bytes(self.buffer[body_start:body_start + length])
+        return HTTPRequest(method, target, version, headers, body), body_start + length
+
+    def _process_buffer(self):
+        """バッファにある次のリクエストの処理を開始"""
+        if self.transport is None:
+            return
+
+        try:
+            request, consumed = self._parse_request()
+        except ValueError as e:
+            self._write_response(response(HTTPStatus.BAD_REQUEST, str(e)), keep_alive=False)
+            return
+        except NotImplementedError as e:
+            self._write_response(response(HTTPStatus.NOT_IMPLEMENTED, str(e)), keep_alive=False)
+            return
+
+        if request is None:
+            if self.paused:
+                self.transport.resume_reading()
+                self.paused = False
+            return
+
+        if request.is_websocket_upgrade:
+            if request.path in self.ws_paths:
+                self._upgrade()
+            else:
+                self._write_response(response(HTTPStatus.NOT_FOUND, "Not Found"), keep_alive=False)
+            return
+
+        del self.buffer[:consumed]
+
+        # 処理中（long-pollの待機中など）はアイドルタイムアウトで閉じない
+        if self.idle_handle is not None:
+            self.idle_handle.cancel()
+            self.idle_handle = None
+        self.task = asyncio.ensure_future(self._handle(request))
+
+    def _upgrade(self):
+        """接続をWebSocketのプロトコルに引き渡す（ハンドシェイクはwebsocketsが行う）"""
+        if self.idle_handle is not None:
+            self.idle_handle.cancel()
+            self.idle_handle = None
+
+        transport = self.transport
+        self.transport = None
+        if self.paused:
+            transport.resume_reading()
+
+        protocol = self.ws_factory()
+        transport.set_protocol(protocol)
+        protocol.connection_made(transport)
+
+        # 受信済みのアップグレード要求をそのまま渡す
+        protocol.data_received(bytes(self.buffer))
+        self.buffer.clear()
+
+    async def _handle(self, request):
+        """リクエストを処理してレスポンスを送信"""
+        try:
+            result = await self.app(request)
+        except Exception as e:
+            logger.error(f"HTTPリクエストの処理中にエラーが発生しました: {str(e)}")
+            result = response(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal Server Error")
+
+        self.task = None
+        self._write_response(result, request.keep_alive, head=request.method == "HEAD")
+
+        if request.keep_alive and self.transport is not None:
+            self._reset_idle_timer()
+            self._process_buffer()
+
+    def _write_response(self, result, keep_alive, head=False):
+        """レスポンスを書き込む"""
+        if self.transport is None:
+            return
+
+        status, headers, body = result
+        status = HTTPStatus(status)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        for name, value in headers.items():
+            lines.append(f"{name}: {value}")
+        if status not in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        head_bytes = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        self.transport.write(head_bytes if head else head_bytes + body)
+        if not keep_alive:
+            self.transport.close()
+
+def deflate_extensions(compression):
+    """
+    設定からWebSocketの圧縮（permessage-deflate）の拡張を作成
+
+    Parameters:
+        compression (dict): 圧縮の設定（enabled / level / windowBits / memLevel）。Noneの場合は圧縮しない
+
+    Returns:
+        list: serve() の extensions に渡す拡張（圧縮しない場合は空）
+    """
+    if not compression or not compression.get("enabled", False):
+        return []
+
+    window_bits = int(compression.get("windowBits", 12))
+    return [
+        ServerPerMessageDeflateFactory(
+            server_max_window_bits=window_bits,
+            client_max_window_bits=window_bits,
+            compress_settings={
+                "level": int(compression.get("level", 6)),
+                "memLevel": int(compression.get("memLevel", 5))
+            }
+        )
+    ]
+
+async def serve(app, ws_handler, host, port, ws_paths=WEBSOCKET_PATHS, reuse_port=False, **ws_options):
+    """
+    HTTPとWebSocketを1つのポートで提供するサーバーを起動
+
+    Parameters:
+        app (callable): HTTPRequestを受け取りレスポンスを返すコルーチン関数
+        ws_handler (callable): WebSocket接続のハンドラー（websockets.serveと同じ形式）
+        host (str): ホスト
+        port (int): ポート
+        ws_paths (tuple): WebSocketのアップグレードを受け付けるパス
+        reuse_port (bool): SO_REUSEPORTで複数のプロセスから同じポートを待ち受ける
+        **ws_options: WebSocketServerProtocolに渡すオプション
+
+    Returns:
+        WebSocketServer: close() / wait_closed() でWebSocket接続ごと終了できるサーバー
+    """
+    ws_server = WebSocketServer()
+    ws_options.setdefault("extensions", deflate_extensions(None))
+    ws_factory = functools.partial(
+        WebSocketServerProtocol, ws_handler, ws_server, host=host, port=port, **ws_options
+    )
+
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(
+        lambda: HTTPProtocol(app, ws_factory, ws_paths), host, port, reuse_port=reuse_port or None
+    )
+    ws_server.wrap(server)
+    return ws_server
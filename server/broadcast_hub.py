@@ -0,0 +1,196 @@
+import asyncio
+from time import perf_counter_ns
+from collections import deque
+import websockets
+from server import codec
+from utils.logger import get_logger
+from utils.metrics import SEND_SECONDS, timing_sampler
+
+# ロガーの取得
+logger = get_logger()
+
+# 送信キューのデフォルト上限（フレーム数）
+DEFAULT_QUEUE_SIZE = 64
+
+# 送信時間を計測するメッセージを間引く
+should_time = timing_sampler()
+
+# ゲーム（プロデューサー）からのフレームに含まれるキー
+GAME_DATA_KEYS = ("gameState", "player", "squad", "match")
+
+def is_game_frame(data):
+    """
+    受信データがゲームからのフレームかどうかを判定
+
+    Parameters:
+        data: json.loadsしたデータ
+
+    Returns:
+        bool: ゲームデータのフレームであればTrue
+    """
+    if not isinstance(data, dict) or "type" in data:
+        # typeを持つメッセージはオーバーレイからの制御メッセージ（helloなど）
+        return False
+
+    # LiveAPIのイベント形式（categoryを持つ）
+    if "category" in data:
+        return True
+
+    for key in GAME_DATA_KEYS:
+        if key in data:
+            return True
+    return False
+
+class ConsumerQueue:
+    """オーバーレイクライアント1つ分の送信キューと送信タスク"""
+
+    def __init__(self, websocket, max_size=DEFAULT_QUEUE_SIZE, wire_format=codec.SUBPROTOCOL_JSON):
+        self.websocket = websocket
+        self.max_size = max_size
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.task = None
+
+        # 接続のサブプロトコルに対応する配信メッセージの形式
+        self.wire_format = wire_format
+
+        # カウンター
+        self.sent = 0
+        self.dropped = 0
+
+    def put(self, message):
+        """
+        メッセージをキューに積む（満杯の場合は最も古いものを破棄）
+
+        Parameters:
+            message (OutgoingMessage | str): 配信メッセージ（OutgoingMessageは接続の形式でエンコードする）
+        """
+        if len(self.queue) >= self.max_size:
+            self.queue.popleft()
+            self.dropped += 1
+
+        if isinstance(message, codec.OutgoingMessage):
+            message = message.encode(self.wire_format)
+        self.queue.append(message)
+        self.ready.set()
+
+    def start(self):
+        """送信タスクを開始"""
+        self.task = asyncio.ensure_future(self._writer())
+
+    async def stop(self):
+        """送信タスクを停止"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self.task = None
+
+    async def _writer(self):
+        """キューの内容を順番に送信する"""
+        try:
+            while True:
+                if not self.queue:
+                    self.ready.clear()
+                    await self.ready.wait()
+                    continue
+
+                message = self.queue.popleft()
+                if should_time():
+                    started = perf_counter_ns()
+                    await self.websocket.send(message)
+                    SEND_SECONDS.observe_ns(perf_counter_ns() - started)
+                else:
+                    await self.websocket.send(message)
+                self.sent += 1
+        except websockets.exceptions.ConnectionClosed:
+            logger.info(f"送信中にクライアント接続が閉じられました: {self.websocket.remote_address}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"送信中にエラーが発生しました: {str(e)}")
+
+    def get_stats(self):
+        """キューの統計情報を取得"""
+        return {
+            "address": str(self.websocket.remote_address),
+            "subprotocol": getattr(self.websocket, "subprotocol", None),
+            "queueDepth": len(self.queue),
+            "sent": self.sent,
+            "dropped": self.dropped
+        }
+
+class BroadcastHub:
+    """ゲームからの入力を複数のオーバーレイへ配信するハブ"""
+
+    def __init__(self, max_queue_size=DEFAULT_QUEUE_SIZE):
+        self.max_queue_size = max_queue_size
+
+        # ゲーム側の接続
+        self.producers = set()
+
+        # オーバーレイ側の接続（websocket -> ConsumerQueue）
+        self.consumers = {}
+
+        # 切断済みクライアントも含めた破棄フレーム数
+        self.dropped_total = 0
+
+    def add_consumer(self, websocket):
+        """オーバーレイクライアントを登録（配信メッセージは接続のサブプロトコルの形式で送る）"""
+        wire_format = codec.wire_format(getattr(websocket, "subprotocol", None))
+        consumer = ConsumerQueue(websocket, self.max_queue_size, wire_format)
+        self.consumers[websocket] = consumer
+        consumer.start()
+        return consumer
+
+    async def remove(self, websocket):
+        """接続を登録解除"""
+        self.producers.discard(websocket)
+        consumer = self.consumers.pop(websocket, None)
+        if consumer is not None:
+            self.dropped_total += consumer.dropped
+            await consumer.stop()
+
+    async def promote_to_producer(self, websocket):
+        """接続をゲーム（プロデューサー）として扱う"""
+        if websocket in self.producers:
+            return
+
+        consumer = self.consumers.pop(websocket, None)
+        if consumer is not None:
+            self.dropped_total += consumer.dropped
+            await consumer.stop()
+
+        self.producers.add(websocket)
+        logger.info(f"ゲーム接続として登録しました: {websocket.remote_address}")
+
+    def is_producer(self, websocket):
+        """接続がプロデューサーかどうか"""
+        return websocket in self.producers
+
+    def publish(self, message):
+        """全オーバーレイクライアントの送信キューにメッセージを積む"""
+        for consumer in self.consumers.values():
+            consumer.put(message)
+
+    def send_to(self, websocket, message):
+        """特定のオーバーレイクライアントにメッセージを送信"""
+        consumer = self.consumers.get(websocket)
+        if consumer is not None:
+            consumer.put(message)
+
+    def get_stats(self):
+        """ハブ全体の統計情報を取得"""
+        consumers = [consumer.get_stats() for consumer in self.consumers.values()]
+        dropped = self.dropped_total + sum(c["dropped"] for c in consumers)
+
+        return {
+            "producers": len(self.producers),
+            "consumers": len(consumers),
+            "queueDepth": sum(c["queueDepth"] for c in consumers),
+            "maxQueueDepth": max((c["queueDepth"] for c in consumers), default=0),
+            "dropped": dropped,
+            "clients": consumers
+        }
@@ -0,0 +1,540 @@
+import asyncio
+import re
+from time import perf_counter_ns
+from urllib.parse import urlsplit, parse_qs
+from apex_api import ApexAPI
+from server import codec
+from server.state_stream import StateStream
+from server.conflation import Conflator, DEFAULT_TICK_RATE
+from utils.logger import get_logger
+from utils.metrics import SERIALIZE_SECONDS
+
+# ロガーの取得
+logger = get_logger()
+
+# チャンネルを指定しない接続が使うチャンネル
+DEFAULT_CHANNEL = "default"
+
+# チャンネル名に使える文字（英数字と - _ .、最大64文字）
+CHANNEL_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.\-]{1,64}$")
+
+# 作成できるチャンネル数の上限（チャンネルはゲームからのデータの受信時にだけ作成する）
+MAX_CHANNELS = 64
+
+# 1つの接続が購読できるチャンネル数の上限（まだ存在しないチャンネルの購読を含む）
+MAX_SUBSCRIPTIONS = 16
+
+# チャンネル名とトピック名の区切り（"lobby1/match" でチャンネルのトピックを表す）
+TOPIC_SEPARATOR = "/"
+
+def is_valid_channel(name):
+    """チャンネル名（トピック名）が有効かどうか"""
+    return isinstance(name, str) and CHANNEL_NAME_PATTERN.match(name) is not None
+
+def topic_key(channel, topic=None):
+    """チャンネルのトピックを表すキー（トピックがなければチャンネル名）"""
+    return channel if topic is None else f"{channel}{TOPIC_SEPARATOR}{topic}"
+
+def split_key(key):
+    """
+    キーをチャンネル名とトピック名に分ける
+
+    Returns:
+        tuple: (チャンネル名, トピック名またはNone)。無効なキーの場合は (None, None)
+    """
+    channel, _, topic = key.partition(TOPIC_SEPARATOR)
+    if not is_valid_channel(channel) or (topic and not is_valid_channel(topic)):
+        return None, None
+    return channel, topic or None
+
+def parse_topics(values):
+    """
+    購読するトピックの指定を正規化
+
+    Parameters:
+        values (str | list): "match,squad" またはトピック名のリスト
+
+    Returns:
+        tuple: トピック名（指定がない、または "*" の場合はNone = すべて）
+    """
+    if isinstance(values, str):
+        values = values.split(",")
+    if not isinstance(values, (list, tuple)):
+        return None
+
+    topics = []
+    for topic in values:
+        topic = str(topic).strip()
+        if topic == "*":
+            return None
+        if is_valid_channel(topic) and topic not in topics:
+            topics.append(topic)
+    return tuple(topics) or None
+
+def parse_query_topics(path):
+    """接続パスのクエリ（"/ws?topics=match,squad"）から購読するトピックを取得"""
+    query = parse_qs(urlsplit(path or "").query)
+    return parse_topics(",".join(query.get("topics", [])))
+
+def parse_channels(path):
+    """
+    接続パスのクエリからチャンネル名を取得
+
+    "/ws?channel=lobby1,lobby2" や "/?channel=lobby1&channel=lobby2" の形式に対応する。
+
+    Parameters:
+        path (str): WebSocketの接続パス（クエリを含む）
+
+    Returns:
+        list: チャンネル名（指定がない場合は [DEFAULT_CHANNEL]）
+    """
+    query = parse_qs(urlsplit(path or "").query)
+    channels = []
+    for value in query.get("channel", []):
+        for name in value.split(","):
+            name = name.strip()
+            if is_valid_channel(name) and name not in channels:
+                channels.append(name)
+    return channels or [DEFAULT_CHANNEL]
+
+class Channel:
+    """1つのマッチ（オブザーバー）分の処理状態と購読者"""
+
+    def __init__(self, name, send, tick_rate=DEFAULT_TICK_RATE):
+        """
+        Parameters:
+            name (str): チャンネル名
+            send (callable): (websocket, message) を受け取り送信キューに積む関数
+            tick_rate (float): 差分を配信する最大レート（Hz）
+        """
+        self.name = name
+        self.send = send
+
+        # チャンネルごとに独立した処理状態
+        self.api = ApexAPI()
+        self.stream = StateStream()
+        self.conflator = Conflator(self.publish_state, tick_rate)
+
+        # 購読しているオーバーレイ（全体） / データを送ってくるゲーム接続
+        self.subscribers = set()
+        self.producers = set()
+
+        # トピック名 -> トピックだけを購読しているオーバーレイ
+        self.topic_subscribers = {}
+
+        # トピックごとのシーケンス番号（トピックの差分を送るたびに増える）
+        self.topic_seq = {}
+
+        # 受信フレームの記録（有効な場合のみ）
+        self.recorder = None
+
+        # 配信メッセージを他のプロセスへ中継する関数（ワーカーモードのみ）
+        self.relay = None
+
+        # 状態の更新を待っている /api/state のlong-poll
+        self.state_waiters = set()
+
+    def add_subscriber(self, websocket, topics=None):
+        """オーバーレイを登録（topicsを指定した場合はそのトピックだけ）"""
+        if topics is None:
+            self.subscribers.add(websocket)
+            return
+        for topic in topics:
+            self.topic_subscribers.setdefault(topic, set()).add(websocket)
+
+    def remove_subscriber(self, websocket, topics=None):
+        """オーバーレイの登録を解除"""
+        if topics is None:
+            self.subscribers.discard(websocket)
+            return
+        for topic in topics:
+            subscribers = self.topic_subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(websocket)
+                if not subscribers:
+                    del self.topic_subscribers[topic]
+
+    def publish(self, message):
+        """
+        購読しているすべてのオーバーレイにメッセージを配信（エラーなど）
+
+        Parameters:
+            message (OutgoingMessage): 配信メッセージ
+        """
+        recipients = set(self.subscribers)
+        for subscribers in self.topic_subscribers.values():
+            recipients.update(subscribers)
+        for websocket in recipients:
+            self.send(websocket, message)
+        if self.relay is not None:
+            self.relay(self.name, message)
+
+    def publish_state(self, snapshot):
+        """スナップショットの差分を購読者に配信（全体とトピックごとに形式ごとに1回だけシリアライズ）"""
+        started = perf_counter_ns()
+        patch = self.stream.update(snapshot)
+        if patch is None:
+            return
+        if self.state_waiters:
+            self._wake_state_waiters()
+
+        patch["channel"] = self.name
+        message = codec.OutgoingMessage(patch)
+        for websocket in self.subscribers:
+            self.send(websocket, message)
+        if self.relay is not None:
+            self.relay(self.name, message)
+        SERIALIZE_SECONDS.observe_ns(perf_counter_ns() - started)
+
+        # トピックの購読者がいる場合のみトピックごとに分割
+        # （購読がない間はトピックのシーケンス番号も進めない。購読時にキーフレームを送るため）
+        if not self.topic_subscribers and self.relay is None:
+            return
+        for topic, topic_patch in self.split_topics(patch):
+            topic_message = codec.OutgoingMessage(topic_patch)
+            for websocket in self.topic_subscribers.get(topic, ()):
+                self.send(websocket, topic_message)
+            if self.relay is not None:
+                self.relay(topic_key(self.name, topic), topic_message)
+
+    def _next_topic_seq(self, topic):
+        seq = self.topic_seq.get(topic, 0) + 1
+        self.topic_seq[topic] = seq
+        return seq
+
+    def split_topics(self, patch):
+        """
+        差分をトピック（最上位のキー）ごとに分割
+
+        パスはそのまま（"match.remainingSquads"）なので、クライアントは同じ方法で適用できる。
+
+        Returns:
+            list: (トピック名, キーフレーム/パッチ) のリスト
+        """
+        if patch["type"] == "keyframe":
+            return [
+                (topic, {
+                    "type": "keyframe",
+                    "channel": self.name,
+                    "topic": topic,
+                    "seq": self._next_topic_seq(topic),
+                    "state": {topic: value}
+                })
+                for topic, value in patch["state"].items()
+            ]
+
+        grouped = {}
+        for path, value in patch["set"].items():
+            topic = path.split(".", 1)[0]
+            grouped.setdefault(topic, ({}, []))[0][path] = value
+        for path in patch.get("del", ()):
+            topic = path.split(".", 1)[0]
+            grouped.setdefault(topic, ({}, []))[1].append(path)
+
+        topic_patches = []
+        for topic, (changes, removed) in grouped.items():
+            topic_patch = {
+                "type": "patch",
+                "channel": self.name,
+                "topic": topic,
+                "seq": self._next_topic_seq(topic),
+                "set": changes
+            }
+            if removed:
+                topic_patch["del"] = removed
+            topic_patches.append((topic, topic_patch))
+        return topic_patches
+
+    def _wake_state_waiters(self):
+        waiters = self.state_waiters
+        self.state_waiters = set()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def wait_for_state(self, since=None, timeout=None):
+        """
+        バージョン（シーケンス番号）がsinceと異なる状態を待つ（long-poll用）
+
+        サーバーの再起動などでsinceの方が新しい場合も、すぐに現在の状態を返す。
+
+        Parameters:
+            since (int): クライアントが持っている状態のバージョン（Noneは状態なし）
+            timeout (float): 待つ最大の秒数
+
+        Returns:
+            bool: 新しい状態があるかどうか（タイムアウトした場合はFalse）
+        """
+        if self.stream.state is not None and self.stream.seq != since:
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.state_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.state_waiters.discard(waiter)
+
+    def state_snapshot(self, topics=None):
+        """
+        現在の状態とバージョン（/api/state用）
+
+        Parameters:
+            topics (tuple): 含めるトピック（Noneはすべて）
+        """
+        state = self.stream.state or {}
+        if topics is not None:
+            state = {topic: state[topic] for topic in topics if topic in state}
+        return {
+            "channel": self.name,
+            "version": self.stream.seq,
+            "state": state
+        }
+
+    def keyframe_message(self):
+        """
+        現在の状態全体のメッセージ
+
+        Returns:
+            OutgoingMessage: 配信メッセージ。状態がまだなければNone
+        """
+        keyframe = self.stream.keyframe()
+        if keyframe is None:
+            return None
+        keyframe["channel"] = self.name
+        return codec.OutgoingMessage(keyframe)
+
+    def topic_keyframe_message(self, topic):
+        """
+        トピックの現在の状態のメッセージ（トピックがまだ状態になければ空の状態）
+
+        Returns:
+            OutgoingMessage: 配信メッセージ。チャンネルの状態がまだなければNone
+        """
+        if self.stream.state is None:
+            return None
+        state = {topic: self.stream.state[topic]} if topic in self.stream.state else {}
+        return codec.OutgoingMessage({
+            "type": "keyframe",
+            "channel": self.name,
+            "topic": topic,
+            "seq": self.topic_seq.get(topic, 0),
+            "state": state
+        })
+
+    def keyframe_messages(self, topics=None):
+        """購読の内容（全体またはトピック）に応じたキーフレームのメッセージ"""
+        if topics is None:
+            messages = [self.keyframe_message()]
+        else:
+            messages = [self.topic_keyframe_message(topic) for topic in topics]
+        return [message for message in messages if message is not None]
+
+    def get_stats(self):
+        """統計情報を取得"""
+        return {
+            "name": self.name,
+            "seq": self.stream.seq,
+            "producers": len(self.producers),
+            "subscribers": len(self.subscribers),
+            "topicSubscribers": {topic: len(subscribers) for topic, subscribers in self.topic_subscribers.items()},
+            "conflation": self.conflator.get_stats()
+        }
+
+class ChannelRouter:
+    """
+    チャンネル名ごとに処理状態と購読者を管理する
+
+    配信はチャンネルの購読者だけを辿るため、全クライアント数ではなく
+    購読者数に比例したコストで済む。
+    """
+
+    def __init__(self, send, tick_rate=DEFAULT_TICK_RATE):
+        """
+        Parameters:
+            send (callable): (websocket, message) を受け取り送信キューに積む関数
+            tick_rate (float): 各チャンネルの差分を配信する最大レート（Hz）
+        """
+        self.send = send
+        self.tick_rate = tick_rate
+
+        # チャンネル名 -> Channel
+        self.channels = {}
+
+        # websocket -> 購読しているチャンネル名の集合
+        self.subscriptions = {}
+
+        # websocket -> データを送ってくるチャンネル名
+        self.producer_channels = {}
+
+        # websocket -> 購読しているトピック（Noneはすべて）
+        self.topics = {}
+
+        # まだ存在しないチャンネル名 -> 作成を待っている購読者
+        self.pending = {}
+
+        # チャンネルの作成時に呼び出す関数（記録の開始など）
+        self.on_create = None
+
+        # 配信メッセージを他のプロセスへ中継する関数（ワーカーモードのみ）
+        self.relay = None
+
+    def get(self, name=DEFAULT_CHANNEL):
+        """
+        チャンネルを取得（なければ作成。ゲームからのデータの受信時にだけ使う）
+
+        作成を待っていた購読者はこの時点でチャンネルに登録する。
+        チャンネル数が上限に達している場合はValueErrorを送出する。
+        """
+        channel = self.channels.get(name)
+        if channel is None:
+            if len(self.channels) >= MAX_CHANNELS:
+                raise ValueError(f"チャンネル数が上限（{MAX_CHANNELS}）に達しているため作成できません: {name}")
+            channel = Channel(name, self.send, self.tick_rate)
+            channel.relay = self.relay
+            self.channels[name] = channel
+            logger.info(f"チャンネルを作成しました: {name}")
+            for websocket in self.pending.pop(name, ()):
+                channel.add_subscriber(websocket, self.topics.get(websocket))
+            if self.on_create is not None:
+                self.on_create(channel)
+        return channel
+
+    def set_relay(self, relay):
+        """
+        全チャンネルの配信メッセージを中継する関数を設定
+
+        Parameters:
+            relay (callable): (チャンネル名, OutgoingMessage) を受け取る関数
+        """
+        self.relay = relay
+        for channel in self.channels.values():
+            channel.relay = relay
+
+    def subscribe(self, websocket, names):
+        """
+        オーバーレイをチャンネルに登録（購読しているトピックだけを受け取る）
+
+        まだ存在しないチャンネルは作成せず、ゲームからのデータでチャンネルが作成された時点で登録する。
+
+        Returns:
+            list: 新たに購読した（存在する）チャンネル
+        """
+        subscribed = self.subscriptions.setdefault(websocket, set())
+        topics = self.topics.get(websocket)
+        added = []
+        for name in names:
+            if not is_valid_channel(name) or name in subscribed:
+                continue
+            if len(subscribed) >= MAX_SUBSCRIPTIONS:
+                logger.warning(f"購読できるチャンネル数の上限（{MAX_SUBSCRIPTIONS}）に達しました: {websocket.remote_address}")
+                break
+            subscribed.add(name)
+            channel = self.channels.get(name)
+            if channel is None:
+                self.pending.setdefault(name, set()).add(websocket)
+                continue
+            channel.add_subscriber(websocket, topics)
+            added.append(channel)
+        return added
+
+    def unsubscribe(self, websocket, names=None):
+        """オーバーレイのチャンネル登録を解除（namesがNoneの場合はすべて）"""
+        subscribed = self.subscriptions.get(websocket)
+        if not subscribed:
+            return
+        topics = self.topics.get(websocket)
+        for name in list(subscribed if names is None else names):
+            if name not in subscribed:
+                continue
+            subscribed.discard(name)
+            channel = self.channels.get(name)
+            if channel is not None:
+                channel.remove_subscriber(websocket, topics)
+                continue
+            waiting = self.pending.get(name)
+            if waiting is not None:
+                waiting.discard(websocket)
+                if not waiting:
+                    del self.pending[name]
+
+    def set_topics(self, websocket, topics):
+        """
+        オーバーレイが購読するトピックを変更（購読中のチャンネルすべてに適用）
+
+        Parameters:
+            topics (tuple): トピック名（Noneはすべて）
+
+        Returns:
+            list: 購読中のチャンネル
+        """
+        previous = self.topics.get(websocket)
+        channels = self.subscribed_channels(websocket)
+        for channel in channels:
+            channel.remove_subscriber(websocket, previous)
+            channel.add_subscriber(websocket, topics)
+
+        if topics is None:
+            self.topics.pop(websocket, None)
+        else:
+            self.topics[websocket] = topics
+        return channels
+
+    def keyframe_for(self, key):
+        """
+        "チャンネル" または "チャンネル/トピック" のキーフレーム（ワーカーからの要求用）
+
+        Returns:
+            OutgoingMessage: 配信メッセージ。状態がまだなければNone
+        """
+        name, topic = split_key(key)
+        channel = self.channels.get(name) if name is not None else None
+        if channel is None:
+            return None
+        if topic is None:
+            return channel.keyframe_message()
+        return channel.topic_keyframe_message(topic)
+
+    def subscribed_channels(self, websocket):
+        """オーバーレイが購読しているチャンネル（作成を待っているものは除く）"""
+        return [self.channels[name] for name in self.subscriptions.get(websocket, ()) if name in self.channels]
+
+    def set_producer(self, websocket, name):
+        """
+        接続をチャンネルのゲーム（プロデューサー）として登録
+
+        オーバーレイとしての購読は解除する。
+
+        Returns:
+            Channel: データを処理するチャンネル
+        """
+        channel = self.get(name)
+        self.unsubscribe(websocket)
+        self.subscriptions.pop(websocket, None)
+        self.topics.pop(websocket, None)
+
+        channel.producers.add(websocket)
+        self.producer_channels[websocket] = name
+        return channel
+
+    def producer_channel(self, websocket):
+        """ゲーム接続がデータを送っているチャンネル（ゲーム接続でなければNone）"""
+        name = self.producer_channels.get(websocket)
+        return None if name is None else self.channels[name]
+
+    def remove(self, websocket):
+        """切断した接続の登録をすべて解除"""
+        self.unsubscribe(websocket)
+        self.subscriptions.pop(websocket, None)
+        self.topics.pop(websocket, None)
+
+        name = self.producer_channels.pop(websocket, None)
+        if name is not None:
+            self.channels[name].producers.discard(websocket)
+
+    def get_stats(self):
+        """全チャンネルの統計情報を取得"""
+        return [channel.get_stats() for channel in self.channels.values()]
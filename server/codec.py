@@ -0,0 +1,97 @@
+import json
+from server import msgpack_codec
+
+# orjsonがインストールされていれば高速なエンコーダーを使用
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 使用中のJSONバックエンド名
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def encode(message):
+        """メッセージをJSONのバイト列にエンコード"""
+        return orjson.dumps(message, option=_ORJSON_OPTIONS)
+
+    def encode_text(message):
+        """メッセージをJSON文字列にエンコード（WebSocketのテキストフレーム用）"""
+        return orjson.dumps(message, option=_ORJSON_OPTIONS).decode("utf-8")
+
+    def decode(data):
+        """JSON（文字列またはバイト列）をデコード"""
+        return orjson.loads(data)
+else:
+    def encode(message):
+        """メッセージをJSONのバイト列にエンコード"""
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def encode_text(message):
+        """メッセージをJSON文字列にエンコード（WebSocketのテキストフレーム用）"""
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+    def decode(data):
+        """JSON（文字列またはバイト列）をデコード"""
+        return json.loads(data)
+
+# WebSocketのサブプロトコル（オーバーレイが接続時に指定する。指定がなければJSON）
+SUBPROTOCOL_JSON = "apex-overlay.json"
+SUBPROTOCOL_MSGPACK = "apex-overlay.msgpack"
+
+# サーバーが受け付けるサブプロトコル（優先順）
+SUBPROTOCOLS = (SUBPROTOCOL_MSGPACK, SUBPROTOCOL_JSON)
+
+# サブプロトコル -> 配信メッセージのエンコード関数（JSONはテキストフレーム、MessagePackはバイナリフレーム）
+ENCODERS = {
+    SUBPROTOCOL_JSON: encode_text,
+    SUBPROTOCOL_MSGPACK: msgpack_codec.pack,
+}
+
+def wire_format(subprotocol):
+    """接続のサブプロトコルに対応する配信メッセージの形式（指定がなければJSON）"""
+    return subprotocol if subprotocol in ENCODERS else SUBPROTOCOL_JSON
+
+class OutgoingMessage:
+    """
+    配信メッセージ
+
+    元のdictを保持し、送信先の接続の形式ごとに初めて必要になった時点で1回だけエンコードする。
+    同じメッセージを多数の接続に送ってもエンコードは形式ごとに1回で、使われない形式はエンコードしない。
+    """
+
+    __slots__ = ("payload", "encoded")
+
+    def __init__(self, payload=None, encoded=None):
+        """
+        Parameters:
+            payload (dict): 配信するメッセージ（エンコード後は変更しない）
+            encoded (dict): 形式 -> エンコード済みのデータ（他のプロセスから届いたメッセージ用）
+        """
+        self.payload = payload
+        self.encoded = encoded if encoded is not None else {}
+
+    def encode(self, wire_format=SUBPROTOCOL_JSON):
+        """
+        指定した形式のデータ（初回のみエンコード）
+
+        Parameters:
+            wire_format (str): 形式（サブプロトコル）
+
+        Returns:
+            str | bytes: JSON文字列またはMessagePackのバイト列
+        """
+        data = self.encoded.get(wire_format)
+        if data is None:
+            if self.payload is None:
+                # エンコード済みのデータだけを持つメッセージに別の形式が必要になった場合
+                self.payload = decode(self.encoded[SUBPROTOCOL_JSON])
+            data = self.encoded[wire_format] = ENCODERS[wire_format](self.payload)
+        return data
+
+    @property
+    def text(self):
+        """JSON文字列"""
+        return self.encode(SUBPROTOCOL_JSON)
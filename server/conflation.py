@@ -0,0 +1,109 @@
+import asyncio
+import time
+from utils.logger import get_logger
+
+# ロガーの取得
+logger = get_logger()
+
+# デフォルトの配信レート（Hz）
+DEFAULT_TICK_RATE = 30
+
+# 変化したら即座に配信する項目
+CRITICAL_FIELDS = (
+    ("gameState",),
+    ("match", "inProgress"),
+    ("match", "squadEliminated"),
+)
+
+def get_field(snapshot, path):
+    """ネストしたスナップショットから値を取得"""
+    current = snapshot
+    for key in path:
+        if not isinstance(current, dict):
+            return None
+        current = current.get(key)
+    return current
+
+class Conflator:
+    """一定間隔（ティック）内の更新をまとめて1回の配信にする"""
+
+    def __init__(self, flush_callback, tick_rate=DEFAULT_TICK_RATE):
+        """
+        Parameters:
+            flush_callback (callable): まとめたスナップショットを受け取る関数
+            tick_rate (float): 1秒あたりの最大配信回数（0以下でまとめない）
+        """
+        self.flush_callback = flush_callback
+        self.interval = 1.0 / tick_rate if tick_rate and tick_rate > 0 else 0
+
+        # 未配信の最新スナップショット
+        self.pending = None
+
+        # 直前に受け取ったスナップショット（重要な変化の検出用）
+        self.last = None
+
+        self.last_flush = 0.0
+        self.handle = None
+
+        # カウンター
+        self.submitted = 0
+        self.flushed = 0
+
+    def is_critical(self, snapshot):
+        """即時配信すべき変化（マッチ開始/終了、敗退など）かどうか"""
+        if self.last is None:
+            return True
+
+        for path in CRITICAL_FIELDS:
+            if get_field(snapshot, path) != get_field(self.last, path):
+                return True
+        return False
+
+    def submit(self, snapshot):
+        """
+        処理済みスナップショットを受け付ける
+
+        Parameters:
+            snapshot (dict): process_dataの戻り値
+        """
+        self.submitted += 1
+        critical = self.is_critical(snapshot)
+        self.last = snapshot
+        self.pending = snapshot
+
+        now = time.monotonic()
+        if critical or now - self.last_flush >= self.interval:
+            # 重要な変化、または前回の配信から十分時間が経っていれば即時配信
+            self.flush()
+        elif self.handle is None:
+            # 次のティックで配信
+            delay = self.interval - (now - self.last_flush)
+            self.handle = asyncio.get_running_loop().call_later(delay, self.flush)
+
+    def flush(self):
+        """未配信のスナップショットを配信"""
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+        if self.pending is None:
+            return
+
+        snapshot = self.pending
+        self.pending = None
+        self.last_flush = time.monotonic()
+        self.flushed += 1
+
+        try:
+            self.flush_callback(snapshot)
+        except Exception as e:
+            logger.error(f"配信処理中にエラーが発生しました: {str(e)}")
+
+    def get_stats(self):
+        """統計情報を取得"""
+        return {
+            "tickRate": 1.0 / self.interval if self.interval else 0,
+            "submitted": self.submitted,
+            "flushed": self.flushed,
+            "conflated": self.submitted - self.flushed
+        }
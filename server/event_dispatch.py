@@ -0,0 +1,83 @@
+from server.liveapi_proto import EVENT_SCHEMAS, PLAYER, category_name
+
+# LiveAPIのイベント種類（category）ごとの処理を辞書で引くレジストリ
+#
+# 種類の数が増えてもif/elifの連鎖のように比較が増えないよう、処理関数は辞書から1回で引く。
+# 未登録の種類は辞書を引くだけで処理を終える（呼び出し側の高速パス）。
+
+class EventRegistry:
+    """イベント種類 -> 処理関数 の対応表"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, *categories):
+        """
+        処理関数を登録するデコレーター
+
+        Parameters:
+            categories (str): 処理するイベント種類（複数指定可）
+        """
+        def register(function):
+            for category in categories:
+                if category in self.handlers:
+                    raise ValueError(f"イベント種類 '{category}' の処理は登録済みです")
+                self.handlers[category] = function
+            return function
+        return register
+
+    def get(self, category):
+        """イベント種類の処理関数（未登録の場合はNone）"""
+        return self.handlers.get(category)
+
+    def __contains__(self, category):
+        return category in self.handlers
+
+    def categories(self):
+        """登録済みのイベント種類"""
+        return tuple(self.handlers)
+
+# イベント種類 -> プレイヤー情報を持つフィールド（フィールド名, 繰り返しかどうか）
+EVENT_PLAYER_FIELDS = {
+    category_name(message_name): tuple(
+        (name, repeated)
+        for name, kind, schema, repeated in schema.values()
+        if kind == "message" and schema is PLAYER
+    )
+    for message_name, schema in EVENT_SCHEMAS.items()
+}
+
+def event_players(event, category=None):
+    """
+    イベントに含まれるプレイヤー情報を取得
+
+    スキーマのある種類はプレイヤーのフィールドだけを見る。スキーマにない種類は
+    すべての値から name を持つdict（とリスト内のdict）を探す。
+
+    Parameters:
+        event (dict): "category"を含むイベント
+        category (str): イベント種類（省略時はevent["category"]）
+
+    Returns:
+        list: プレイヤー情報のdictのリスト
+    """
+    fields = EVENT_PLAYER_FIELDS.get(category if category is not None else event.get("category"))
+    players = []
+    if fields is None:
+        for value in event.values():
+            if isinstance(value, dict) and "name" in value:
+                players.append(value)
+            elif isinstance(value, list):
+                players.extend(item for item in value if isinstance(item, dict))
+        return players
+
+    for name, repeated in fields:
+        value = event.get(name)
+        if value is None:
+            continue
+        if repeated:
+            if isinstance(value, list):
+                players.extend(item for item in value if isinstance(item, dict))
+        elif isinstance(value, dict) and "name" in value:
+            players.append(value)
+    return players
@@ -0,0 +1,242 @@
+from array import array
+from server.analytics import StringDictionary
+from server.match_stats import event_time
+
+# 直近のイベントを固定サイズのリングバッファに保持する（キルフィード・直近N秒のグラフ・リプレイのマーカー用）
+#
+# 領域は作成時に確保し、満杯になったら最も古いイベントから上書きするため、
+# イベントの頻度やマッチの長さに関わらずメモリ使用量は一定。
+# 1件は列ごとの配列に数値として格納し（時刻・種類・プレイヤー・対象・値・武器）、
+# 文字列は整数コードに置き換える。時刻は単調増加に揃えて格納するので、
+# 「直近N秒」の範囲は二分探索で求め、範囲内だけを走査する。
+
+# 保持するイベント数のデフォルト（1件あたり32バイト）
+DEFAULT_CAPACITY = 4096
+
+# 文字列（イベント種類・プレイヤー名・武器名）の登録数の上限（超えた分は記録しない）
+MAX_STRINGS = 1024
+
+# 文字列がないことを表すコード
+NO_STRING = -1
+
+# イベントの主体（先にあるキーを優先）・対象・値を取り出すキー
+ACTOR_KEYS = ("awardedTo", "attacker", "player", "target")
+TARGET_KEYS = ("victim",)
+VALUE_KEYS = ("damageInflicted", "newValue", "stage")
+
+def _player_name(value):
+    if isinstance(value, dict):
+        return value.get("name") or None
+    return None
+
+class EventRing:
+    """マッチ中のイベントを固定メモリで保持するリングバッファ"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Parameters:
+            capacity (int): 保持するイベント数
+        """
+        self.capacity = capacity
+
+        # 列ごとに確保済みの配列
+        self.times = array("d", bytes(8 * capacity))
+        self.types = array("i", bytes(4 * capacity))
+        self.actors = array("i", bytes(4 * capacity))
+        self.targets = array("i", bytes(4 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.weapons = array("i", bytes(4 * capacity))
+
+        self.reset()
+
+    def reset(self):
+        """保持しているイベントを破棄（マッチ開始時。配列は再利用する）"""
+        # 文字列 <-> コード
+        self.strings = StringDictionary()
+
+        # 書き込んだ件数の合計（次に書き込む位置は written % capacity）
+        self.written = 0
+
+        # 最後に書き込んだイベントの時刻
+        self.latest = None
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def _code(self, value):
+        """文字列のコード（上限を超えた新しい文字列はNO_STRING）"""
+        if value is None:
+            return NO_STRING
+        code = self.strings.lookup(value)
+        if code is None:
+            if len(self.strings.values) >= MAX_STRINGS:
+                return NO_STRING
+            code = self.strings.encode(value)
+        return code
+
+    def append(self, now, category, actor=None, target=None, value=0.0, weapon=None):
+        """
+        イベントを1件追加（満杯の場合は最も古いイベントを上書き）
+
+        Parameters:
+            now (float): イベントの時刻（直前のイベントより前の場合は直前の時刻に揃える）
+            category (str): イベントの種類
+            actor (str): 主体のプレイヤー名
+            target (str): 対象のプレイヤー名
+            value (float): 値（ダメージ量など）
+            weapon (str): 武器名
+        """
+        if self.latest is not None and now < self.latest:
+            now = self.latest
+        self.latest = now
+
+        index = self.written % self.capacity
+        self.times[index] = now
+        self.types[index] = self._code(category)
+        self.actors[index] = self._code(actor)
+        self.targets[index] = self._code(target)
+        self.values[index] = value
+        self.weapons[index] = self._code(weapon)
+        self.written += 1
+
+    def on_event(self, event, now=None):
+        """
+        LiveAPIのイベントを記録
+
+        Parameters:
+            event (dict): "category"を含むイベント
+            now (float): イベントの時刻（省略時はイベントのtimestamp、なければ現在時刻）
+        """
+        category = event.get("category")
+        if category == "matchSetup":
+            self.reset()
+        if not category:
+            return
+        if now is None:
+            now = event_time(event)
+
+        actor = None
+        for key in ACTOR_KEYS:
+            actor = _player_name(event.get(key))
+            if actor is not None:
+                break
+        target = None
+        for key in TARGET_KEYS:
+            target = _player_name(event.get(key))
+            if target is not None:
+                break
+        value = 0.0
+        for key in VALUE_KEYS:
+            if isinstance(event.get(key), (int, float)):
+                value = event[key]
+                break
+        weapon = event.get("weapon")
+
+        self.append(now, category, actor, target, value, weapon if isinstance(weapon, str) and weapon else None)
+
+    def _slot(self, position):
+        """古い順の位置を配列のインデックスに変換"""
+        return (self.written - len(self) + position) % self.capacity
+
+    def _first_after(self, cutoff):
+        """時刻がcutoff以上の最初のイベントの位置（古い順）"""
+        low = 0
+        high = len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[self._slot(middle)] < cutoff:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def query(self, seconds=None, player=None, types=None, limit=None, now=None):
+        """
+        直近のイベントを取得（範囲は二分探索で求め、範囲内のイベントだけを走査する）
+
+        Parameters:
+            seconds (float): 直近何秒のイベントか（Noneの場合は保持しているすべて）
+            player (str): 主体または対象がこのプレイヤーのイベントに絞り込む
+            types (list): イベントの種類で絞り込む
+            limit (int): 新しい順に最大何件か
+            now (float): 基準の時刻（省略時は最後のイベントの時刻）
+
+        Returns:
+            list: イベントのリスト（古い順）
+        """
+        size = len(self)
+        if not size:
+            return []
+
+        start = 0
+        if seconds is not None:
+            if now is None:
+                now = self.latest
+            start = self._first_after(now - seconds)
+
+        # 絞り込み条件をコードに変換（未登録の文字列に一致するイベントはない）
+        player_code = None
+        if player is not None:
+            player_code = self.strings.lookup(player)
+            if player_code is None:
+                return []
+        type_codes = None
+        if types:
+            type_codes = {self.strings.lookup(name) for name in types} - {None}
+            if not type_codes:
+                return []
+
+        # 範囲は配列上で最大2つの連続した区間になる（新しい順に走査する）
+        first = self._slot(start)
+        last = self._slot(size - 1)
+        if start == size:
+            segments = ()
+        elif first <= last:
+            segments = (range(last, first - 1, -1),)
+        else:
+            segments = (range(last, -1, -1), range(self.capacity - 1, first - 1, -1))
+
+        types_column = self.types
+        actors = self.actors
+        targets = self.targets
+        results = []
+        for segment in segments:
+            for index in segment:
+                if type_codes is not None and types_column[index] not in type_codes:
+                    continue
+                if player_code is not None and actors[index] != player_code and targets[index] != player_code:
+                    continue
+                results.append(self._to_dict(index))
+                if limit is not None and len(results) >= limit:
+                    break
+            else:
+                continue
+            break
+        results.reverse()
+        return results
+
+    def _to_dict(self, index):
+        strings = self.strings.values
+        actor = self.actors[index]
+        target = self.targets[index]
+        weapon = self.weapons[index]
+        category = self.types[index]
+        return {
+            "time": self.times[index],
+            "type": strings[category] if category != NO_STRING else None,
+            "actor": strings[actor] if actor != NO_STRING else None,
+            "target": strings[target] if target != NO_STRING else None,
+            "value": self.values[index],
+            "weapon": strings[weapon] if weapon != NO_STRING else None
+        }
+
+    def get_stats(self):
+        """保持状況"""
+        return {
+            "capacity": self.capacity,
+            "size": len(self),
+            "written": self.written,
+            "overwritten": max(0, self.written - self.capacity),
+            "bytes": sum(column.itemsize * len(column) for column in
+                         (self.times, self.types, self.actors, self.targets, self.values, self.weapons))
+        }
@@ -4,7 +4,8 @@ import threading
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 from pathlib import Path
 from utils.logger import get_logger
-from server.api_routes import handle_api_request
+from server import codec
+from server.api_routes import handle_api_request, PROMETHEUS_CONTENT_TYPE
 
 # ロガーの取得
 logger = get_logger()
@@ -46,7 +47,7 @@ class OverlayHTTPHandler(SimpleHTTPRequestHandler):
             post_data = self.rfile.read(content_length).decode('utf-8')
             
             try:
-                request_data = json.loads(post_data)
+                request_data = codec.decode(post_data)
                 self.handle_api_request(request_data)
             except json.JSONDecodeError:
                 self.send_error(400, "Invalid JSON")
@@ -55,35 +56,44 @@ class OverlayHTTPHandler(SimpleHTTPRequestHandler):
         
         # その他のPOSTリクエスト
         self.send_error(404)
-    def handle_api_request(self, request_data):
-    """
-    APIリクエストの処理
     
-    Parameters:
-        request_data (dict): POSTリクエストのデータ（GETの場合はNone）
-    """
-    try:
-        # APIルートハンドラを呼び出し
-        response = handle_api_request(self.path, request_data)
-        
-        # レスポンスヘッダー
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        
-        # レスポンスボディ
-        self.wfile.write(json.dumps(response).encode())
-    
-    except Exception as e:
-        logger.error(f"APIリクエストの処理中にエラーが発生しました: {str(e)}")
+    def handle_api_request(self, request_data):
+        """
+        APIリクエストの処理
         
-        # エラーレスポンス
-        self.send_response(500)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
+        Parameters:
+            request_data (dict): POSTリクエストのデータ（GETの場合はNone）
+        """
+        try:
+            # APIルートハンドラを呼び出し
+            response = handle_api_request(self.path, request_data)
+            
+            # テキスト形式のレスポンス（Prometheusのメトリクス）
+            if isinstance(response, str):
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.end_headers()
+                self.wfile.write(response.encode('utf-8'))
+                return
+            
+            # レスポンスヘッダー
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            
+            # レスポンスボディ
+            self.wfile.write(codec.encode(response))
         
-        error_response = {
-            'success': False,
-            'message': f"サーバーエラー: {str(e)}"
-        }
-        self.wfile.write(json.dumps(error_response).encode())
\ No newline at end of file
+        except Exception as e:
+            logger.error(f"APIリクエストの処理中にエラーが発生しました: {str(e)}")
+            
+            # エラーレスポンス
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            
+            error_response = {
+                'success': False,
+                'message': f"サーバーエラー: {str(e)}"
+            }
+            self.wfile.write(codec.encode(error_response))
\ No newline at end of file
@@ -0,0 +1,414 @@
+import struct
+
+# Apex LegendsのLiveAPIが送信するprotobufフレームのデコード
+# google.protobufに依存せず、必要なメッセージだけをwire formatから直接デコードする
+# （フィールド番号はLiveAPIのevents.protoに準拠）
+
+# Anyのtype_urlの接頭辞
+TYPE_URL_PREFIX = "type.googleapis.com/rtech.liveapi."
+
+# wire type
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LEN = 2
+WIRE_FIXED32 = 5
+
+# フィールドの種類 -> wire type
+KIND_WIRE_TYPES = {
+    "message": WIRE_LEN,
+    "string": WIRE_LEN,
+    "bytes": WIRE_LEN,
+    "float": WIRE_FIXED32,
+    "fixed32": WIRE_FIXED32,
+    "bool": WIRE_VARINT,
+    "int": WIRE_VARINT,
+    "uint": WIRE_VARINT,
+}
+
+class ProtobufDecodeError(ValueError):
+    """protobufフレームのデコードに失敗した場合の例外"""
+
+def field(name, kind, schema=None, repeated=False):
+    """スキーマのフィールド定義を作成"""
+    return (name, kind, schema, repeated)
+
+# 共通のメッセージ
+VECTOR3 = {
+    1: field("x", "float"),
+    2: field("y", "float"),
+    3: field("z", "float"),
+}
+
+PLAYER = {
+    1: field("name", "string"),
+    2: field("teamId", "uint"),
+    3: field("pos", "message", VECTOR3),
+    4: field("angles", "message", VECTOR3),
+    5: field("currentHealth", "uint"),
+    6: field("maxHealth", "uint"),
+    7: field("shieldHealth", "uint"),
+    8: field("shieldMaxHealth", "uint"),
+    9: field("nucleusHash", "string"),
+    10: field("hardwareName", "string"),
+    11: field("teamName", "string"),
+    12: field("squadIndex", "uint"),
+    13: field("character", "string"),
+    14: field("skin", "string"),
+}
+
+def event_schema(*fields):
+    """イベントのスキーマを作成（timestampとcategoryは全イベント共通で、以降は3番から順に割り当てる）"""
+    schema = {
+        1: field("timestamp", "uint"),
+        2: field("category", "string"),
+    }
+    for number, definition in enumerate(fields, start=3):
+        schema[number] = definition
+    return schema
+
+# イベント種別ごとのスキーマ（メッセージ名 -> スキーマ）
+EVENT_SCHEMAS = {
+    "Init": event_schema(
+        field("gameVersion", "string"),
+        field("apiVersion", "bytes"),
+        field("platform", "string"),
+        field("name", "string"),
+    ),
+    "MatchSetup": event_schema(
+        field("map", "string"),
+        field("playlistName", "string"),
+        field("playlistDesc", "string"),
+        field("datacenter", "bytes"),
+        field("aimAssistOn", "bool"),
+        field("anonymousMode", "bool"),
+        field("serverId", "string"),
+    ),
+    "GameStateChanged": event_schema(
+        field("state", "string"),
+    ),
+    "CharacterSelected": event_schema(
+        field("player", "message", PLAYER),
+    ),
+    "MatchStateEnd": event_schema(
+        field("state", "string"),
+        field("winners", "message", PLAYER, repeated=True),
+    ),
+    "RingStartClosing": event_schema(
+        field("stage", "uint"),
+        field("center", "message", VECTOR3),
+        field("currentRadius", "float"),
+        field("endRadius", "float"),
+        field("shrinkDuration", "float"),
+    ),
+    "RingFinishedClosing": event_schema(
+        field("stage", "uint"),
+        field("center", "message", VECTOR3),
+        field("currentRadius", "float"),
+        field("shrinkDuration", "float"),
+    ),
+    "PlayerConnected": event_schema(
+        field("player", "message", PLAYER),
+    ),
+    "PlayerDisconnected": event_schema(
+        field("player", "message", PLAYER),
+        field("canReconnect", "bool"),
+        field("isAlive", "bool"),
+    ),
+    "PlayerStatChanged": event_schema(
+        field("player", "message", PLAYER),
+        field("statName", "string"),
+        field("newValue", "uint"),
+    ),
+    "PlayerUpgradeTierChanged": event_schema(
+        field("player", "message", PLAYER),
+        field("level", "int"),
+    ),
+    "PlayerDamaged": event_schema(
+        field("attacker", "message", PLAYER),
+        field("victim", "message", PLAYER),
+        field("weapon", "string"),
+        field("damageInflicted", "uint"),
+    ),
+    "PlayerKilled": event_schema(
+        field("attacker", "message", PLAYER),
+        field("victim", "message", PLAYER),
+        field("awardedTo", "message", PLAYER),
+        field("weapon", "string"),
+    ),
+    "PlayerDowned": event_schema(
+        field("attacker", "message", PLAYER),
+        field("victim", "message", PLAYER),
+        field("weapon", "string"),
+    ),
+    "PlayerAssist": event_schema(
+        field("assistant", "message", PLAYER),
+        field("victim", "message", PLAYER),
+        field("weapon", "string"),
+    ),
+    "SquadEliminated": event_schema(
+        field("players", "message", PLAYER, repeated=True),
+    ),
+    "PlayerRespawnTeam": event_schema(
+        field("player", "message", PLAYER),
+        field("respawned", "string"),
+    ),
+    "PlayerRevive": event_schema(
+        field("player", "message", PLAYER),
+        field("revived", "message", PLAYER),
+    ),
+    "InventoryPickUp": event_schema(
+        field("player", "message", PLAYER),
+        field("item", "string"),
+        field("quantity", "int"),
+    ),
+    "InventoryDrop": event_schema(
+        field("player", "message", PLAYER),
+        field("item", "string"),
+        field("quantity", "int"),
+        field("extraData", "string", repeated=True),
+    ),
+    "InventoryUse": event_schema(
+        field("player", "message", PLAYER),
+        field("item", "string"),
+        field("quantity", "int"),
+    ),
+    "ObserverSwitched": event_schema(
+        field("observer", "message", PLAYER),
+        field("target", "message", PLAYER),
+        field("targetTeam", "message", PLAYER, repeated=True),
+    ),
+}
+
+def category_name(message_name):
+    """メッセージ名からJSON形式のcategory名を取得（PlayerDamaged -> playerDamaged）"""
+    return message_name[:1].lower() + message_name[1:]
+
+# type_url -> (category, スキーマ) の対応表
+TYPE_URLS = {
+    TYPE_URL_PREFIX + name: (category_name(name), schema)
+    for name, schema in EVENT_SCHEMAS.items()
+}
+
+# エンベロープ（LiveAPIEvent）とAnyのスキーマ
+ANY = {
+    1: field("typeUrl", "string"),
+    2: field("value", "bytes"),
+}
+
+LIVEAPI_EVENT = {
+    1: field("eventSize", "fixed32"),
+    3: field("gameMessage", "message", ANY),
+}
+
+def is_protobuf_frame(message):
+    """
+    受信メッセージがprotobufのフレームかどうかを判定
+
+    Parameters:
+        message (str | bytes): WebSocketで受信したメッセージ
+
+    Returns:
+        bool: protobufフレームであればTrue
+    """
+    if not isinstance(message, (bytes, bytearray, memoryview)) or not message:
+        return False
+
+    # バイナリで送られたJSONは除外
+    return bytes(message[:1]) not in (b"{", b"[")
+
+def _read_varint(buffer, position):
+    """varintを読み取る"""
+    result = 0
+    shift = 0
+    while True:
+        if position >= len(buffer):
+            raise ProtobufDecodeError("varintの途中でデータが終了しました")
+        byte = buffer[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+        if shift >= 70:
+            raise ProtobufDecodeError("varintが長すぎます")
+
+def decode_message(buffer, schema):
+    """
+    protobufのメッセージをスキーマに従ってdictにデコード
+
+    Parameters:
+        buffer (bytes): メッセージのバイト列
+        schema (dict): フィールド番号 -> (名前, 種類, サブスキーマ, repeated)
+
+    Returns:
+        dict: デコードしたメッセージ（スキーマにないフィールドは読み飛ばす）
+    """
+    result = {}
+    position = 0
+    end = len(buffer)
+
+    while position < end:
+        key, position = _read_varint(buffer, position)
+        number = key >> 3
+        wire_type = key & 0x07
+
+        # 値の読み取り
+        if wire_type == WIRE_VARINT:
+            value, position = _read_varint(buffer, position)
+        elif wire_type == WIRE_LEN:
+            length, position = _read_varint(buffer, position)
+            if position + length > end:
+                raise ProtobufDecodeError("長さ付きフィールドがデータの範囲外です")
+            value = buffer[position:position + length]
+            position += length
+        elif wire_type == WIRE_FIXED32:
+            if position + 4 > end:
+                raise ProtobufDecodeError("fixed32の途中でデータが終了しました")
+            value = buffer[position:position + 4]
+            position += 4
+        elif wire_type == WIRE_FIXED64:
+            if position + 8 > end:
+                raise ProtobufDecodeError("fixed64の途中でデータが終了しました")
+            value = buffer[position:position + 8]
+            position += 8
+        else:
+            raise ProtobufDecodeError(f"未対応のwire typeです: {wire_type}")
+
+        definition = schema.get(number)
+        if definition is None:
+            continue
+
+        name, kind, sub_schema, repeated = definition
+        if KIND_WIRE_TYPES[kind] != wire_type:
+            raise ProtobufDecodeError(f"フィールド '{name}' のwire typeが一致しません: {wire_type}")
+
+        # 種類ごとの変換
+        if kind == "message":
+            value = decode_message(value, sub_schema)
+        elif kind == "string":
+            value = bytes(value).decode("utf-8", errors="replace")
+        elif kind == "bytes":
+            value = bytes(value)
+        elif kind == "float":
+            value = struct.unpack("<f", value)[0]
+        elif kind == "fixed32":
+            value = struct.unpack("<I", value)[0]
+        elif kind == "bool":
+            value = bool(value)
+        elif kind == "int":
+            # int32/int64は2の補数の64bit varint
+            if value >= 1 << 63:
+                value -= 1 << 64
+
+        if repeated:
+            result.setdefault(name, []).append(value)
+        else:
+            result[name] = value
+
+    return result
+
+def decode_event(frame):
+    """
+    LiveAPIEventエンベロープをデコードしてイベントのdictを取得
+
+    Parameters:
+        frame (bytes): WebSocketで受信したバイナリフレーム
+
+    Returns:
+        dict: "category"を含むイベント。未対応のイベントは {"category": None, "typeUrl": ...}
+    """
+    envelope = decode_message(memoryview(frame), LIVEAPI_EVENT)
+    game_message = envelope.get("gameMessage")
+    if game_message is None:
+        raise ProtobufDecodeError("gameMessageが含まれていません")
+
+    type_url = game_message.get("typeUrl", "")
+    entry = TYPE_URLS.get(type_url)
+    if entry is None:
+        # 未対応のイベントは中身をデコードしない
+        return {"category": None, "typeUrl": type_url}
+
+    category, schema = entry
+    event = decode_message(game_message.get("value", b""), schema)
+    event["category"] = category
+    return event
+
+def _write_varint(value, out):
+    """varintを書き込む"""
+    if value < 0:
+        value += 1 << 64
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+def encode_message(message, schema):
+    """
+    dictをスキーマに従ってprotobufのメッセージにエンコード（テスト用プロデューサー向け）
+
+    Parameters:
+        message (dict): エンコードするメッセージ
+        schema (dict): decode_messageと同じ形式のスキーマ
+
+    Returns:
+        bytes: エンコードしたメッセージ
+    """
+    out = bytearray()
+
+    for number, (name, kind, sub_schema, repeated) in schema.items():
+        if name not in message:
+            continue
+
+        values = message[name] if repeated else [message[name]]
+        for value in values:
+            if kind == "message":
+                payload = encode_message(value, sub_schema)
+            elif kind == "string":
+                payload = value.encode("utf-8")
+            elif kind == "bytes":
+                payload = bytes(value)
+            elif kind == "float":
+                _write_varint((number << 3) | WIRE_FIXED32, out)
+                out += struct.pack("<f", value)
+                continue
+            elif kind == "fixed32":
+                _write_varint((number << 3) | WIRE_FIXED32, out)
+                out += struct.pack("<I", value)
+                continue
+            else:
+                _write_varint((number << 3) | WIRE_VARINT, out)
+                _write_varint(int(value), out)
+                continue
+
+            _write_varint((number << 3) | WIRE_LEN, out)
+            _write_varint(len(payload), out)
+            out += payload
+
+    return bytes(out)
+
+def encode_event(message_name, event):
+    """
+    イベントをLiveAPIEventエンベロープに包んでエンコード（テスト用プロデューサー向け）
+
+    Parameters:
+        message_name (str): メッセージ名（例: "PlayerDamaged"）
+        event (dict): イベントの内容
+
+    Returns:
+        bytes: WebSocketで送信するバイナリフレーム
+    """
+    event = dict(event)
+    event.setdefault("category", category_name(message_name))
+    value = encode_message(event, EVENT_SCHEMAS[message_name])
+    game_message = encode_message(
+        {"typeUrl": TYPE_URL_PREFIX + message_name, "value": value},
+        ANY
+    )
+    return encode_message(
+        {"eventSize": len(game_message), "gameMessage": game_message},
+        {1: LIVEAPI_EVENT[1], 3: field("gameMessage", "bytes")}
+    )
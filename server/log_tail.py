@@ -0,0 +1,358 @@
+import asyncio
+import fnmatch
+import json
+import os
+import re
+from pathlib import Path
+from server import codec
+from utils.file_watcher import DirectoryWatcher, DEFAULT_POLL_INTERVAL
+from utils.logger import get_logger
+
+# ロガーの取得
+logger = get_logger()
+
+# LiveAPIのログファイル（ディレクトリ内で最も新しいもの）を追いかけて読み込む
+#
+# ファイルは追記された分だけを読み、イベント（JSONオブジェクト）の区切りを差分で走査する。
+# ログ全体が1つのJSON配列（"[{...},{...}" のように閉じられていないもの）でも、
+# 1行に1イベントの形式でも同じように読める。読み終えた位置はファイルに保存し、
+# 再起動時はその位置から読み直す。
+
+# ログファイル名のデフォルトのパターン
+DEFAULT_PATTERN = "*.json"
+
+# 1回に読み込むバイト数（読み込みの間にイベントループへ処理を返す）
+READ_CHUNK_SIZE = 256 * 1024
+
+# 読み込み位置を保存する間隔（秒）
+OFFSET_SAVE_INTERVAL = 1.0
+
+# イベントの外側で構造を表す文字 / 文字列の中で意味を持つ文字
+_STRUCTURE = re.compile(rb'[{}"]')
+_STRING = re.compile(rb'["\\]')
+
+class RecordScanner:
+    """
+    追記されるバイト列からトップレベルのJSONオブジェクトを切り出す
+
+    走査済みの位置・括弧の深さ・文字列の中かどうかを保持し、追加されたバイトだけを走査する。
+    オブジェクトの間にある空白・カンマ・角括弧は読み飛ばす。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """未処理のデータを破棄"""
+        self.buffer = bytearray()
+        self.position = 0
+        self.record_start = None
+        self.depth = 0
+        self.in_string = False
+
+    @property
+    def pending(self):
+        """オブジェクトの途中で残っているバイト数"""
+        return len(self.buffer)
+
+    def feed(self, data):
+        """
+        バイト列を追加して完結したオブジェクトを取り出す
+
+        Parameters:
+            data (bytes): 追記されたバイト列
+
+        Returns:
+            tuple: (オブジェクトのバイト列のリスト, 処理済みのバイト数)。処理済みのバイト数は
+                今回を含めてまだ報告していない分で、読み込み位置はその分だけ進めてよい
+        """
+        buffer = self.buffer
+        buffer += data
+        position = self.position
+        records = []
+        consumed = 0
+
+        while position < len(buffer):
+            if self.depth == 0:
+                # イベントの間（空白・カンマ・角括弧）を読み飛ばす
+                start = buffer.find(b"{", position)
+                if start < 0:
+                    position = consumed = len(buffer)
+                    break
+                self.record_start = start
+                self.depth = 1
+                position = start + 1
+                continue
+
+            if self.in_string:
+                match = _STRING.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                if buffer[match.start()] == 0x5c:
+                    # エスケープされた次の1文字は読み飛ばす（まだ届いていなくてもよい）
+                    position = match.start() + 2
+                else:
+                    self.in_string = False
+                    position = match.end()
+                continue
+
+            match = _STRUCTURE.search(buffer, position)
+            if match is None:
+                position = len(buffer)
+                break
+            char = buffer[match.start()]
+            position = match.end()
+            if char == 0x22:
+                self.in_string = True
+            elif char == 0x7b:
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    records.append(bytes(buffer[self.record_start:position]))
+                    self.record_start = None
+                    consumed = position
+
+        # 処理済みの部分を捨てる
+        if consumed:
+            del buffer[:consumed]
+            position -= consumed
+            if self.record_start is not None:
+                self.record_start -= consumed
+        self.position = position
+        return records, consumed
+
+class LogTail:
+    """
+    LiveAPIのログディレクトリで最も新しいファイルを追いかけ、追記されたイベントを処理に回す
+
+    ファイルの変更はDirectoryWatcher（Linuxではinotify、それ以外はポーリング）で検知する。
+    """
+
+    def __init__(self, directory, on_record, pattern=DEFAULT_PATTERN, offsets_file=None,
+                 poll_interval=DEFAULT_POLL_INTERVAL, force_poll=False):
+        """
+        Parameters:
+            directory (str | Path): ログファイルのディレクトリ
+            on_record (callable): (メッセージの文字列, デコード済みのdict) を受け取る関数
+            pattern (str): ログファイル名のパターン（fnmatch形式）
+            offsets_file (str | Path): 読み込み位置の保存先（Noneの場合は保存しない）
+            poll_interval (float): ポーリング時の確認間隔（秒）
+            force_poll (bool): inotifyを使わずにポーリングする（共有フォルダ向け）
+        """
+        self.directory = Path(directory)
+        self.on_record = on_record
+        self.pattern = pattern
+        self.offsets_file = Path(offsets_file) if offsets_file is not None else None
+        self.poll_interval = poll_interval
+        self.force_poll = force_poll
+
+        # 読み込み中のファイル・inode・読み込み済みの位置（完結したイベントの末尾）
+        self.path = None
+        self.inode = None
+        self.offset = 0
+        self.scanner = RecordScanner()
+
+        self.watcher = None
+        self.task = None
+        self.dirty = False
+        self.save_handle = None
+
+        # カウンター
+        self.records = 0
+        self.invalid = 0
+        self.bytes_read = 0
+
+    def newest_file(self):
+        """パターンに一致する最も新しい（更新日時が最も新しい）ファイル"""
+        newest = None
+        newest_mtime = None
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return None
+        for entry in entries:
+            if not entry.is_file() or not fnmatch.fnmatch(entry.name, self.pattern):
+                continue
+            try:
+                mtime = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+            if newest_mtime is None or mtime > newest_mtime or (mtime == newest_mtime and entry.name > newest.name):
+                newest = Path(entry.path)
+                newest_mtime = mtime
+        return newest
+
+    def start(self):
+        """読み込みを開始（保存済みの位置から再開し、以降は追記を待つ）"""
+        self._load_offsets()
+        self.watcher = DirectoryWatcher(self.directory, self.sync, self.pattern, self.poll_interval)
+        self.watcher.start(self.force_poll)
+        self.sync()
+        logger.info(f"LiveAPIのログの読み込みを開始しました: {self.directory} ({self.watcher.mode})")
+        return self
+
+    async def stop(self):
+        """読み込みを終了して読み込み位置を保存"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.save_handle is not None:
+            self.save_handle.cancel()
+            self.save_handle = None
+        self.save_offsets()
+
+    def sync(self):
+        """追記された分を読み込む（読み込み中の場合は終わった後にもう一度読む）"""
+        if self.task is not None and not self.task.done():
+            self.dirty = True
+            return
+        self.task = asyncio.ensure_future(self._sync())
+
+    async def _sync(self):
+        try:
+            while True:
+                self.dirty = False
+                if self.path is not None:
+                    await self._read_to_end()
+
+                # より新しいファイルが作られていれば切り替える（読み込み中のファイルを読み終えてから）
+                newest = self.newest_file()
+                if newest is not None and newest != self.path:
+                    self._open(newest, 0)
+                    await self._read_to_end()
+
+                if not self.dirty:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"LiveAPIのログの読み込み中にエラーが発生しました: {str(e)}")
+
+    def _open(self, path, offset):
+        """読み込むファイルを切り替える"""
+        if self.path is not None and self.scanner.pending:
+            logger.warning(f"途中までしか書き込まれていないイベントを破棄しました: {self.path} ({self.scanner.pending}バイト)")
+        logger.info(f"LiveAPIのログファイルを読み込みます: {path} (位置 {offset})")
+        self.path = path
+        self.inode = None
+        self.offset = offset
+        self.scanner.reset()
+
+    async def _read_to_end(self):
+        """ファイルの末尾まで読み込む（読み込み位置から先だけを読む）"""
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if self.inode is None:
+                    self.inode = stat.st_ino
+                elif stat.st_ino != self.inode or stat.st_size < self.offset:
+                    # ファイルが置き換えられた・切り詰められた場合は先頭から読み直す
+                    logger.info(f"LiveAPIのログファイルが置き換えられたため先頭から読み直します: {self.path}")
+                    self._open(self.path, 0)
+                    self.inode = stat.st_ino
+
+                # 未完結のイベントの分は読み込み済みなので、その後ろから読む
+                f.seek(self.offset + self.scanner.pending)
+                while True:
+                    data = f.read(READ_CHUNK_SIZE)
+                    if not data:
+                        break
+                    self.bytes_read += len(data)
+                    records, consumed = self.scanner.feed(data)
+                    self.offset += consumed
+                    for record in records:
+                        self._dispatch(record)
+                    if records:
+                        self._schedule_save()
+
+                    # 大きなファイルの読み込み中もほかの処理を止めない
+                    await asyncio.sleep(0)
+        except FileNotFoundError:
+            logger.warning(f"LiveAPIのログファイルが見つかりません: {self.path}")
+            self.path = None
+            self.scanner.reset()
+
+    def _dispatch(self, record):
+        """イベントを1件処理に回す"""
+        try:
+            data = codec.decode(record)
+        except ValueError:
+            self.invalid += 1
+            logger.warning(f"LiveAPIのログのイベントを解析できませんでした: {record[:200]!r}")
+            return
+        if not isinstance(data, dict):
+            self.invalid += 1
+            return
+        self.records += 1
+        try:
+            self.on_record(record.decode("utf-8"), data)
+        except Exception as e:
+            logger.error(f"LiveAPIのログのイベントの処理中にエラーが発生しました: {str(e)}")
+
+    # 読み込み位置の保存
+
+    def _load_offsets(self):
+        """保存済みの読み込み位置を読み込む（同じファイルが残っていればそこから再開）"""
+        if self.offsets_file is None or not self.offsets_file.exists():
+            return
+        try:
+            with open(self.offsets_file, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"LiveAPIのログの読み込み位置を読み込めませんでした: {str(e)}")
+            return
+
+        path = Path(saved.get("path", ""))
+        try:
+            stat = path.stat()
+        except OSError:
+            return
+        if path.parent.resolve() != self.directory.resolve() or stat.st_ino != saved.get("inode"):
+            return
+        offset = int(saved.get("offset", 0))
+        if offset > stat.st_size:
+            return
+        self._open(path, offset)
+        self.inode = stat.st_ino
+
+    def _schedule_save(self):
+        """読み込み位置をまとめて保存する"""
+        if self.offsets_file is None or self.save_handle is not None:
+            return
+        self.save_handle = asyncio.get_running_loop().call_later(OFFSET_SAVE_INTERVAL, self._save_later)
+
+    def _save_later(self):
+        self.save_handle = None
+        self.save_offsets()
+
+    def save_offsets(self):
+        """読み込み位置を保存（一時ファイルに書いて置き換える）"""
+        if self.offsets_file is None or self.path is None:
+            return
+        temp_file = self.offsets_file.with_name(self.offsets_file.name + ".tmp")
+        try:
+            if self.offsets_file.parent != Path("."):
+                self.offsets_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump({"path": str(self.path), "inode": self.inode, "offset": self.offset}, f)
+            os.replace(temp_file, self.offsets_file)
+        except OSError as e:
+            logger.error(f"LiveAPIのログの読み込み位置を保存できませんでした: {str(e)}")
+
+    def get_stats(self):
+        """読み込みの状況"""
+        return {
+            "path": str(self.path) if self.path is not None else None,
+            "offset": self.offset,
+            "pending": self.scanner.pending,
+            "records": self.records,
+            "invalid": self.invalid,
+            "bytesRead": self.bytes_read,
+            "mode": self.watcher.mode if self.watcher is not None else None
+        }
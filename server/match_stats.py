@@ -0,0 +1,404 @@
+import time
+from server.event_dispatch import EventRegistry
+
+# マッチ中の統計をイベントごとにO(1)で更新する集計エンジン
+#
+# プレイヤーごと・チームごとの累計（与ダメージ、被ダメージ、キル、ダウン、生存時間）を
+# 差分で更新し、履歴を走査し直すことなくDPMや合計を求める。
+# キルの推移は発生順に追記するだけのタイムラインとして保持する。
+
+# マッチの開始・終了を表すイベント（マッチの開始時刻を記録しない）
+MATCH_LIFECYCLE_EVENTS = frozenset(("matchSetup", "gameStateChanged", "matchStateEnd"))
+
+def event_time(event):
+    """イベントの時刻（timestampがなければ現在時刻）"""
+    timestamp = event.get("timestamp")
+    if isinstance(timestamp, (int, float)) and timestamp > 0:
+        return float(timestamp)
+    return time.time()
+
+def _minutes(seconds):
+    return seconds / 60.0
+
+def per_minute(value, seconds):
+    """1分あたりの値（経過時間が1秒未満の場合は0）"""
+    if seconds < 1:
+        return 0.0
+    return round(value / _minutes(seconds), 1)
+
+class PlayerStats:
+    """プレイヤー1人分の累計"""
+
+    __slots__ = ("name", "team_id", "legend", "damage", "damage_taken", "kills", "knockdowns",
+                 "alive", "alive_since", "alive_total", "kill_times")
+
+    def __init__(self, name, team_id=None, now=None):
+        self.name = name
+        self.team_id = team_id
+        self.legend = ""
+        self.damage = 0
+        self.damage_taken = 0
+        self.kills = 0
+        self.knockdowns = 0
+
+        # 生存時間（生存中は alive_since からの経過時間を加える）
+        self.alive = True
+        self.alive_since = now
+        self.alive_total = 0.0
+
+        # キルした時刻（マッチ開始からの秒数）
+        self.kill_times = []
+
+    def time_alive(self, now):
+        """生存時間（秒）"""
+        if self.alive and self.alive_since is not None:
+            return self.alive_total + max(0.0, now - self.alive_since)
+        return self.alive_total
+
+    def to_dict(self, now, elapsed):
+        return {
+            "name": self.name,
+            "teamId": self.team_id,
+            "legend": self.legend,
+            "damage": self.damage,
+            "damageTaken": self.damage_taken,
+            "kills": self.kills,
+            "knockdowns": self.knockdowns,
+            "dpm": per_minute(self.damage, elapsed),
+            "timeAlive": int(self.time_alive(now)),
+            "alive": self.alive
+        }
+
+class TeamStats:
+    """チーム1つ分の合計（メンバーの累計が変わるたびに差分で更新）"""
+
+    __slots__ = ("team_id", "damage", "damage_taken", "kills", "knockdowns", "members", "alive_members")
+
+    def __init__(self, team_id):
+        self.team_id = team_id
+        self.damage = 0
+        self.damage_taken = 0
+        self.kills = 0
+        self.knockdowns = 0
+        self.members = 0
+        self.alive_members = 0
+
+    def to_dict(self, elapsed):
+        return {
+            "teamId": self.team_id,
+            "damage": self.damage,
+            "damageTaken": self.damage_taken,
+            "kills": self.kills,
+            "knockdowns": self.knockdowns,
+            "dpm": per_minute(self.damage, elapsed),
+            "members": self.members,
+            "alive": self.alive_members
+        }
+
+class MatchStats:
+    """1マッチ分の集計"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, now=None):
+        """マッチの集計を初期化（マッチ開始時）"""
+        self.started_at = now
+        self.ended_at = None
+
+        # 名前 -> PlayerStats / チームID -> TeamStats
+        self.players = {}
+        self.teams = {}
+
+        # キルのタイムライン（[経過秒, キルしたプレイヤー, キルされたプレイヤー]）
+        self.kill_feed = []
+
+    # 時刻
+
+    def _start(self, now):
+        if self.started_at is None:
+            self.started_at = now
+
+    def elapsed(self, now):
+        """マッチ開始からの経過時間（秒。終了後は終了時点で止まる）"""
+        if self.started_at is None:
+            return 0.0
+        end = self.ended_at if self.ended_at is not None else now
+        return max(0.0, end - self.started_at)
+
+    # プレイヤー・チーム
+
+    def player(self, name, team_id=None, now=None, legend=None):
+        """プレイヤーの累計を取得（初めて見たプレイヤーはマッチ開始から生存中として登録）"""
+        stats = self.players.get(name)
+        if stats is None:
+            stats = PlayerStats(name, team_id, self.started_at if self.started_at is not None else now)
+            self.players[name] = stats
+            if team_id is not None:
+                self._join_team(stats)
+        elif team_id is not None and stats.team_id is None:
+            stats.team_id = team_id
+            self._join_team(stats)
+        if legend:
+            stats.legend = legend
+        return stats
+
+    def _join_team(self, stats):
+        team = self.teams.get(stats.team_id)
+        if team is None:
+            team = self.teams[stats.team_id] = TeamStats(stats.team_id)
+        team.members += 1
+        team.alive_members += 1 if stats.alive else 0
+        team.damage += stats.damage
+        team.damage_taken += stats.damage_taken
+        team.kills += stats.kills
+        team.knockdowns += stats.knockdowns
+
+    def _team(self, stats):
+        return self.teams.get(stats.team_id) if stats.team_id is not None else None
+
+    def _player_from_event(self, value, now):
+        """イベントのプレイヤー情報から累計を取得"""
+        if not isinstance(value, dict) or not value.get("name"):
+            return None
+        return self.player(value["name"], value.get("teamId"), now, value.get("character"))
+
+    # 更新（いずれも対象のプレイヤーとチームだけを差分で更新する）
+
+    def add_damage(self, attacker, victim, amount):
+        if attacker is not None:
+            attacker.damage += amount
+            team = self._team(attacker)
+            if team is not None:
+                team.damage += amount
+        if victim is not None:
+            victim.damage_taken += amount
+            team = self._team(victim)
+            if team is not None:
+                team.damage_taken += amount
+
+    def add_kills(self, stats, count, now):
+        if count <= 0:
+            return
+        stats.kills += count
+        elapsed = int(self.elapsed(now))
+        stats.kill_times.extend([elapsed] * count)
+        team = self._team(stats)
+        if team is not None:
+            team.kills += count
+
+    def add_knockdown(self, stats):
+        stats.knockdowns += 1
+        team = self._team(stats)
+        if team is not None:
+            team.knockdowns += 1
+
+    def set_alive(self, stats, alive, now):
+        """生存状態を変更（生存時間の区間を閉じる・開く）"""
+        if stats.alive == alive:
+            return
+        if alive:
+            stats.alive_since = now
+        else:
+            stats.alive_total = stats.time_alive(now)
+        stats.alive = alive
+        team = self._team(stats)
+        if team is not None:
+            team.alive_members += 1 if alive else -1
+
+    def set_totals(self, stats, damage=None, kills=None, now=None):
+        """
+        累計値（スナップショットや statChanged の値）を反映
+
+        前回との差分だけをチームの合計に加える。値が減った場合（観戦対象の切り替えなど）は
+        その値で置き換える。
+        """
+        if damage is not None and damage != stats.damage:
+            delta = damage - stats.damage
+            self.add_damage(stats, None, delta)
+        if kills is not None and kills != stats.kills:
+            delta = kills - stats.kills
+            if delta > 0:
+                self.add_kills(stats, delta, now)
+            else:
+                stats.kills = kills
+                del stats.kill_times[kills:]
+                team = self._team(stats)
+                if team is not None:
+                    team.kills += delta
+
+    # 入力
+
+    def on_event(self, event, now=None):
+        """
+        LiveAPIのイベントを集計に反映
+
+        Parameters:
+            event (dict): "category"を含むイベント
+            now (float): イベントの時刻（省略時はイベントのtimestamp、なければ現在時刻）
+        """
+        if now is None:
+            now = event_time(event)
+
+        category = event.get("category")
+        if category not in MATCH_LIFECYCLE_EVENTS:
+            self._start(now)
+        handler = self.event_handlers.get(category)
+        if handler is not None:
+            handler(self, event, now)
+
+    # イベント種類ごとの集計（self, event, now を受け取る。未登録の種類はマッチの開始時刻だけを記録）
+    event_handlers = EventRegistry()
+
+    @event_handlers.on("matchSetup")
+    def _on_match_setup(self, event, now):
+        self.reset()
+
+    @event_handlers.on("gameStateChanged")
+    def _on_game_state_changed(self, event, now):
+        if event.get("state") == "Playing":
+            self._start(now)
+
+    @event_handlers.on("matchStateEnd")
+    def _on_match_state_end(self, event, now):
+        self.ended_at = now
+        for stats in self.players.values():
+            self.set_alive(stats, False, now)
+
+    @event_handlers.on("playerDamaged")
+    def _on_player_damaged(self, event, now):
+        attacker = self._player_from_event(event.get("attacker"), now)
+        victim = self._player_from_event(event.get("victim"), now)
+        self.add_damage(attacker, victim, event.get("damageInflicted", 0))
+
+    @event_handlers.on("playerDowned")
+    def _on_player_downed(self, event, now):
+        attacker = self._player_from_event(event.get("attacker"), now)
+        if attacker is not None:
+            self.add_knockdown(attacker)
+
+    @event_handlers.on("playerKilled")
+    def _on_player_killed(self, event, now):
+        killer = self._player_from_event(event.get("awardedTo") or event.get("attacker"), now)
+        victim = self._player_from_event(event.get("victim"), now)
+        if killer is not None:
+            self.add_kills(killer, 1, now)
+        if victim is not None:
+            self.set_alive(victim, False, now)
+        self.kill_feed.append([
+            int(self.elapsed(now)),
+            killer.name if killer is not None else None,
+            victim.name if victim is not None else None
+        ])
+
+    @event_handlers.on("playerStatChanged")
+    def _on_player_stat_changed(self, event, now):
+        stats = self._player_from_event(event.get("player"), now)
+        stat_name = event.get("statName", "")
+        if stats is not None and stat_name == "kills":
+            self.set_totals(stats, kills=event.get("newValue", 0), now=now)
+        elif stats is not None and stat_name in ("damageDealt", "damage"):
+            self.set_totals(stats, damage=event.get("newValue", 0), now=now)
+
+    @event_handlers.on("observerSwitched")
+    def _on_observer_switched(self, event, now):
+        for player in [event.get("target")] + list(event.get("targetTeam", [])):
+            self._player_from_event(player, now)
+
+    @event_handlers.on("squadEliminated")
+    def _on_squad_eliminated(self, event, now):
+        for player in event.get("players", []):
+            stats = self._player_from_event(player, now)
+            if stats is not None:
+                self.set_alive(stats, False, now)
+
+    @event_handlers.on("playerRespawnTeam", "playerRevive")
+    def _on_player_respawn(self, event, now):
+        respawned = event.get("respawned") or event.get("revived") or []
+        if isinstance(respawned, (dict, str)):
+            respawned = [respawned]
+        for player in respawned:
+            stats = self.player(player, None, now) if isinstance(player, str) else self._player_from_event(player, now)
+            if stats is not None:
+                self.set_alive(stats, True, now)
+
+    def on_snapshot(self, processed, now=None):
+        """
+        スナップショット形式のフレーム（処理済み）の観戦中プレイヤーの累計を反映
+
+        Parameters:
+            processed (dict): process_dataの戻り値
+        """
+        if now is None:
+            now = time.time()
+        player = processed.get("player") or {}
+        name = player.get("name")
+        if not name:
+            return
+
+        self._start(now)
+        stats = self.player(name, player.get("teamId"), now, player.get("legend"))
+        self.set_totals(stats, player.get("damage"), player.get("kills"), now)
+        if "health" in player:
+            self.set_alive(stats, player["health"] > 0 or player.get("shields", 0) > 0, now)
+
+        for member in processed.get("squad") or []:
+            if member.get("name"):
+                self.player(member["name"], member.get("teamId"), now, member.get("legend"))
+
+    # 出力
+
+    def summary(self, processed, now=None):
+        """
+        状態に含めて配信する観戦中プレイヤーとそのスクワッドの統計
+
+        スクワッドの合計は観戦中のプレイヤーとスクワッドのメンバー（最大3人）から求める。
+
+        Parameters:
+            processed (dict): process_dataの戻り値
+
+        Returns:
+            dict: 統計
+        """
+        if now is None:
+            now = time.time()
+        elapsed = self.elapsed(now)
+        summary = {"elapsed": int(elapsed)}
+
+        player = processed.get("player") or {}
+        stats = self.players.get(player.get("name"))
+        if stats is None:
+            return summary
+        summary["player"] = stats.to_dict(now, elapsed)
+
+        members = [stats] + [
+            self.players[member["name"]]
+            for member in processed.get("squad") or []
+            if member.get("name") in self.players and member.get("name") != stats.name
+        ]
+        squad_damage = sum(member.damage for member in members)
+        summary["squad"] = {
+            "damage": squad_damage,
+            "damageTaken": sum(member.damage_taken for member in members),
+            "kills": sum(member.kills for member in members),
+            "knockdowns": sum(member.knockdowns for member in members),
+            "dpm": per_minute(squad_damage, elapsed),
+            "alive": sum(1 for member in members if member.alive)
+        }
+        return summary
+
+    def to_dict(self, now=None):
+        """全プレイヤー・全チームの統計（/api/stats用）"""
+        if now is None:
+            now = time.time()
+        elapsed = self.elapsed(now)
+        return {
+            "elapsed": int(elapsed),
+            "inProgress": self.started_at is not None and self.ended_at is None,
+            "players": [stats.to_dict(now, elapsed) for stats in self.players.values()],
+            "teams": [team.to_dict(elapsed) for team in self.teams.values()],
+            "killTimeline": {
+                name: stats.kill_times for name, stats in self.players.items() if stats.kill_times
+            },
+            "killFeed": self.kill_feed
+        }
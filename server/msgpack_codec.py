@@ -0,0 +1,196 @@
+import struct
+
+# msgpackがインストールされていれば高速なエンコーダーを使用
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# 使用中のMessagePackバックエンド名
+BACKEND = "msgpack" if msgpack is not None else "python"
+
+# MessagePackのエンコード・デコード（配信メッセージに使う型のみ: dict / list / str / int / float / bool / None / bytes）
+#
+# msgpackがない環境でもバイナリのサブプロトコルを使えるよう、最小限の実装を持つ。
+# 浮動小数点数はmsgpackと同じく常にfloat64で書き込む。
+
+_UINT8 = struct.Struct(">B")
+_UINT16 = struct.Struct(">H")
+_UINT32 = struct.Struct(">I")
+_UINT64 = struct.Struct(">Q")
+_INT8 = struct.Struct(">b")
+_INT16 = struct.Struct(">h")
+_INT32 = struct.Struct(">i")
+_INT64 = struct.Struct(">q")
+_FLOAT32 = struct.Struct(">f")
+_FLOAT64 = struct.Struct(">d")
+
+def _pack_length(out, length, fix_type, fix_limit, type8, type16, type32):
+    """長さ付きの型（文字列・配列・マップ・バイナリ）のヘッダーを書き込む"""
+    if fix_type is not None and length < fix_limit:
+        out.append(fix_type | length)
+    elif type8 is not None and length <= 0xff:
+        out.append(type8)
+        out.append(length)
+    elif length <= 0xffff:
+        out.append(type16)
+        out += _UINT16.pack(length)
+    else:
+        out.append(type32)
+        out += _UINT32.pack(length)
+
+def _pack_into(value, out):
+    if value is None:
+        out.append(0xc0)
+    elif value is True:
+        out.append(0xc3)
+    elif value is False:
+        out.append(0xc2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -32 <= value < 0:
+            out.append(value & 0xff)
+        elif value >= 0:
+            if value <= 0xff:
+                out.append(0xcc)
+                out.append(value)
+            elif value <= 0xffff:
+                out.append(0xcd)
+                out += _UINT16.pack(value)
+            elif value <= 0xffffffff:
+                out.append(0xce)
+                out += _UINT32.pack(value)
+            else:
+                out.append(0xcf)
+                out += _UINT64.pack(value)
+        elif value >= -0x80:
+            out.append(0xd0)
+            out += _INT8.pack(value)
+        elif value >= -0x8000:
+            out.append(0xd1)
+            out += _INT16.pack(value)
+        elif value >= -0x80000000:
+            out.append(0xd2)
+            out += _INT32.pack(value)
+        else:
+            out.append(0xd3)
+            out += _INT64.pack(value)
+    elif isinstance(value, float):
+        out.append(0xcb)
+        out += _FLOAT64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        _pack_length(out, len(data), 0xa0, 32, 0xd9, 0xda, 0xdb)
+        out += data
+    elif isinstance(value, dict):
+        _pack_length(out, len(value), 0x80, 16, None, 0xde, 0xdf)
+        for key, item in value.items():
+            _pack_into(key, out)
+            _pack_into(item, out)
+    elif isinstance(value, (list, tuple)):
+        _pack_length(out, len(value), 0x90, 16, None, 0xdc, 0xdd)
+        for item in value:
+            _pack_into(item, out)
+    elif isinstance(value, (bytes, bytearray)):
+        _pack_length(out, len(value), None, 0, 0xc4, 0xc5, 0xc6)
+        out += value
+    else:
+        raise TypeError(f"MessagePackにエンコードできない型です: {type(value).__name__}")
+
+def _read_length(data, offset, size):
+    if size == 1:
+        return data[offset], offset + 1
+    if size == 2:
+        return _UINT16.unpack_from(data, offset)[0], offset + 2
+    return _UINT32.unpack_from(data, offset)[0], offset + 4
+
+def _unpack_from(data, offset):
+    """
+    offsetの位置の値を1つ読み取る
+
+    Returns:
+        tuple: (値, 次の位置)
+    """
+    code = data[offset]
+    offset += 1
+
+    if code < 0x80:
+        return code, offset
+    if code >= 0xe0:
+        return code - 0x100, offset
+    if 0xa0 <= code <= 0xbf:
+        length = code & 0x1f
+        return data[offset:offset + length].decode("utf-8"), offset + length
+    if 0x90 <= code <= 0x9f:
+        return _unpack_array(data, offset, code & 0x0f)
+    if 0x80 <= code <= 0x8f:
+        return _unpack_map(data, offset, code & 0x0f)
+
+    if code == 0xc0:
+        return None, offset
+    if code == 0xc2:
+        return False, offset
+    if code == 0xc3:
+        return True, offset
+    if code in (0xd9, 0xda, 0xdb):
+        length, offset = _read_length(data, offset, (1, 2, 4)[code - 0xd9])
+        return data[offset:offset + length].decode("utf-8"), offset + length
+    if code in (0xc4, 0xc5, 0xc6):
+        length, offset = _read_length(data, offset, (1, 2, 4)[code - 0xc4])
+        return bytes(data[offset:offset + length]), offset + length
+    if code in (0xdc, 0xdd):
+        length, offset = _read_length(data, offset, 2 if code == 0xdc else 4)
+        return _unpack_array(data, offset, length)
+    if code in (0xde, 0xdf):
+        length, offset = _read_length(data, offset, 2 if code == 0xde else 4)
+        return _unpack_map(data, offset, length)
+
+    fixed = _FIXED_TYPES.get(code)
+    if fixed is None:
+        raise ValueError(f"未対応のMessagePackの型です: 0x{code:02x}")
+    return fixed.unpack_from(data, offset)[0], offset + fixed.size
+
+# 固定長の数値型
+_FIXED_TYPES = {
+    0xca: _FLOAT32, 0xcb: _FLOAT64,
+    0xcc: _UINT8, 0xcd: _UINT16, 0xce: _UINT32, 0xcf: _UINT64,
+    0xd0: _INT8, 0xd1: _INT16, 0xd2: _INT32, 0xd3: _INT64
+}
+
+def _unpack_array(data, offset, length):
+    items = []
+    for _ in range(length):
+        item, offset = _unpack_from(data, offset)
+        items.append(item)
+    return items, offset
+
+def _unpack_map(data, offset, length):
+    result = {}
+    for _ in range(length):
+        key, offset = _unpack_from(data, offset)
+        value, offset = _unpack_from(data, offset)
+        result[key] = value
+    return result, offset
+
+if msgpack is not None:
+    def pack(message):
+        """メッセージをMessagePackのバイト列にエンコード"""
+        return msgpack.packb(message, use_bin_type=True)
+
+    def unpack(data):
+        """MessagePackのバイト列をデコード"""
+        return msgpack.unpackb(data, raw=False)
+else:
+    def pack(message):
+        """メッセージをMessagePackのバイト列にエンコード"""
+        out = bytearray()
+        _pack_into(message, out)
+        return bytes(out)
+
+    def unpack(data):
+        """MessagePackのバイト列をデコード"""
+        value, offset = _unpack_from(data, 0)
+        if offset != len(data):
+            raise ValueError("MessagePackのデータの末尾に余分なバイトがあります")
+        return value
@@ -0,0 +1,137 @@
+import ast
+
+# ゲームデータのフィールド射影
+# 各セクションのフィールド定義（入力キー, 出力キー, デフォルト値）を起動時に
+# 1度だけ関数にコンパイルし、ApexAPIとapi_handlerの両方で共有する
+
+# プレイヤーデータのフィールド定義
+PLAYER_FIELDS = (
+    ("name", "name", ""),
+    ("teamId", "teamId", None),
+    ("health", "health", 0),
+    ("maxHealth", "maxHealth", 100),
+    ("shields", "shields", 0),
+    ("maxShields", "maxShields", 0),
+    ("kills", "kills", 0),
+    ("damage", "damage", 0),
+    ("legendName", "legend", ""),
+    ("position", "position", {"x": 0, "y": 0, "z": 0}),
+)
+
+# スクワッドメンバーのフィールド定義
+SQUAD_MEMBER_FIELDS = (
+    ("name", "name", ""),
+    ("teamId", "teamId", None),
+    ("health", "health", 0),
+    ("maxHealth", "maxHealth", 100),
+    ("shields", "shields", 0),
+    ("maxShields", "maxShields", 0),
+    ("legendName", "legend", ""),
+)
+
+# マッチデータのフィールド定義
+MATCH_FIELDS = (
+    ("inProgress", "inProgress", False),
+    ("squadEliminated", "squadEliminated", False),
+    ("phase", "phase", 0),
+    ("remainingTime", "remainingTime", 0),
+    ("remainingSquads", "remainingSquads", 0),
+)
+
+# 値が存在しないことを表す番兵
+_MISSING = object()
+
+# セクションが無い場合に使う空の辞書（getのみに使い、変更しない）
+_EMPTY = {}
+
+def _build_dict_source(fields, source="data"):
+    """フィールド定義から辞書リテラルのソースを生成"""
+    items = []
+    for source_key, output_key, default in fields:
+        # デフォルト値はリテラルとして埋め込む（reprからリテラルとして復元できる値のみ）
+        try:
+            literal = ast.literal_eval(repr(default))
+        except (ValueError, SyntaxError):
+            literal = _MISSING
+        if literal is _MISSING or literal != default:
+            raise ValueError(f"リテラルで表現できないデフォルト値です: {output_key}={default!r}")
+
+        if isinstance(default, (dict, list)):
+            # dictやlistは値が無いときだけ新しく生成する（毎回の生成と共有を避ける）
+            items.append(
+                f"{output_key!r}: (_v if (_v := {source}.get({source_key!r}, _MISSING)) is not _MISSING else {default!r})"
+            )
+        else:
+            items.append(f"{output_key!r}: {source}.get({source_key!r}, {default!r})")
+    return "{" + ", ".join(items) + "}"
+
+def _compile(source, name):
+    """生成したソースをコンパイルして関数を取得"""
+    namespace = {"_MISSING": _MISSING, "_EMPTY": _EMPTY}
+    exec(compile(source, f"<projection:{name}>", "exec"), namespace)
+    return namespace[name]
+
+def compile_projection(fields, name="project"):
+    """
+    フィールド定義を1つの辞書を射影する関数にコンパイル
+
+    Parameters:
+        fields (tuple): (入力キー, 出力キー, デフォルト値) のタプル
+        name (str): 生成する関数名
+
+    Returns:
+        callable: dictを受け取り、射影したdictを返す関数
+    """
+    source = (
+        f"def {name}(data):\n"
+        f"    return {_build_dict_source(fields)}\n"
+    )
+    return _compile(source, name)
+
+def compile_list_projection(fields, name="project_list"):
+    """
+    フィールド定義をdictのリストを射影する関数にコンパイル
+
+    Parameters:
+        fields (tuple): (入力キー, 出力キー, デフォルト値) のタプル
+        name (str): 生成する関数名
+
+    Returns:
+        callable: dictのリストを受け取り、射影したdictのリストを返す関数
+    """
+    source = (
+        f"def {name}(items):\n"
+        f"    return [{_build_dict_source(fields, 'item')} for item in items]\n"
+    )
+    return _compile(source, name)
+
+def compile_frame_projection(name="project_frame"):
+    """
+    フレーム全体（gameState / player / squad / match）を1回の呼び出しで射影する関数にコンパイル
+
+    Parameters:
+        name (str): 生成する関数名
+
+    Returns:
+        callable: 受信データを受け取り、処理済みデータを返す関数
+    """
+    source = (
+        f"def {name}(data):\n"
+        f"    player = data.get('player', _EMPTY)\n"
+        f"    match = data.get('match', _EMPTY)\n"
+        f"    squad = [{_build_dict_source(SQUAD_MEMBER_FIELDS, 'item')} for item in data.get('squad', ())]\n"
+        f"    return {{\n"
+        f"        'type': 'gameData',\n"
+        f"        'gameState': data.get('gameState', ''),\n"
+        f"        'player': {_build_dict_source(PLAYER_FIELDS, 'player')},\n"
+        f"        'squad': squad,\n"
+        f"        'match': {_build_dict_source(MATCH_FIELDS, 'match')}\n"
+        f"    }}\n"
+    )
+    return _compile(source, name)
+
+# 起動時にコンパイルした射影関数
+project_player = compile_projection(PLAYER_FIELDS, "project_player")
+project_squad = compile_list_projection(SQUAD_MEMBER_FIELDS, "project_squad")
+project_match = compile_projection(MATCH_FIELDS, "project_match")
+project_frame = compile_frame_projection("project_frame")
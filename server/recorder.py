@@ -0,0 +1,300 @@
+import asyncio
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+from utils.logger import get_logger
+
+# ロガーの取得
+logger = get_logger()
+
+# 記録ファイルの先頭に書き込む識別子
+FILE_MAGIC = b"APEXREC1"
+
+# 記録ファイルのレコードヘッダー（タイムスタンプ, 種類, ペイロード長）
+RECORD_HEADER = struct.Struct("<dBI")
+
+# インデックスのエントリー（タイムスタンプ, レコードのオフセット, イベント種別ID）
+INDEX_ENTRY = struct.Struct("<dQI")
+
+# ペイロードの種類
+KIND_TEXT = 0
+KIND_BINARY = 1
+
+# スナップショット形式のフレーム（category を持たないJSON）のイベント種別名
+SNAPSHOT_TYPE = "snapshot"
+
+# 状態の再構築を開始できるイベント種別
+RESUME_TYPES = (SNAPSHOT_TYPE, "matchSetup")
+
+def index_path(path):
+    """記録ファイルに対応するインデックスファイルのパス"""
+    return Path(path).with_suffix(".apexidx")
+
+def types_path(path):
+    """記録ファイルに対応するイベント種別一覧のパス"""
+    return Path(path).with_suffix(".apextypes.json")
+
+class MatchRecorder:
+    """受信した生フレームを追記専用ファイルに記録する"""
+
+    def __init__(self, path, flush_interval=1.0):
+        """
+        Parameters:
+            path (str | Path): 記録ファイルのパス（.apexrec）
+            flush_interval (float): ディスクへ書き出す間隔（秒）
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self.data_file = open(self.path, "ab")
+        self.index_file = open(index_path(self.path), "ab")
+        if is_new:
+            self.data_file.write(FILE_MAGIC)
+
+        # イベント種別名 -> ID
+        self.type_ids = {}
+        types_file = types_path(self.path)
+        if types_file.exists():
+            with open(types_file, "r", encoding="utf-8") as f:
+                self.type_ids = {name: index for index, name in enumerate(json.load(f))}
+
+        self.last_flush = time.monotonic()
+        self.records = 0
+
+    @classmethod
+    def create(cls, directory, channel=None):
+        """日時（とチャンネル名）から名前を付けた新しい記録ファイルを作成"""
+        name = f"match_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if channel:
+            name += f"_{channel}"
+        name += ".apexrec"
+        return cls(Path(directory) / name)
+
+    def _type_id(self, event_type):
+        """イベント種別のIDを取得（新しい種別は一覧に追加）"""
+        type_id = self.type_ids.get(event_type)
+        if type_id is None:
+            type_id = len(self.type_ids)
+            self.type_ids[event_type] = type_id
+
+            # 種別一覧は小さいので追加のたびに丸ごと書き直す
+            names = sorted(self.type_ids, key=self.type_ids.get)
+            temp_file = types_path(self.path).with_suffix(".tmp")
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(names, f)
+            os.replace(temp_file, types_path(self.path))
+        return type_id
+
+    def record(self, message, event_type=SNAPSHOT_TYPE, timestamp=None):
+        """
+        受信したフレームを記録
+
+        Parameters:
+            message (str | bytes): WebSocketで受信した生のメッセージ
+            event_type (str): イベント種別（インデックス用）
+            timestamp (float): 受信時刻（省略時は現在時刻）
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        if isinstance(message, str):
+            kind = KIND_TEXT
+            payload = message.encode("utf-8")
+        else:
+            kind = KIND_BINARY
+            payload = bytes(message)
+
+        offset = self.data_file.tell()
+        self.data_file.write(RECORD_HEADER.pack(timestamp, kind, len(payload)))
+        self.data_file.write(payload)
+        self.index_file.write(INDEX_ENTRY.pack(timestamp, offset, self._type_id(event_type or SNAPSHOT_TYPE)))
+        self.records += 1
+
+        now = time.monotonic()
+        if now - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """バッファの内容をファイルに書き出す"""
+        self.data_file.flush()
+        self.index_file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """記録を終了"""
+        self.flush()
+        self.data_file.close()
+        self.index_file.close()
+
+class MatchReader:
+    """記録ファイルをインデックス経由で読み込む"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.data_file = open(self.path, "rb")
+        if self.data_file.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"記録ファイルの形式が正しくありません: {self.path}")
+
+        # インデックスはメモリマップして参照する
+        self.index_file = open(index_path(self.path), "rb")
+        size = os.fstat(self.index_file.fileno()).st_size
+        self.count = size // INDEX_ENTRY.size
+        self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        with open(types_path(self.path), "r", encoding="utf-8") as f:
+            self.type_names = json.load(f)
+
+        # イベント種別ID -> インデックス位置（初めて種別で検索したときに作成する）
+        self.type_positions = None
+
+    def close(self):
+        """ファイルを閉じる"""
+        if isinstance(self.index, mmap.mmap):
+            self.index.close()
+        self.index_file.close()
+        self.data_file.close()
+
+    def entry(self, position):
+        """インデックスのエントリー (タイムスタンプ, オフセット, イベント種別) を取得"""
+        timestamp, offset, type_id = INDEX_ENTRY.unpack_from(self.index, position * INDEX_ENTRY.size)
+        return timestamp, offset, self.type_names[type_id]
+
+    @property
+    def start_time(self):
+        """最初のレコードの時刻"""
+        return self.entry(0)[0] if self.count else 0.0
+
+    @property
+    def end_time(self):
+        """最後のレコードの時刻"""
+        return self.entry(self.count - 1)[0] if self.count else 0.0
+
+    def seek(self, seconds):
+        """
+        記録開始からの経過秒数に対応するインデックス位置を二分探索で取得
+
+        Parameters:
+            seconds (float): 記録開始からの経過秒数
+
+        Returns:
+            int: その時刻以降の最初のレコードのインデックス位置
+        """
+        target = self.start_time + seconds
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX_ENTRY.unpack_from(self.index, middle * INDEX_ENTRY.size)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def positions_for_type(self, event_type):
+        """指定したイベント種別のインデックス位置を取得（データファイルは読まない）"""
+        if event_type not in self.type_names:
+            return []
+        return list(self._positions_by_type().get(self.type_names.index(event_type), ()))
+
+    def _positions_by_type(self):
+        """
+        イベント種別ごとのインデックス位置
+
+        初回だけインデックス全体を1回走査してすべての種別を振り分け、以降の検索では走査しない
+        （読み込み後に追記されたレコードは対象外なので作り直す必要はない）
+        """
+        if self.type_positions is None:
+            type_positions = {}
+            with memoryview(self.index)[:self.count * INDEX_ENTRY.size] as entries:
+                for position, (_, _, type_id) in enumerate(INDEX_ENTRY.iter_unpack(entries)):
+                    positions = type_positions.get(type_id)
+                    if positions is None:
+                        positions = type_positions[type_id] = array("I")
+                    positions.append(position)
+            self.type_positions = type_positions
+        return self.type_positions
+
+    def resume_position(self):
+        """
+        状態を再構築するための開始位置を取得
+
+        最後のスナップショット、または最後のマッチ開始イベントのうち新しい方から
+        再生すれば、ファイル全体を読み直さずに現在の状態を復元できる
+        """
+        resume_ids = [self.type_names.index(name) for name in RESUME_TYPES if name in self.type_names]
+        for position in range(self.count - 1, -1, -1):
+            if INDEX_ENTRY.unpack_from(self.index, position * INDEX_ENTRY.size)[2] in resume_ids:
+                return position
+        return 0
+
+    def read(self, position):
+        """
+        指定したインデックス位置のレコードを読み込む
+
+        Returns:
+            tuple: (タイムスタンプ, イベント種別, メッセージ)
+        """
+        timestamp, offset, event_type = self.entry(position)
+        self.data_file.seek(offset)
+        _, kind, length = RECORD_HEADER.unpack(self.data_file.read(RECORD_HEADER.size))
+        payload = self.data_file.read(length)
+        message = payload.decode("utf-8") if kind == KIND_TEXT else payload
+        return timestamp, event_type, message
+
+    def iter_records(self, start=0):
+        """指定したインデックス位置から順にレコードを読み込む"""
+        if start >= self.count:
+            return
+
+        # 連続したレコードは順番に読むだけでよい
+        _, offset, _ = self.entry(start)
+        self.data_file.seek(offset)
+        for position in range(start, self.count):
+            timestamp, _, type_id = INDEX_ENTRY.unpack_from(self.index, position * INDEX_ENTRY.size)
+            header = self.data_file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                # 異常終了などで書き込みが途中のレコード
+                return
+            _, kind, length = RECORD_HEADER.unpack(header)
+            payload = self.data_file.read(length)
+            if len(payload) < length:
+                return
+            message = payload.decode("utf-8") if kind == KIND_TEXT else payload
+            yield timestamp, self.type_names[type_id], message
+
+async def replay(reader, ingest, speed=1.0, start=0):
+    """
+    記録したマッチをパイプラインに流し直す
+
+    Parameters:
+        reader (MatchReader): 記録ファイル
+        ingest (callable): 生のメッセージを受け取る関数（受信時と同じ処理）
+        speed (float): 再生速度（1で等速、0以下で最大速度）
+        start (int): 再生を開始するインデックス位置
+
+    Returns:
+        int: 再生したレコード数
+    """
+    played = 0
+    previous = None
+    for timestamp, _, message in reader.iter_records(start):
+        if speed > 0 and previous is not None and timestamp > previous:
+            await asyncio.sleep((timestamp - previous) / speed)
+        elif played % 100 == 0:
+            # 最大速度でも他の処理（配信など）を止めないようにする
+            await asyncio.sleep(0)
+        previous = timestamp
+
+        try:
+            ingest(message)
+        except Exception as e:
+            logger.error(f"再生中にエラーが発生しました: {str(e)}")
+        played += 1
+
+    return played
@@ -0,0 +1,67 @@
+import asyncio
+from server import codec
+from server.state_stream import StateStream
+
+# 設定の配信メッセージの種類
+SETTINGS_MESSAGE_TYPE = "settings"
+
+class SettingsPublisher:
+    """設定の1セクション（overlay）の変更をバージョン付きの差分としてオーバーレイに配信する"""
+
+    def __init__(self, settings_manager, publish, section="overlay"):
+        """
+        Parameters:
+            settings_manager (SettingsManager): 設定管理
+            publish (callable): 全オーバーレイにメッセージを配信する関数
+            section (str): 配信する設定のセクション
+        """
+        self.settings_manager = settings_manager
+        self.publish = publish
+        self.section = section
+        self.loop = None
+
+        # セクションの差分とバージョン（シーケンス番号）を管理
+        self.stream = StateStream()
+        self.stream.update(settings_manager.settings.get(section, {}))
+
+    def attach(self):
+        """設定の変更の監視を開始（実行中のイベントループ上で配信する）"""
+        self.loop = asyncio.get_running_loop()
+        self.settings_manager.add_listener(self._on_change)
+
+    def _on_change(self, old, new):
+        """設定の変更通知（どのスレッドから呼ばれてもイベントループ上で配信する）"""
+        section = new.get(self.section, {})
+        if old.get(self.section, {}) == section:
+            return
+        self.loop.call_soon_threadsafe(self._publish_change, section)
+
+    def _publish_change(self, section):
+        """変更されたパスだけを配信"""
+        patch = self.stream.update(section)
+        if patch is None:
+            return
+
+        message = {
+            "type": SETTINGS_MESSAGE_TYPE,
+            "section": self.section,
+            "version": patch["seq"],
+            "set": patch["set"]
+        }
+        if "del" in patch:
+            message["del"] = patch["del"]
+        self.publish(codec.OutgoingMessage(message))
+
+    def snapshot_message(self):
+        """
+        接続直後に送るセクション全体のメッセージ
+
+        Returns:
+            OutgoingMessage: 配信メッセージ
+        """
+        return codec.OutgoingMessage({
+            "type": SETTINGS_MESSAGE_TYPE,
+            "section": self.section,
+            "version": self.stream.seq,
+            self.section: self.stream.state
+        })
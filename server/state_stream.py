@@ -0,0 +1,108 @@
+def diff_state(old, new, prefix="", changes=None, removed=None):
+    """
+    2つのスナップショットを比較して変更されたパスを抽出
+
+    Parameters:
+        old (dict): 前回のスナップショット
+        new (dict): 今回のスナップショット
+        prefix (str): 再帰時のパスの接頭辞
+        changes (dict): 変更されたパスと値（"player.health": 80 の形式）
+        removed (list): 削除されたパス
+
+    Returns:
+        tuple: (changes, removed)
+    """
+    if changes is None:
+        changes = {}
+    if removed is None:
+        removed = []
+
+    for key, value in new.items():
+        path = f"{prefix}{key}"
+
+        if key not in old:
+            changes[path] = value
+            continue
+
+        old_value = old[key]
+        if old_value == value:
+            continue
+
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            diff_state(old_value, value, f"{path}.", changes, removed)
+        elif isinstance(value, list) and isinstance(old_value, list) and len(value) == len(old_value):
+            # 長さが同じリストは要素ごとに比較（スクワッドメンバーなど）
+            for index, item in enumerate(value):
+                old_item = old_value[index]
+                if old_item == item:
+                    continue
+                if isinstance(item, dict) and isinstance(old_item, dict):
+                    diff_state(old_item, item, f"{path}.{index}.", changes, removed)
+                else:
+                    changes[f"{path}.{index}"] = item
+        else:
+            changes[path] = value
+
+    for key in old:
+        if key not in new:
+            removed.append(f"{prefix}{key}")
+
+    return changes, removed
+
+class StateStream:
+    """処理済みスナップショットをバージョン管理し、差分メッセージを生成する"""
+
+    def __init__(self):
+        # シーケンス番号（スナップショットが変化するたびに増える）
+        self.seq = 0
+
+        # 最新のスナップショット
+        self.state = None
+
+    def update(self, snapshot):
+        """
+        新しいスナップショットを反映して配信用メッセージを生成
+
+        Parameters:
+            snapshot (dict): process_dataの戻り値
+
+        Returns:
+            dict: パッチ（初回はキーフレーム）。変化がなければNone
+        """
+        if self.state is None:
+            self.state = snapshot
+            self.seq += 1
+            return self.keyframe()
+
+        changes, removed = diff_state(self.state, snapshot)
+        if not changes and not removed:
+            return None
+
+        self.state = snapshot
+        self.seq += 1
+
+        patch = {
+            "type": "patch",
+            "seq": self.seq,
+            "set": changes
+        }
+        if removed:
+            patch["del"] = removed
+
+        return patch
+
+    def keyframe(self):
+        """
+        現在の状態全体を表すキーフレームを取得
+
+        Returns:
+            dict: キーフレーム。状態がまだなければNone
+        """
+        if self.state is None:
+            return None
+
+        return {
+            "type": "keyframe",
+            "seq": self.seq,
+            "state": self.state
+        }
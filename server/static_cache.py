@@ -0,0 +1,256 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from http import HTTPStatus
+from pathlib import Path
+from utils.file_watcher import DirectoryWatcher
+from utils.logger import get_logger
+
+# ロガーの取得
+logger = get_logger()
+
+# gzipで圧縮するContent-Type
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+# これより小さいファイルは圧縮しない（バイト）
+MIN_COMPRESS_SIZE = 256
+
+# キャッシュの再検証を必須にする（OBSのシーン切り替えでは304で済ませる）
+CACHE_CONTROL = "no-cache"
+
+# inotifyが使えない場合にディスク上の変更を確認する間隔（秒）
+DEFAULT_CHECK_INTERVAL = 1.0
+
+class StaticEntry:
+    """メモリ上に保持する静的ファイル1つ分"""
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.body = path.read_bytes()
+
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        compressible = content_type.startswith(COMPRESSIBLE_TYPES)
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        self.content_type = content_type
+
+        # 内容のハッシュから強いETagを作成（表現ごとに別のETag）
+        digest = hashlib.sha1(self.body).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+
+        # 圧縮しても小さくならない場合は圧縮版を持たない
+        self.gzip_body = None
+        self.gzip_etag = None
+        if compressible and len(self.body) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if len(compressed) < len(self.body):
+                self.gzip_body = compressed
+                self.gzip_etag = f'"{digest}-gzip"'
+
+def accepts_gzip(accept_encoding):
+    """Accept-Encodingがgzipを受け付けるかどうか"""
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            params = params.replace(" ", "")
+            return params not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def etag_matches(if_none_match, etag):
+    """If-None-MatchがETagに一致するかどうか"""
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+class StaticCache:
+    """
+    ドキュメントルート以下のファイルをメモリに読み込み、圧縮版とETagを付けて配信する
+
+    変更はディレクトリごとのDirectoryWatcher（Linuxではinotify、それ以外はポーリング）で検知し、
+    変更のあったディレクトリだけを読み直す。
+    """
+
+    def __init__(self, directory):
+        self.root = Path(directory).resolve()
+
+        # リクエストパス（"/index.html" など） -> StaticEntry
+        self.entries = {}
+
+        # 読み込んだディレクトリ -> 監視（監視の開始前はNone）
+        self.directories = {}
+        self.watching = False
+        self.force_poll = False
+        self.poll_interval = DEFAULT_CHECK_INTERVAL
+
+        self.refresh()
+
+    def _scan(self, directory):
+        """ディレクトリ直下のファイル（リクエストパス -> (パス, stat)）とサブディレクトリを取得"""
+        files = {}
+        subdirectories = []
+        try:
+            with os.scandir(directory) as iterator:
+                for entry in iterator:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(Path(entry.path))
+                    elif entry.is_file():
+                        path = Path(entry.path)
+                        files["/" + path.relative_to(self.root).as_posix()] = (path, entry.stat())
+        except OSError:
+            pass
+        return files, subdirectories
+
+    def refresh(self, directory=None):
+        """
+        ディスク上の変更をキャッシュに反映
+
+        Parameters:
+            directory (Path): 変更のあったディレクトリ（Noneの場合はドキュメントルート以下すべて）。
+                指定した場合、サブディレクトリは新しく作られたものだけを読み込む
+
+        Returns:
+            int: 追加・更新・削除したファイルの数
+        """
+        changed = 0
+        pending = [directory if directory is not None else self.root]
+        while pending:
+            current = pending.pop()
+            files, subdirectories = self._scan(current)
+
+            for request_path, (path, stat) in files.items():
+                entry = self.entries.get(request_path)
+                if entry is not None and entry.signature == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                try:
+                    self.entries[request_path] = StaticEntry(path, stat)
+                    changed += 1
+                except OSError as e:
+                    logger.error(f"静的ファイルの読み込みに失敗しました: {path} ({str(e)})")
+
+            for request_path, entry in list(self.entries.items()):
+                if entry.path.parent == current and request_path not in files:
+                    del self.entries[request_path]
+                    changed += 1
+
+            # 削除されたサブディレクトリはその下のファイルごと破棄する
+            for known in list(self.directories):
+                if known.parent == current and known not in subdirectories:
+                    changed += self._remove_directory(known)
+
+            for subdirectory in subdirectories:
+                if directory is None or subdirectory not in self.directories:
+                    pending.append(subdirectory)
+
+            if current not in self.directories:
+                self.directories[current] = self._watch(current) if self.watching else None
+
+        return changed
+
+    def _remove_directory(self, directory):
+        """ディレクトリ以下のファイルと監視を破棄して、破棄したファイルの数を返す"""
+        removed = 0
+        for request_path, entry in list(self.entries.items()):
+            if directory in entry.path.parents:
+                del self.entries[request_path]
+                removed += 1
+        for known in list(self.directories):
+            if known == directory or directory in known.parents:
+                watcher = self.directories.pop(known)
+                if watcher is not None:
+                    watcher.stop()
+        return removed
+
+    def _watch(self, directory):
+        """ディレクトリの監視を開始"""
+        watcher = DirectoryWatcher(directory, lambda: self._on_change(directory), "*", self.poll_interval)
+        return watcher.start(self.force_poll)
+
+    def _on_change(self, directory=None):
+        """変更のあったディレクトリ（Noneの場合はすべて）を読み直す"""
+        if directory is not None and directory not in self.directories:
+            return
+        changed = self.refresh(directory)
+        if changed:
+            logger.info(f"静的ファイルのキャッシュを更新しました: {changed}件")
+
+    def start(self, force_poll=False, poll_interval=DEFAULT_CHECK_INTERVAL):
+        """
+        ディスク上の変更の監視を開始（実行中のイベントループが必要）
+
+        Parameters:
+            force_poll (bool): inotifyを使わずにポーリングする
+            poll_interval (float): ポーリング時の確認間隔（秒）
+        """
+        self.watching = True
+        self.force_poll = force_poll
+        self.poll_interval = poll_interval
+        for directory, watcher in list(self.directories.items()):
+            if watcher is None:
+                self.directories[directory] = self._watch(directory)
+
+        # 読み込みから監視の開始までの間の変更を反映
+        self._on_change()
+        return self
+
+    def stop(self):
+        """監視を終了"""
+        self.watching = False
+        for directory, watcher in self.directories.items():
+            if watcher is not None:
+                watcher.stop()
+                self.directories[directory] = None
+
+    def lookup(self, path):
+        """リクエストパスに対応するエントリーを取得"""
+        if path.endswith("/"):
+            path += "index.html"
+        entry = self.entries.get(path)
+        if entry is None:
+            # ディレクトリへのリクエスト
+            entry = self.entries.get(path + "/index.html")
+        return entry
+
+    def response(self, path, headers):
+        """
+        静的ファイルのレスポンスを作成
+
+        Parameters:
+            path (str): リクエストパス
+            headers (dict): リクエストヘッダー（小文字のキー）
+
+        Returns:
+            tuple: (ステータスコード, ヘッダー, ボディ)
+        """
+        entry = self.lookup(path)
+        if entry is None:
+            return HTTPStatus.NOT_FOUND, {"Content-Type": "text/plain; charset=utf-8"}, b"Not Found"
+
+        if entry.gzip_body is not None and accepts_gzip(headers.get("accept-encoding", "")):
+            body, etag = entry.gzip_body, entry.gzip_etag
+            response_headers = {"Content-Encoding": "gzip"}
+        else:
+            body, etag = entry.body, entry.etag
+            response_headers = {}
+
+        response_headers["Content-Type"] = entry.content_type
+        response_headers["ETag"] = etag
+        response_headers["Cache-Control"] = CACHE_CONTROL
+        if entry.gzip_body is not None:
+            response_headers["Vary"] = "Accept-Encoding"
+
+        # 条件付きリクエスト
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            del response_headers["Content-Type"]
+            response_headers.pop("Content-Encoding", None)
+            return HTTPStatus.NOT_MODIFIED, response_headers, b""
+
+        return HTTPStatus.OK, response_headers, body
@@ -3,7 +3,11 @@ import json
 import websockets
 from pathlib import Path
 from utils.logger import get_logger
+from server import codec
 from server.api_handler import process_game_data
+from server.broadcast_hub import BroadcastHub, is_game_frame
+from server.state_stream import StateStream
+from server.conflation import Conflator
 
 # ロガーの取得
 logger = get_logger()
@@ -11,6 +15,21 @@ logger = get_logger()
 # 接続しているクライアント
 connected_clients = set()
 
+# ゲームからの入力をオーバーレイへ配信するハブ
+hub = BroadcastHub()
+
+# 処理済みデータの差分配信
+state_stream = StateStream()
+
+def publish_state(snapshot):
+    """スナップショットの差分を全オーバーレイに配信"""
+    patch = state_stream.update(snapshot)
+    if patch is not None:
+        hub.publish(codec.OutgoingMessage(patch))
+
+# ティック内の更新をまとめて配信
+conflator = Conflator(publish_state)
+
 async def handle_client(websocket, path):
     """クライアント接続のハンドリング"""
     logger.info(f"新しいクライアント接続: {websocket.remote_address}")
@@ -18,17 +37,35 @@ async def handle_client(websocket, path):
     # クライアントをリストに追加
     connected_clients.add(websocket)
     
+    # ゲームデータを送ってくるまではオーバーレイとして扱う
+    hub.add_consumer(websocket)
+    
+    # 接続直後に現在の状態全体を送信
+    send_keyframe(websocket)
+    
     try:
         async for message in websocket:
             try:
                 # JSON形式のメッセージをパース
-                data = json.loads(message)
+                data = codec.decode(message)
+                
+                # オーバーレイからの制御メッセージは配信しない
+                if not is_game_frame(data):
+                    if isinstance(data, dict) and data.get("type") == "resync":
+                        send_keyframe(websocket)
+                    continue
+                
+                await hub.promote_to_producer(websocket)
                 
                 # ゲームデータの処理
                 processed_data = process_game_data(data)
                 
-                # 処理結果をクライアントに送信
-                await websocket.send(json.dumps(processed_data))
+                if "error" in processed_data:
+                    await broadcast_message(codec.OutgoingMessage(processed_data))
+                    continue
+                
+                # ティックごとにまとめて差分を配信
+                conflator.submit(processed_data)
                 
             except json.JSONDecodeError:
                 logger.error("JSONのパースに失敗しました")
@@ -40,17 +77,27 @@ async def handle_client(websocket, path):
     finally:
         # クライアントをリストから削除
         connected_clients.remove(websocket)
+        await hub.remove(websocket)
+
+def send_keyframe(websocket):
+    """クライアントに現在の状態全体を送信"""
+    keyframe = state_stream.keyframe()
+    if keyframe is not None:
+        hub.send_to(websocket, codec.OutgoingMessage(keyframe))
 
 async def broadcast_message(message):
-    """全クライアントにメッセージをブロードキャスト"""
-    if connected_clients:
-        await asyncio.gather(
-            *[client.send(message) for client in connected_clients]
-        )
+    """
+    全クライアントにメッセージをブロードキャスト
+
+    Parameters:
+        message (codec.OutgoingMessage): 配信するメッセージ（接続ごとの形式でエンコードされる）
+    """
+    # 各クライアントの送信キューに積むだけなので、遅いクライアントに引きずられない
+    hub.publish(message)
 
 async def start_websocket_server(host, port):
     """WebSocketサーバーの起動"""
-    server = await websockets.serve(handle_client, host, port)
+    server = await websockets.serve(handle_client, host, port, subprotocols=codec.SUBPROTOCOLS, compression=None)
     logger.info(f"WebSocketサーバーを起動しました - {host}:{port}")
     
     # サーバーを永続的に実行
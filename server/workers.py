@@ -0,0 +1,376 @@
+import asyncio
+import struct
+import websockets
+from server import codec
+from server.broadcast_hub import is_game_frame
+from server.channels import (
+    parse_channels, parse_topics, parse_query_topics, is_valid_channel, topic_key, split_key, MAX_SUBSCRIPTIONS
+)
+from server.liveapi_proto import is_protobuf_frame, decode_event, ProtobufDecodeError
+from utils.logger import get_logger
+
+# ロガーの取得
+logger = get_logger()
+
+# 取り込みプロセスとワーカープロセスの間のローカルなpub/sub（Unixソケット）
+#
+# 取り込みプロセスがゲームからのフレームを処理し、チャンネルごとにシリアライズ済みの
+# 差分メッセージを全ワーカーへ1回ずつ書き込む。ワーカーはSO_REUSEPORTで同じポートを
+# 待ち受け、自分に割り当てられたオーバーレイにだけ配信する。
+#
+# メッセージの形式: 種類(1) + キーの長さ(2) + ペイロードの長さ(4) + キー + ペイロード
+# キーはチャンネル名、またはトピックの配信では "チャンネル名/トピック名"
+#
+# 配信メッセージのペイロード: JSONの長さ(4) + JSON + MessagePack
+# MessagePackはMessagePackの接続があるワーカーにだけ含める（取り込みプロセスで形式ごとに1回だけエンコード）
+
+# メッセージのヘッダー / 配信メッセージのペイロードのヘッダー
+HEADER = struct.Struct("!BHI")
+PAYLOAD_HEADER = struct.Struct("!I")
+
+# 取り込み -> ワーカー
+KIND_PUBLISH = 1        # チャンネルの購読者への配信
+KIND_KEYFRAME = 2       # キーフレームの要求への応答（状態がなければ空）
+
+# ワーカー -> 取り込み
+KIND_FRAME_TEXT = 3     # ワーカーに接続したゲームからのフレーム（JSON）
+KIND_FRAME_BINARY = 4   # ワーカーに接続したゲームからのフレーム（protobuf）
+KIND_RESYNC = 5         # キーフレームの要求
+KIND_FORMATS = 6        # MessagePackの接続があるかどうか（ペイロードが b"\x01" ならあり）
+
+# ワーカーへの書き込みが溜まった場合に破棄し始めるサイズ（バイト）
+# 破棄した差分はクライアント側でシーケンス番号の欠落として検出され、再同期される
+MAX_PENDING_BYTES = 8 * 1024 * 1024
+
+def encode_message(kind, channel, payload=b""):
+    """pub/subのメッセージを作成"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    name = channel.encode("utf-8")
+    return HEADER.pack(kind, len(name), len(payload)) + name + payload
+
+def encode_payload(message, packed=False):
+    """
+    配信メッセージをpub/subのペイロードに変換
+
+    Parameters:
+        message (OutgoingMessage): 配信メッセージ
+        packed (bool): MessagePackも含めるかどうか
+    """
+    text = message.encode(codec.SUBPROTOCOL_JSON).encode("utf-8")
+    payload = PAYLOAD_HEADER.pack(len(text)) + text
+    if packed:
+        payload += message.encode(codec.SUBPROTOCOL_MSGPACK)
+    return payload
+
+def decode_payload(payload):
+    """
+    pub/subのペイロードから配信メッセージを作成（エンコード済みのデータをそのまま使う）
+
+    Returns:
+        OutgoingMessage: 配信メッセージ
+    """
+    (length,) = PAYLOAD_HEADER.unpack_from(payload)
+    end = PAYLOAD_HEADER.size + length
+    encoded = {codec.SUBPROTOCOL_JSON: payload[PAYLOAD_HEADER.size:end].decode("utf-8")}
+    if len(payload) > end:
+        encoded[codec.SUBPROTOCOL_MSGPACK] = payload[end:]
+    return codec.OutgoingMessage(encoded=encoded)
+
+async def read_message(reader):
+    """
+    pub/subのメッセージを1件読み取る
+
+    Returns:
+        tuple: (種類, チャンネル名, ペイロード)
+    """
+    header = await reader.readexactly(HEADER.size)
+    kind, name_length, payload_length = HEADER.unpack(header)
+    body = await reader.readexactly(name_length + payload_length)
+    return kind, body[:name_length].decode("utf-8"), body[name_length:]
+
+class IngestBus:
+    """取り込みプロセス側: ワーカーの接続を受け付け、チャンネルのメッセージを中継する"""
+
+    def __init__(self, ingest, keyframe):
+        """
+        Parameters:
+            ingest (callable): (メッセージ, チャンネル名) を受け取りフレームを処理する関数
+            keyframe (callable): キー（チャンネル名かチャンネル名/トピック名）を受け取り
+                キーフレーム（OutgoingMessageかNone）を返す関数
+        """
+        self.ingest = ingest
+        self.keyframe = keyframe
+        self.writers = set()
+        self.server = None
+
+        # MessagePackの接続があるワーカー（配信メッセージにMessagePackも含める）
+        self.msgpack_writers = set()
+
+        # カウンター
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self, path):
+        """Unixソケットで待ち受けを開始"""
+        self.server = await asyncio.start_unix_server(self._handle_worker, path)
+        return self
+
+    def close(self):
+        """待ち受けとワーカーとの接続を閉じる"""
+        if self.server is not None:
+            self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+
+    def publish(self, channel, message):
+        """
+        チャンネルのメッセージを全ワーカーに書き込む（シリアライズは形式ごとに1回だけ）
+
+        Parameters:
+            channel (str): キー（チャンネル名かチャンネル名/トピック名）
+            message (OutgoingMessage): 配信メッセージ
+        """
+        if not self.writers:
+            return
+        data = {}
+        for writer in self.writers:
+            if writer.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                self.dropped += 1
+                continue
+            packed = writer in self.msgpack_writers
+            if packed not in data:
+                data[packed] = encode_message(KIND_PUBLISH, channel, encode_payload(message, packed))
+            writer.write(data[packed])
+        self.published += 1
+
+    async def _handle_worker(self, reader, writer):
+        """ワーカー1つ分の接続"""
+        self.writers.add(writer)
+        logger.info(f"ワーカーが接続しました（{len(self.writers)}）")
+        try:
+            while True:
+                kind, channel, payload = await read_message(reader)
+
+                if kind == KIND_RESYNC:
+                    if split_key(channel)[0] is not None:
+                        keyframe = self.keyframe(channel)
+                        payload = encode_payload(keyframe, writer in self.msgpack_writers) if keyframe is not None else b""
+                        writer.write(encode_message(KIND_KEYFRAME, channel, payload))
+                elif kind == KIND_FORMATS:
+                    if payload == b"\x01":
+                        self.msgpack_writers.add(writer)
+                    else:
+                        self.msgpack_writers.discard(writer)
+                elif kind in (KIND_FRAME_TEXT, KIND_FRAME_BINARY) and is_valid_channel(channel):
+                    message = payload.decode("utf-8") if kind == KIND_FRAME_TEXT else payload
+                    try:
+                        self.ingest(message, channel)
+                    except Exception as e:
+                        logger.error(f"ワーカーから中継されたフレームの処理中にエラーが発生しました: {str(e)}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            self.msgpack_writers.discard(writer)
+            writer.close()
+            logger.info(f"ワーカーが切断しました（{len(self.writers)}）")
+
+    def get_stats(self):
+        """統計情報を取得"""
+        return {
+            "workers": len(self.writers),
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+class WorkerFanout:
+    """ワーカープロセス側: 取り込みプロセスから届いたメッセージを担当のオーバーレイに配信する"""
+
+    def __init__(self, hub, settings_publisher):
+        """
+        Parameters:
+            hub (BroadcastHub): このワーカーの送信キュー
+            settings_publisher (SettingsPublisher): このワーカーのオーバーレイ設定の配信
+        """
+        self.hub = hub
+        self.settings_publisher = settings_publisher
+        self.reader = None
+        self.writer = None
+
+        # キー（チャンネル名かチャンネル名/トピック名） -> 購読しているwebsocket
+        self.subscribers = {}
+
+        # websocket -> 購読しているチャンネル名の集合 / 購読しているトピック（Noneはすべて）
+        self.subscriptions = {}
+        self.topics = {}
+
+        # キーフレームを待っている接続（同じチャンネルの要求は1回にまとめる）
+        self.pending_keyframes = {}
+
+        # MessagePackで受信しているオーバーレイの数
+        self.msgpack_clients = 0
+
+    async def connect(self, path):
+        """取り込みプロセスのpub/subに接続"""
+        self.reader, self.writer = await asyncio.open_unix_connection(path)
+        return self
+
+    async def run(self):
+        """取り込みプロセスからのメッセージを配信し続ける（接続が閉じたら終了）"""
+        try:
+            while True:
+                kind, channel, payload = await read_message(self.reader)
+                if kind == KIND_PUBLISH:
+                    message = decode_payload(payload)
+                    for websocket in self.subscribers.get(channel, ()):
+                        self.hub.send_to(websocket, message)
+                elif kind == KIND_KEYFRAME:
+                    waiting = self.pending_keyframes.pop(channel, ())
+                    if payload:
+                        message = decode_payload(payload)
+                        for websocket in waiting:
+                            if websocket in self.subscribers.get(channel, ()):
+                                self.hub.send_to(websocket, message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.info("取り込みプロセスとの接続が閉じられました")
+
+    def request_keyframe(self, websocket, key):
+        """キーフレームを取り込みプロセスに要求"""
+        waiting = self.pending_keyframes.get(key)
+        if waiting is None:
+            waiting = self.pending_keyframes[key] = set()
+            self.writer.write(encode_message(KIND_RESYNC, key))
+        waiting.add(websocket)
+
+    def _keys(self, websocket, channel, topic=None):
+        """接続がチャンネルで購読しているキー（topicを指定した場合はそのトピックのみ）"""
+        topics = self.topics.get(websocket)
+        if topics is None:
+            return [channel]
+        if topic is not None and topic in topics:
+            topics = (topic,)
+        return [topic_key(channel, name) for name in topics]
+
+    def _add(self, websocket, channel):
+        for key in self._keys(websocket, channel):
+            self.subscribers.setdefault(key, set()).add(websocket)
+            self.request_keyframe(websocket, key)
+
+    def _remove(self, websocket, channel):
+        for key in self._keys(websocket, channel):
+            subscribers = self.subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(websocket)
+                if not subscribers:
+                    del self.subscribers[key]
+
+    def subscribe(self, websocket, channels):
+        """オーバーレイをチャンネルに登録してキーフレームを要求"""
+        subscribed = self.subscriptions.setdefault(websocket, set())
+        for channel in channels:
+            if not is_valid_channel(channel) or channel in subscribed:
+                continue
+            if len(subscribed) >= MAX_SUBSCRIPTIONS:
+                logger.warning(f"購読できるチャンネル数の上限（{MAX_SUBSCRIPTIONS}）に達しました: {websocket.remote_address}")
+                break
+            subscribed.add(channel)
+            self._add(websocket, channel)
+
+    def unsubscribe(self, websocket, channels=None):
+        """オーバーレイのチャンネル登録を解除（channelsがNoneの場合はすべて）"""
+        subscribed = self.subscriptions.get(websocket)
+        if not subscribed:
+            return
+        for channel in list(subscribed if channels is None else channels):
+            if channel in subscribed:
+                subscribed.discard(channel)
+                self._remove(websocket, channel)
+
+    def set_topics(self, websocket, topics):
+        """購読するトピックを変更（購読中のチャンネルすべてに適用）"""
+        channels = self.subscriptions.get(websocket, ())
+        for channel in channels:
+            self._remove(websocket, channel)
+        if topics is None:
+            self.topics.pop(websocket, None)
+        else:
+            self.topics[websocket] = topics
+        for channel in channels:
+            self._add(websocket, channel)
+
+    def handle_control(self, websocket, data):
+        """オーバーレイからの制御メッセージ（購読・再同期）を処理"""
+        message_type = data.get("type")
+        if message_type == "subscribe":
+            if "topics" in data:
+                self.set_topics(websocket, parse_topics(data["topics"]))
+            self.subscribe(websocket, data.get("channels", []))
+        elif message_type == "unsubscribe":
+            self.unsubscribe(websocket, data.get("channels", []))
+        elif message_type == "resync":
+            name = data.get("channel")
+            for channel in self.subscriptions.get(websocket, ()):
+                if name is None or channel == name:
+                    for key in self._keys(websocket, channel, data.get("topic")):
+                        self.request_keyframe(websocket, key)
+
+    def _count_msgpack(self, websocket, delta):
+        """MessagePackの接続の数を更新（0との間で変わった場合は取り込みプロセスに通知）"""
+        if codec.wire_format(getattr(websocket, "subprotocol", None)) != codec.SUBPROTOCOL_MSGPACK:
+            return
+        before = self.msgpack_clients
+        self.msgpack_clients += delta
+        if (before == 0) != (self.msgpack_clients == 0):
+            self.writer.write(encode_message(KIND_FORMATS, "", b"\x01" if self.msgpack_clients else b"\x00"))
+
+    def forward(self, channel, message):
+        """ゲームからのフレームを取り込みプロセスに中継"""
+        kind = KIND_FRAME_TEXT if isinstance(message, str) else KIND_FRAME_BINARY
+        self.writer.write(encode_message(kind, channel, message))
+
+    async def handle_client(self, websocket, path):
+        """WebSocketハンドラー（main.py の handle_client のワーカー版）"""
+        channels = parse_channels(path)
+        producing = None
+
+        self.hub.add_consumer(websocket)
+        self._count_msgpack(websocket, 1)
+        self.hub.send_to(websocket, self.settings_publisher.snapshot_message())
+        self.set_topics(websocket, parse_query_topics(path))
+        self.subscribe(websocket, channels)
+
+        try:
+            async for message in websocket:
+                if not is_protobuf_frame(message):
+                    try:
+                        data = codec.decode(message)
+                    except ValueError:
+                        continue
+
+                    # オーバーレイからの制御メッセージ（helloなど）は中継しない
+                    if not is_game_frame(data):
+                        if isinstance(data, dict) and producing is None:
+                            self.handle_control(websocket, data)
+                        continue
+                elif producing is None:
+                    # ゲーム接続に切り替える前にデコードできるか確認する（中継後の処理はメインプロセス）
+                    try:
+                        decode_event(message)
+                    except ProtobufDecodeError:
+                        continue
+
+                if producing is None:
+                    await self.hub.promote_to_producer(websocket)
+                    self.unsubscribe(websocket)
+                    self.topics.pop(websocket, None)
+                    producing = channels[0]
+                self.forward(producing, message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.unsubscribe(websocket)
+            self.subscriptions.pop(websocket, None)
+            self.topics.pop(websocket, None)
+            self._count_msgpack(websocket, -1)
+            await self.hub.remove(websocket)
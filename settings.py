@@ -1,24 +1,155 @@
+import atexit
 import json
 import os
+import threading
+import time
 from pathlib import Path
 from utils.logger import get_logger
+from utils.file_watcher import file_signature
 
 # ロガーの取得
 logger = get_logger()
 
+# 最後の変更からファイルに書き込むまでの待ち時間（秒）
+SAVE_DELAY = 0.5
+
+# 変更が続いても最初の変更からこの時間内には書き込む（秒）
+MAX_SAVE_DELAY = 2.0
+
+class FrozenDict(dict):
+    """変更できないdict（設定のスナップショット用）"""
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("設定のスナップショットは変更できません（set_settingを使用してください）")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def __copy__(self):
+        return self
+    
+    def __deepcopy__(self, memo):
+        return self
+
+def freeze(value):
+    """設定値を変更できない形に変換（dict -> FrozenDict, list -> tuple）"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """スナップショットを変更できるdict / listに戻す"""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
 class SettingsManager:
-    """設定管理クラス"""
+    """
+    設定管理クラス
+    
+    設定はロックで保護したコピーオンライトのスナップショットとして保持する。
+    読み取り側は常に変更されないスナップショット（self.settings）を参照し、
+    変更は新しいスナップショットに差し替えてからファイルへの書き込みをまとめて行う。
+    """
     
     def __init__(self, settings_file="settings.json"):
         self.settings_file = Path(settings_file)
-        self.settings = self._load_default_settings()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()
+        
+        # 設定が変わるたびに増えるバージョンと、変更を通知する関数
+        self.version = 0
+        self._listeners = []
+        
+        # 最後に自分で書き込んだファイルの状態（自分の書き込みを再読み込みしないため）
+        self._written_signature = None
+        
+        # 書き込み待ちの状態
+        self._dirty = False
+        self._first_change = 0.0
+        self._last_change = 0.0
+        self._writer = None
+        
+        settings = self._load_default_settings()
         
         # 設定ファイルが存在する場合は読み込む
         if self.settings_file.exists():
-            self._load_settings()
+            settings = self._load_settings(settings)
+            self._snapshot = freeze(settings)
         else:
             # 存在しない場合はデフォルト設定を保存
-            self.save_settings()
+            self._snapshot = freeze(settings)
+            self._write(self._snapshot)
+        
+        # 終了時に書き込み待ちの変更を保存
+        atexit.register(self.flush)
+    
+    @property
+    def settings(self):
+        """現在の設定のスナップショット（変更不可）"""
+        return self._snapshot
+    
+    def add_listener(self, listener):
+        """
+        設定の変更を通知する関数を登録
+        
+        Parameters:
+            listener (callable): (変更前のスナップショット, 変更後のスナップショット) を受け取る関数
+        """
+        self._listeners.append(listener)
+    
+    def _swap(self, settings):
+        """新しいスナップショットに差し替えて変更を通知（ロックを取得して呼び出す）"""
+        old = self._snapshot
+        new = freeze(settings)
+        if new == old:
+            return None
+        self._snapshot = new
+        self.version += 1
+        return old, new
+    
+    def _notify(self, swapped):
+        """変更を通知（ロックの外で呼び出す）"""
+        if swapped is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(*swapped)
+            except Exception as e:
+                logger.error(f"設定変更の通知中にエラーが発生しました: {str(e)}")
+    
+    def reload(self):
+        """
+        設定ファイルを読み直して変更があれば反映（ファイルの外部編集用）
+        
+        Returns:
+            bool: 設定が変わったかどうか
+        """
+        with self._lock:
+            # 書き込み待ちの変更がある場合や自分で書き込んだ直後の場合は読み直さない
+            if self._dirty or file_signature(self.settings_file) == self._written_signature:
+                return False
+        
+        try:
+            with open(self.settings_file, "r") as f:
+                settings = json.load(f)
+        except Exception as e:
+            # 編集途中の不完全なファイルなどは無視して現在の設定を維持
+            logger.error(f"設定ファイルの再読み込みに失敗しました: {str(e)}")
+            return False
+        self._merge_settings(self._load_default_settings(), settings)
+        
+        with self._lock:
+            if self._dirty:
+                return False
+            swapped = self._swap(settings)
+        self._notify(swapped)
+        return swapped is not None
     
     def _load_default_settings(self):
         """デフォルト設定を取得"""
@@ -48,36 +179,72 @@ class SettingsManager:
             },
             "websocket": {
                 "host": "localhost",
-                "port": 7777
+                "port": 7777,
+                "sendQueueSize": 64  # オーバーレイ1接続あたりの送信キュー上限
             },
             "http": {
                 "host": "localhost",
                 "port": 8080
             },
+            "stream": {
+                "tickRate": 30  # 1秒あたりの最大配信回数（0でまとめない）
+            },
+            "recording": {
+                "enabled": False,  # 受信したフレームを記録するかどうか
+                "directory": "recordings"
+            },
+            "analytics": {
+                "enabled": False,  # 終了したマッチの統計を分析ストアに取り込むかどうか
+                "directory": "analytics"
+            },
+            "logging": {
+                "level": "INFO",  # ログレベル（APIから実行中に変更可能）
+                "frameSampleEvery": 100,  # フレーム単位のログを種類ごとに何件に1件記録するか
+                "frameRateLimit": 10,  # フレーム単位のログの種類ごとの1秒あたりの最大件数
+                "frameSampleOverrides": {}  # { "種類": 何件に1件 } 種類ごとの記録間隔（frameSampleEveryより優先）
+            },
+            "compression": {
+                "enabled": False,  # WebSocketの圧縮（permessage-deflate）を使うかどうか（同じPCのOBSからの接続では不要）
+                "level": 6,  # 圧縮レベル（1〜9、低いほどCPU負荷が小さい）
+                "windowBits": 12,  # 圧縮ウィンドウのサイズ（8〜15、大きいほどメモリを使い圧縮率が上がる）
+                "memLevel": 5  # zlibのメモリ使用量（1〜9）
+            },
+            "logSource": {
+                "enabled": False,  # LiveAPIのログファイルを追いかけて読み込むかどうか
+                "directory": "",  # ログファイルのディレクトリ（空の場合はLiveAPIのディレクトリ）
+                "pattern": "*.json",  # ログファイル名のパターン
+                "channel": "default",  # 読み込んだイベントを処理するチャンネル
+                "offsetsFile": "liveapi_offsets.json",  # 読み込み位置の保存先（再起動時に続きから読む）
+                "pollInterval": 1.0,  # ポーリングで変更を確認する間隔（秒）
+                "forcePolling": False  # inotifyを使わずにポーリングする（共有フォルダの場合）
+            },
             "nameOverride": {
                 "enabled": False,
                 "presets": {}  # { "preset1": { "1234567890": "PlayerName1", ... } }
             }
         }
     
-    def _load_settings(self):
+    def _load_settings(self, default):
         """設定ファイルから設定を読み込む"""
         try:
             with open(self.settings_file, "r") as f:
                 loaded_settings = json.load(f)
             
             # 読み込んだ設定をデフォルト設定にマージ
-            self._merge_settings(self.settings, loaded_settings)
+            self._merge_settings(default, loaded_settings)
             logger.info(f"設定を読み込みました: {self.settings_file}")
+            return loaded_settings
         except Exception as e:
             logger.error(f"設定ファイルの読み込みに失敗しました: {str(e)}")
+            return default
     
     def _merge_settings(self, default, loaded):
         """設定をマージする（欠けている設定はデフォルト値で補完）"""
         for key, value in default.items():
             if key not in loaded:
                 loaded[key] = value
-            elif isinstance(value, dict) and isinstance(loaded[key], dict):
+            elif value and isinstance(value, dict) and isinstance(loaded[key], dict):
+                # デフォルトが空のdict（プリセットなど任意のキーを持つ設定）の中身はそのまま残す
                 self._merge_settings(value, loaded[key])
         
         # デフォルトにない余分な設定を削除
@@ -85,16 +252,80 @@ class SettingsManager:
         for key in keys_to_remove:
             del loaded[key]
     
+    def _write(self, snapshot):
+        """スナップショットを一時ファイルに書き込んでから置き換える"""
+        with self._write_lock:
+            temp_file = self.settings_file.with_name(self.settings_file.name + ".tmp")
+            try:
+                with open(temp_file, "w") as f:
+                    json.dump(snapshot, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.settings_file)
+                self._written_signature = file_signature(self.settings_file)
+                logger.info(f"設定を保存しました: {self.settings_file}")
+                return True
+            except Exception as e:
+                logger.error(f"設定の保存に失敗しました: {str(e)}")
+                return False
+    
+    def _writer_loop(self):
+        """書き込み待ちの変更をまとめてファイルに書き込む（バックグラウンドスレッド）"""
+        while True:
+            with self._changed:
+                while not self._dirty:
+                    self._changed.wait()
+                
+                # 変更が落ち着くまで待つ（変更が続く場合も最大待ち時間で書き込む）
+                while self._dirty:
+                    deadline = min(self._last_change + SAVE_DELAY, self._first_change + MAX_SAVE_DELAY)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                
+                if not self._dirty:
+                    # flush() で書き込み済み
+                    continue
+                snapshot = self._snapshot
+                self._dirty = False
+            
+            self._write(snapshot)
+    
     def save_settings(self):
-        """設定をファイルに保存"""
-        try:
-            with open(self.settings_file, "w") as f:
-                json.dump(self.settings, f, indent=4)
-            logger.info(f"設定を保存しました: {self.settings_file}")
-            return True
-        except Exception as e:
-            logger.error(f"設定の保存に失敗しました: {str(e)}")
-            return False
+        """
+        設定の保存を予約（書き込みは短時間の変更をまとめてバックグラウンドで行う）
+        
+        Returns:
+            bool: 保存を予約できたかどうか
+        """
+        with self._changed:
+            now = time.monotonic()
+            if not self._dirty:
+                self._dirty = True
+                self._first_change = now
+            self._last_change = now
+            
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="settings-writer", daemon=True)
+                self._writer.start()
+            self._changed.notify()
+        return True
+    
+    def flush(self):
+        """
+        書き込み待ちの変更があればすぐにファイルに書き込む
+        
+        Returns:
+            bool: 書き込みに成功したかどうか（変更が無い場合もTrue）
+        """
+        with self._changed:
+            if not self._dirty:
+                return True
+            snapshot = self._snapshot
+            self._dirty = False
+            self._changed.notify()
+        return self._write(snapshot)
     
     def get_setting(self, path, default=None):
         """
@@ -126,23 +357,54 @@ class SettingsManager:
         Returns:
             bool: 設定が成功したかどうか
         """
-        try:
-            parts = path.split('.')
-            current = self.settings
-            
-            # 最後の部分以外をたどる
-            for part in parts[:-1]:
-                if part not in current:
-                    current[part] = {}
-                current = current[part]
+        return self.update_settings({path: value})
+    
+    def update_settings(self, changes):
+        """
+        複数の設定値をまとめて変更（1つの新しいスナップショットに差し替える）
+        
+        Parameters:
+            changes (dict): ドット区切りの設定パス -> 設定する値
             
-            # 最後の部分を設定
-            current[parts[-1]] = value
+        Returns:
+            bool: 設定が成功したかどうか
+        """
+        try:
+            with self._lock:
+                settings = thaw(self._snapshot)
+                for path, value in changes.items():
+                    parts = path.split('.')
+                    current = settings
+                    
+                    # 最後の部分以外をたどる
+                    for part in parts[:-1]:
+                        if not isinstance(current.get(part), dict):
+                            current[part] = {}
+                        current = current[part]
+                    
+                    # 最後の部分を設定
+                    current[parts[-1]] = thaw(value)
+                
+                swapped = self._swap(settings)
+            self._notify(swapped)
             return True
         except Exception as e:
             logger.error(f"設定の変更に失敗しました: {str(e)}")
             return False
     
+    def replace_settings(self, new_settings):
+        """
+        設定全体を置き換える（欠けている設定はデフォルト値で補完）
+        
+        Parameters:
+            new_settings (dict): 新しい設定
+        """
+        settings = thaw(new_settings)
+        self._merge_settings(self._load_default_settings(), settings)
+        with self._lock:
+            swapped = self._swap(settings)
+        self._notify(swapped)
+    
     def get_overlay_settings(self):
         """オーバーレイ設定をJSON文字列で取得（クライアント用）"""
         return json.dumps(self.settings["overlay"])
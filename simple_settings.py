@@ -14,11 +14,44 @@ DEFAULT_SETTINGS = {
     },
     "websocket": {
         "host": "localhost",
-        "port": 7777
+        "port": 7777,
+        "sendQueueSize": 64
     },
     "http": {
         "host": "localhost",
         "port": 8080
+    },
+    "stream": {
+        "tickRate": 30
+    },
+    "recording": {
+        "enabled": False,
+        "directory": "recordings"
+    },
+    "analytics": {
+        "enabled": False,
+        "directory": "analytics"
+    },
+    "logging": {
+        "level": "INFO",
+        "frameSampleEvery": 100,
+        "frameRateLimit": 10,
+        "frameSampleOverrides": {}
+    },
+    "compression": {
+        "enabled": False,
+        "level": 6,
+        "windowBits": 12,
+        "memLevel": 5
+    },
+    "logSource": {
+        "enabled": False,
+        "directory": "",
+        "pattern": "*.json",
+        "channel": "default",
+        "offsetsFile": "liveapi_offsets.json",
+        "pollInterval": 1.0,
+        "forcePolling": False
     }
 }
 
@@ -37,10 +70,14 @@ def load_settings():
         return DEFAULT_SETTINGS
 
 def save_settings(settings):
-    """設定を保存する"""
+    """設定を保存する（一時ファイルに書き込んでから置き換える）"""
     try:
-        with open(SETTINGS_FILE, "w") as f:
+        temp_file = SETTINGS_FILE.with_name(SETTINGS_FILE.name + ".tmp")
+        with open(temp_file, "w") as f:
             json.dump(settings, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, SETTINGS_FILE)
         print(f"設定を保存しました: {SETTINGS_FILE}")
         return True
     except Exception as e:
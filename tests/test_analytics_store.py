@@ -0,0 +1,61 @@
+import asyncio
+from server.analytics import AnalyticsStore
+from server.match_stats import MatchStats
+
+def finished_match(started_at, names):
+    stats = MatchStats()
+    for index, name in enumerate(names):
+        stats.on_snapshot({"player": {"name": name, "teamId": index + 1, "damage": 100 * index, "kills": index}},
+                          started_at)
+    stats.ended_at = started_at + 600
+    return stats
+
+def test_background_save_keeps_rows_added_during_write(tmp_path):
+    async def main():
+        store = AnalyticsStore(tmp_path)
+        assert store.add_match(finished_match(1000.0, ["Alpha", "Bravo"]), "first", save=False)
+        first = store.save_in_background()
+
+        # 書き込み中に取り込んだマッチは次の書き込みで保存される
+        assert store.add_match(finished_match(2000.0, ["Charlie"]), "second", save=False)
+        assert store.saving == 1
+        second = store.save_in_background()
+        await asyncio.gather(first, second)
+        await asyncio.sleep(0)
+        return store
+
+    store = asyncio.run(main())
+    assert store.saving == 0
+    assert store.saved_rows == store.rows == 3
+
+    # 自分の書き込みはほかのプロセスの更新とみなさない
+    store.reload()
+    assert store.rows == 3
+
+    loaded = AnalyticsStore(tmp_path)
+    assert [match["name"] for match in loaded.matches] == ["first", "second"]
+    assert loaded.rows == 3
+    assert loaded.dictionaries["player"].values == store.dictionaries["player"].values
+
+def test_reload_is_deferred_while_saving(tmp_path, monkeypatch):
+    async def main():
+        store = AnalyticsStore(tmp_path)
+        loads = []
+        monkeypatch.setattr(store, "load", lambda: loads.append(store.rows))
+
+        store.add_match(finished_match(1000.0, ["Alpha"]), "first", save=False)
+        future = store.save_in_background()
+
+        # 書き込みの完了前は、ファイルが変わっていても読み込み直さない
+        store.reload()
+        assert loads == []
+        await future
+        await asyncio.sleep(0)
+
+        # 完了後は自分の書き込んだ内容と一致するので読み込み直さない
+        store.reload()
+        assert loads == []
+        return store
+
+    store = asyncio.run(main())
+    assert store.saved_rows == 1
@@ -0,0 +1,28 @@
+import pytest
+from server.async_http import HTTPProtocol
+
+def parse(data):
+    protocol = HTTPProtocol(None, None)
+    protocol.buffer += data
+    return protocol._parse_request()
+
+HEAD = b"POST /api/logging HTTP/1.1\r\nHost: localhost\r\nTransfer-Encoding: chunked\r\n\r\n"
+
+def test_chunked_body_is_decoded():
+    data = HEAD + b"5\r\n{\"lev\r\nb;ext=1\r\nel\":\"INFO\"}\r\n0\r\nX-Trailer: 1\r\n\r\n"
+    request, consumed = parse(data + b"GET / HTTP/1.1\r\n\r\n")
+    assert request.body == b'{"level":"INFO"}'
+    assert consumed == len(data)
+
+def test_incomplete_chunked_body_waits_for_more_data():
+    assert parse(HEAD + b"5\r\nhel") == (None, 0)
+    assert parse(HEAD + b"5\r\nhello\r\n0\r\n") == (None, 0)
+
+@pytest.mark.parametrize("chunk", [b"0x5\r\nhello\r\n0\r\n\r\n", b"-5\r\nhello\r\n0\r\n\r\n", b"5\r\nhelloXX0\r\n\r\n"])
+def test_malformed_chunked_body_is_rejected(chunk):
+    with pytest.raises(ValueError):
+        parse(HEAD + chunk)
+
+def test_unsupported_transfer_encoding():
+    with pytest.raises(NotImplementedError):
+        parse(b"POST / HTTP/1.1\r\nTransfer-Encoding: gzip, chunked\r\n\r\n")
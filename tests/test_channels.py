@@ -0,0 +1,62 @@
+import pytest
+from server import channels as channels_module
+from server.channels import ChannelRouter
+
+class FakeWebSocket:
+    remote_address = ("127.0.0.1", 0)
+
+def make_router():
+    sent = []
+    router = ChannelRouter(lambda websocket, message: sent.append((websocket, message)))
+    return router, sent
+
+def test_subscribe_does_not_create_channels():
+    router, _ = make_router()
+    websocket = FakeWebSocket()
+
+    assert router.subscribe(websocket, ["lobby1", "lobby2"]) == []
+    assert router.channels == {}
+    assert router.keyframe_for("lobby1") is None
+    assert router.keyframe_for("lobby1/match") is None
+    assert router.channels == {}
+
+def test_pending_subscription_attaches_when_producer_creates_channel():
+    router, sent = make_router()
+    websocket = FakeWebSocket()
+    router.subscribe(websocket, ["lobby1"])
+
+    channel = router.get("lobby1")
+    assert websocket in channel.subscribers
+    assert router.pending == {}
+
+    channel.publish_state({"gameState": "Playing"})
+    assert [receiver for receiver, _ in sent] == [websocket]
+
+def test_unsubscribe_and_remove_clear_pending_subscriptions():
+    router, _ = make_router()
+    websocket = FakeWebSocket()
+    router.subscribe(websocket, ["lobby1", "lobby2"])
+
+    router.unsubscribe(websocket, ["lobby1"])
+    assert set(router.pending) == {"lobby2"}
+    router.remove(websocket)
+    assert router.pending == {}
+
+def test_subscription_count_is_limited(monkeypatch):
+    monkeypatch.setattr(channels_module, "MAX_SUBSCRIPTIONS", 3)
+    router, _ = make_router()
+    websocket = FakeWebSocket()
+
+    router.subscribe(websocket, [f"lobby{index}" for index in range(10)])
+    assert len(router.subscriptions[websocket]) == 3
+    assert len(router.pending) == 3
+
+def test_channel_count_is_limited(monkeypatch):
+    monkeypatch.setattr(channels_module, "MAX_CHANNELS", 2)
+    router, _ = make_router()
+    router.get("lobby1")
+    router.get("lobby2")
+
+    with pytest.raises(ValueError):
+        router.set_producer(FakeWebSocket(), "lobby3")
+    assert set(router.channels) == {"lobby1", "lobby2"}
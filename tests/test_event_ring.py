@@ -0,0 +1,101 @@
+import pytest
+from server.event_ring import EventRing
+
+TYPES = ("playerDamaged", "playerKilled", "ringStartClosing")
+PLAYERS = ("Alpha", "Bravo", "Charlie")
+
+def fill(ring, count):
+    """1秒間隔でイベントを追加し、追加したイベントを返す"""
+    events = []
+    for number in range(count):
+        event = {
+            "time": float(number),
+            "type": TYPES[number % len(TYPES)],
+            "actor": PLAYERS[number % len(PLAYERS)],
+            "target": PLAYERS[(number + 1) % len(PLAYERS)],
+            "value": float(number * 10),
+            "weapon": None
+        }
+        ring.append(event["time"], event["type"], event["actor"], event["target"], event["value"])
+        events.append(event)
+    return events
+
+def expected(events, capacity, seconds=None, player=None, types=None, limit=None, now=None):
+    """リングに残っている直近capacity件から条件に合うイベント（比較用の単純な実装）"""
+    kept = events[-capacity:]
+    if seconds is not None:
+        if now is None:
+            now = kept[-1]["time"]
+        kept = [event for event in kept if event["time"] >= now - seconds]
+    if player is not None:
+        kept = [event for event in kept if player in (event["actor"], event["target"])]
+    if types:
+        kept = [event for event in kept if event["type"] in types]
+    if limit is not None:
+        kept = kept[-limit:] if limit else []
+    return kept
+
+def test_wraparound_keeps_only_the_latest_events():
+    ring = EventRing(capacity=8)
+    events = fill(ring, 21)
+
+    assert len(ring) == 8
+    assert ring.query() == events[-8:]
+    assert ring.get_stats()["overwritten"] == 13
+
+@pytest.mark.parametrize("written", [5, 8, 9, 13, 16, 21])
+@pytest.mark.parametrize("seconds", [0, 2.5, 4, 7, 100])
+def test_time_window_across_the_overwrite_boundary(written, seconds):
+    ring = EventRing(capacity=8)
+    events = fill(ring, written)
+
+    assert ring.query(seconds=seconds) == expected(events, 8, seconds=seconds)
+
+def test_time_window_with_explicit_now():
+    ring = EventRing(capacity=8)
+    events = fill(ring, 21)
+
+    assert ring.query(seconds=5, now=100.0) == []
+    # 基準の時刻が上書きされた範囲より前でも、残っているイベントだけを返す
+    assert ring.query(seconds=10, now=5.0) == expected(events, 8, seconds=10, now=5.0)
+    assert ring.query(seconds=0.5, now=14.0) == expected(events, 8, seconds=0.5, now=14.0)
+
+@pytest.mark.parametrize("written", [8, 11, 21])
+def test_type_and_player_filters_on_an_overwritten_ring(written):
+    ring = EventRing(capacity=8)
+    events = fill(ring, written)
+
+    assert ring.query(types=["playerKilled"]) == expected(events, 8, types=["playerKilled"])
+    assert ring.query(types=["playerKilled", "ringStartClosing"], seconds=5) == \
+        expected(events, 8, types=["playerKilled", "ringStartClosing"], seconds=5)
+    assert ring.query(player="Bravo") == expected(events, 8, player="Bravo")
+    assert ring.query(player="Alpha", types=["playerDamaged"], limit=1) == \
+        expected(events, 8, player="Alpha", types=["playerDamaged"], limit=1)
+    assert ring.query(limit=3) == expected(events, 8, limit=3)
+
+def test_filters_on_unknown_strings_return_nothing():
+    ring = EventRing(capacity=8)
+    fill(ring, 21)
+
+    assert ring.query(player="Nobody") == []
+    assert ring.query(types=["matchStateEnd"]) == []
+
+def test_out_of_order_times_are_clamped():
+    ring = EventRing(capacity=4)
+    ring.append(10.0, "playerKilled")
+    ring.append(8.0, "playerDamaged")
+
+    assert [event["time"] for event in ring.query()] == [10.0, 10.0]
+    assert len(ring.query(seconds=0)) == 2
+
+def test_on_event_extracts_fields_and_match_setup_resets():
+    ring = EventRing(capacity=4)
+    ring.on_event({"category": "playerDamaged", "attacker": {"name": "Alpha"}, "victim": {"name": "Bravo"},
+                   "damageInflicted": 45, "weapon": "R-301"}, now=1.0)
+
+    assert ring.query() == [{"time": 1.0, "type": "playerDamaged", "actor": "Alpha", "target": "Bravo",
+                             "value": 45.0, "weapon": "R-301"}]
+
+    ring.on_event({"category": "matchSetup"}, now=2.0)
+    assert [event["type"] for event in ring.query()] == ["matchSetup"]
+    assert ring.query(player="Alpha") == []
@@ -0,0 +1,19 @@
+import pytest
+from server.liveapi_proto import decode_event, is_protobuf_frame, ProtobufDecodeError
+from tools.liveapi_producer import generate_match
+
+def test_decode_generated_match():
+    events = [decode_event(frame) for frame in generate_match(1, 20)]
+    assert events
+    assert all(event.get("category") for event in events)
+
+@pytest.mark.parametrize("frame", [
+    b"\x08\x01garbage",
+    b"\x1a\x05ab",
+    b"\x0f",
+    b"\x0d\x01\x00\x00\x00",
+])
+def test_malformed_frames_raise_decode_error(frame):
+    assert is_protobuf_frame(frame)
+    with pytest.raises(ProtobufDecodeError):
+        decode_event(frame)
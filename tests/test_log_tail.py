@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import pytest
+from server import log_tail
+from server.log_tail import LogTail, RecordScanner
+
+EVENTS = [
+    {"category": "matchSetup", "map": "mp_rr_tropic_island"},
+    {"category": "playerDamaged", "attacker": {"name": "A{l}pha"}, "weapon": "R-301 \"Carbine\""},
+    {"category": "playerKilled", "victim": {"name": "Bra\\vo"}, "nested": {"list": [1, {"x": "}"}]}},
+]
+
+def log_bytes(events, as_array=True):
+    """LiveAPIのログ形式のバイト列（閉じられていないJSON配列、または1行に1イベント）"""
+    records = [json.dumps(event, ensure_ascii=False) for event in events]
+    if as_array:
+        return ("[" + ",\n".join(records)).encode("utf-8")
+    return "".join(record + "\n" for record in records).encode("utf-8")
+
+def scan(chunks):
+    scanner = RecordScanner()
+    records = []
+    consumed = 0
+    for chunk in chunks:
+        found, count = scanner.feed(chunk)
+        records.extend(json.loads(record) for record in found)
+        consumed += count
+    return records, consumed, scanner
+
+@pytest.mark.parametrize("as_array", [True, False])
+def test_scanner_handles_records_split_at_every_byte(as_array):
+    data = log_bytes(EVENTS, as_array)
+    for split in range(1, len(data)):
+        records, _, scanner = scan([data[:split], data[split:]])
+        assert records == EVENTS, split
+        assert scanner.pending == 0
+
+    # 1バイトずつ届いても同じ
+    records, consumed, _ = scan([data[index:index + 1] for index in range(len(data))])
+    assert records == EVENTS
+    assert consumed == len(data)
+
+def test_scanner_escape_as_last_byte_of_chunk():
+    record = b'{"name":"a\\"}b","v":1}'
+    escape = record.index(b"\\")
+
+    # エスケープの直後で区切られても、次のチャンクの引用符を文字列の終わりとみなさない
+    records, consumed, scanner = scan([record[:escape + 1], record[escape + 1:]])
+    assert records == [{"name": 'a"}b', "v": 1}]
+    assert consumed == len(record)
+    assert scanner.pending == 0
+
+    # エスケープされたバックスラッシュで終わる文字列
+    record = b'{"path":"C:\\\\"}'
+    records, _, _ = scan([record[:len(record) - 3], record[len(record) - 3:]])
+    assert records == [{"path": "C:\\"}]
+
+def test_scanner_reports_consumed_bytes_up_to_complete_records():
+    first, rest = log_bytes(EVENTS[:1]), b',\n{"category": "playerKil'
+    records, consumed, scanner = scan([first + rest])
+    assert len(records) == 1
+    assert consumed == len(first)
+    assert scanner.pending == len(rest)
+
+class Collector:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, message, data):
+        assert json.loads(message) == data
+        self.events.append(data)
+
+async def read(tail):
+    """追記された分を読み終えるまで待つ"""
+    tail.sync()
+    await tail.task
+
+def open_tail(tmp_path, collector):
+    return LogTail(tmp_path / "logs", collector, offsets_file=tmp_path / "offsets.json", poll_interval=60, force_poll=True)
+
+@pytest.fixture
+def log_dir(tmp_path):
+    directory = tmp_path / "logs"
+    directory.mkdir()
+    return directory
+
+def test_tail_reads_records_split_across_reads_and_writes(tmp_path, log_dir, monkeypatch):
+    # 1回の読み込みでイベントが途中までしか読めないようにする
+    monkeypatch.setattr(log_tail, "READ_CHUNK_SIZE", 7)
+    log_file = log_dir / "live.json"
+    data = log_bytes(EVENTS)
+    split = data.index(b"playerKilled")
+
+    async def main():
+        collector = Collector()
+        tail = open_tail(tmp_path, collector)
+        log_file.write_bytes(data[:split])
+        tail.start()
+        await tail.task
+        assert collector.events == EVENTS[:2]
+        offset = tail.offset
+
+        with open(log_file, "ab") as f:
+            f.write(data[split:])
+        await read(tail)
+        assert collector.events == EVENTS
+        assert offset < tail.offset == len(data)
+        await tail.stop()
+
+    asyncio.run(main())
+
+def test_tail_restarts_from_saved_offset(tmp_path, log_dir):
+    log_file = log_dir / "live.json"
+    data = log_bytes(EVENTS)
+    partial = data.index(b"playerKilled")
+
+    async def first_run():
+        collector = Collector()
+        tail = open_tail(tmp_path, collector)
+        log_file.write_bytes(data[:partial])
+        tail.start()
+        await tail.task
+        await tail.stop()
+        return collector.events
+
+    async def second_run():
+        collector = Collector()
+        tail = open_tail(tmp_path, collector)
+        tail.start()
+        await tail.task
+        await tail.stop()
+        return collector.events
+
+    assert asyncio.run(first_run()) == EVENTS[:2]
+    saved = json.loads((tmp_path / "offsets.json").read_text())
+    assert saved["path"] == str(log_file)
+
+    # 保存した位置は完結したイベントの末尾なので、途中のイベントは次回に最初から読む
+    with open(log_file, "ab") as f:
+        f.write(data[partial:])
+    assert asyncio.run(second_run()) == EVENTS[2:]
+
+def test_tail_ignores_saved_offset_of_replaced_file(tmp_path, log_dir):
+    log_file = log_dir / "live.json"
+    log_file.write_bytes(log_bytes(EVENTS))
+    (tmp_path / "offsets.json").write_text(json.dumps({
+        "path": str(log_file), "inode": os.stat(log_file).st_ino + 1, "offset": 10
+    }))
+
+    async def main():
+        collector = Collector()
+        tail = open_tail(tmp_path, collector)
+        tail.start()
+        await tail.task
+        await tail.stop()
+        return collector.events
+
+    assert asyncio.run(main()) == EVENTS
+
+def test_tail_switches_to_newer_file_after_finishing_current(tmp_path, log_dir):
+    old_file = log_dir / "match1.json"
+    new_file = log_dir / "match2.json"
+    old_data = log_bytes(EVENTS[:2])
+
+    async def main():
+        collector = Collector()
+        tail = open_tail(tmp_path, collector)
+        old_file.write_bytes(old_data[:old_data.index(b"playerDamaged")])
+        tail.start()
+        await tail.task
+        assert collector.events == EVENTS[:1]
+
+        # 古いファイルの残りが書き込まれた後に新しいファイルが作られる
+        with open(old_file, "ab") as f:
+            f.write(old_data[old_data.index(b"playerDamaged"):])
+        new_file.write_bytes(log_bytes(EVENTS[2:], as_array=False))
+        stat = os.stat(old_file)
+        os.utime(new_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        await read(tail)
+        assert collector.events == EVENTS
+        assert tail.path == new_file
+        await tail.stop()
+
+    asyncio.run(main())
+    assert json.loads((tmp_path / "offsets.json").read_text())["path"] == str(new_file)
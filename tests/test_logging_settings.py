@@ -0,0 +1,50 @@
+import json
+import pytest
+from server import api_routes
+from utils.logger import FrameLogSampler, frame_logger
+from utils.settings import SettingsManager
+
+@pytest.fixture
+def settings_manager(tmp_path):
+    manager = SettingsManager(tmp_path / "settings.json")
+    api_routes.init_api_routes(manager, None)
+    return manager
+
+@pytest.mark.parametrize("request_data", [
+    {"frameSampleEvery": "often"},
+    {"frameSampleEvery": 0},
+    {"frameSampleEvery": True},
+    {"frameRateLimit": -1},
+    {"frameRateLimit": 1.5},
+    {"frameSampleOverrides": ["playerDamaged", 10]},
+    {"frameSampleOverrides": {"playerDamaged": 0}},
+    {"frameSampleOverrides": {"playerDamaged": "10"}},
+])
+def test_invalid_frame_settings_are_rejected(settings_manager, request_data):
+    before = settings_manager.settings["logging"]
+    result = api_routes.handle_api_request("/api/logging", request_data)
+    assert result["success"] is False
+    assert settings_manager.settings["logging"] == before
+
+    settings_manager.flush()
+    with open(settings_manager.settings_file, "r") as f:
+        assert json.load(f)["logging"] == before
+
+def test_valid_frame_settings_are_saved(settings_manager):
+    result = api_routes.handle_api_request("/api/logging", {
+        "frameSampleEvery": 10, "frameRateLimit": 0, "frameSampleOverrides": {"playerDamaged": 1000}
+    })
+    assert result["success"] is True
+    assert settings_manager.settings["logging"]["frameSampleEvery"] == 10
+    assert settings_manager.settings["logging"]["frameSampleOverrides"] == {"playerDamaged": 1000}
+
+    # 他のテストに影響しないよう元に戻す
+    frame_logger.configure(100, 10, {})
+
+def test_configure_ignores_invalid_values():
+    sampler = FrameLogSampler()
+    sampler.configure("often", [1], ["playerDamaged"])
+    assert (sampler.sample_every, sampler.rate_limit, sampler.overrides) == (100, 10, {})
+
+    sampler.configure(5, 0, {"playerDamaged": 2})
+    assert (sampler.sample_every, sampler.rate_limit, sampler.overrides) == (5, 0, {"playerDamaged": 2})
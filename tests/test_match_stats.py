@@ -0,0 +1,90 @@
+from apex_api import ApexAPI
+from server import match_stats
+
+def snapshot(name, damage, kills, in_progress=True, game_state="Playing", map_name=None):
+    """スナップショット形式のフレーム"""
+    match = {"inProgress": in_progress, "remainingSquads": 20}
+    if map_name is not None:
+        match["map"] = map_name
+    return {
+        "gameState": game_state,
+        "player": {"name": name, "teamId": 1, "health": 100, "shields": 50, "damage": damage, "kills": kills},
+        "squad": [],
+        "match": match
+    }
+
+def feed(api, monkeypatch, now, frame):
+    monkeypatch.setattr(match_stats.time, "time", lambda: now)
+    return api.process_data(frame)
+
+def test_snapshot_matches_back_to_back_reset_stats(monkeypatch):
+    api = ApexAPI()
+
+    # 1試合目（10分間で2000ダメージ）
+    feed(api, monkeypatch, 1000.0, snapshot("First", 0, 0))
+    feed(api, monkeypatch, 1600.0, snapshot("First", 2000, 5))
+    feed(api, monkeypatch, 1650.0, snapshot("First", 2000, 5, in_progress=False, game_state="Resolution"))
+
+    # 2試合目（1分間で300ダメージ）
+    feed(api, monkeypatch, 2000.0, snapshot("Second", 0, 0, in_progress=False, game_state="WaitingForPlayers"))
+    feed(api, monkeypatch, 2010.0, snapshot("Second", 0, 0))
+    processed = feed(api, monkeypatch, 2070.0, snapshot("Second", 300, 1))
+
+    assert processed["stats"]["elapsed"] == 60
+    assert processed["stats"]["player"]["damage"] == 300
+    assert processed["stats"]["player"]["dpm"] == 300.0
+
+    stats = api.stats.to_dict(2070.0)
+    assert stats["elapsed"] == 60
+    assert [player["name"] for player in stats["players"]] == ["Second"]
+
+def test_snapshot_map_change_resets_stats(monkeypatch):
+    api = ApexAPI()
+
+    feed(api, monkeypatch, 1000.0, snapshot("First", 0, 0, map_name="mp_rr_tropic_island"))
+    feed(api, monkeypatch, 1600.0, snapshot("First", 2000, 5, map_name="mp_rr_tropic_island"))
+
+    # 進行中のまま次のマップのフレームが届いた場合も新しいマッチとみなす
+    processed = feed(api, monkeypatch, 1700.0, snapshot("First", 100, 0, map_name="mp_rr_desertlands"))
+    assert processed["stats"]["elapsed"] == 0
+    assert processed["stats"]["player"]["damage"] == 100
+
+def test_snapshot_within_match_keeps_stats(monkeypatch):
+    api = ApexAPI()
+
+    feed(api, monkeypatch, 1000.0, snapshot("First", 0, 0))
+    processed = feed(api, monkeypatch, 1120.0, snapshot("First", 400, 2))
+
+    assert processed["stats"]["elapsed"] == 120
+    assert processed["stats"]["player"]["kills"] == 2
+
+def test_projected_team_id_reaches_team_stats(monkeypatch):
+    api = ApexAPI()
+
+    frame = snapshot("First", 250, 2)
+    frame["squad"] = [
+        {"name": "Mate1", "teamId": 1, "health": 100, "legendName": "Lifeline"},
+        {"name": "Mate2", "teamId": 1, "health": 0, "legendName": "Gibraltar"}
+    ]
+    processed = feed(api, monkeypatch, 1000.0, frame)
+
+    # 射影後のフレームにもチームが残っている
+    assert processed["player"]["teamId"] == 1
+    assert [member["teamId"] for member in processed["squad"]] == [1, 1]
+
+    teams = api.stats.to_dict(1000.0)["teams"]
+    assert len(teams) == 1
+    assert teams[0]["teamId"] == 1
+    assert teams[0]["members"] == 3
+    assert teams[0]["damage"] == 250
+    assert teams[0]["kills"] == 2
+
+def test_projection_without_team_id_adds_no_team(monkeypatch):
+    api = ApexAPI()
+
+    frame = snapshot("First", 100, 0)
+    del frame["player"]["teamId"]
+    processed = feed(api, monkeypatch, 1000.0, frame)
+
+    assert processed["player"]["teamId"] is None
+    assert api.stats.to_dict(1000.0)["teams"] == []
@@ -0,0 +1,36 @@
+import pytest
+from server import api_routes
+from utils.name_override import SimpleNameOverride
+from utils.settings import SettingsManager
+
+@pytest.fixture
+def name_override(tmp_path):
+    tool = SimpleNameOverride()
+    tool.temp_path = tmp_path
+    tool.override_file = tmp_path / "override_names.txt"
+    tool.add_overrides({"111": "Alpha", "222": "Bravo"})
+    api_routes.init_api_routes(SettingsManager(tmp_path / "settings.json"), tool)
+    return tool
+
+def test_add_returns_only_the_added_entry(name_override):
+    result = api_routes.handle_api_request("/api/name-override/add", {"playerId": " 333 ", "displayName": "Charlie"})
+    assert result == {"success": True, "playerId": "333", "displayName": "Charlie", "total": 3}
+    assert "Charlie" in name_override.override_file.read_text(encoding="utf-8")
+
+def test_add_rejects_invalid_player_id(name_override):
+    result = api_routes.handle_api_request("/api/name-override/add", {"playerId": "3 33", "displayName": "Charlie"})
+    assert result["success"] is False
+    assert name_override.get_all_overrides() == {"111": "Alpha", "222": "Bravo"}
+
+def test_remove_returns_only_the_removed_entry(name_override):
+    result = api_routes.handle_api_request("/api/name-override/remove", {"playerId": "111"})
+    assert result == {"success": True, "playerId": "111", "total": 1}
+    assert name_override.get_all_overrides() == {"222": "Bravo"}
+
+def test_remove_reports_missing_player_id(name_override):
+    assert name_override.remove_override("999") is False
+
+    result = api_routes.handle_api_request("/api/name-override/remove", {"playerId": "999"})
+    assert result["success"] is False
+    assert "999" in result["message"]
+    assert name_override.get_all_overrides() == {"111": "Alpha", "222": "Bravo"}
@@ -0,0 +1,32 @@
+from server import codec, msgpack_codec
+from server.workers import encode_payload, decode_payload
+
+PATCH = {"type": "patch", "channel": "default", "seq": 3, "set": {"player.health": 75}}
+
+def test_encodes_once_per_format(monkeypatch):
+    calls = []
+    for wire_format, encode in list(codec.ENCODERS.items()):
+        monkeypatch.setitem(codec.ENCODERS, wire_format,
+                            lambda payload, wire_format=wire_format, encode=encode: calls.append(wire_format) or encode(payload))
+
+    message = codec.OutgoingMessage(PATCH)
+    for _ in range(5):
+        assert codec.decode(message.encode(codec.SUBPROTOCOL_JSON)) == PATCH
+        assert msgpack_codec.unpack(message.encode(codec.SUBPROTOCOL_MSGPACK)) == PATCH
+    assert sorted(calls) == sorted([codec.SUBPROTOCOL_JSON, codec.SUBPROTOCOL_MSGPACK])
+
+def test_wire_format_defaults_to_json():
+    assert codec.wire_format(None) == codec.SUBPROTOCOL_JSON
+    assert codec.wire_format(codec.SUBPROTOCOL_MSGPACK) == codec.SUBPROTOCOL_MSGPACK
+
+def test_bus_payload_carries_encoded_formats():
+    message = codec.OutgoingMessage(PATCH)
+
+    relayed = decode_payload(encode_payload(message, packed=True))
+    assert relayed.payload is None
+    assert relayed.encode(codec.SUBPROTOCOL_JSON) == message.encode(codec.SUBPROTOCOL_JSON)
+    assert relayed.encode(codec.SUBPROTOCOL_MSGPACK) == message.encode(codec.SUBPROTOCOL_MSGPACK)
+    assert relayed.payload is None
+
+    json_only = decode_payload(encode_payload(message))
+    assert msgpack_codec.unpack(json_only.encode(codec.SUBPROTOCOL_MSGPACK)) == PATCH
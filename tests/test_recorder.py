@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from server.recorder import FILE_MAGIC, INDEX_ENTRY, MatchReader, MatchRecorder, SNAPSHOT_TYPE, replay
+
+# (時刻, イベント種別, メッセージ)
+RECORDS = [
+    (100.0, SNAPSHOT_TYPE, '{"gameState":"Playing","player":{"name":"日本語"}}'),
+    (100.5, "playerDamaged", '{"category":"playerDamaged","damageInflicted":20}'),
+    (101.0, "playerDamaged", '{"category":"playerDamaged","damageInflicted":35}'),
+    (102.0, "matchSetup", b"\x0a\x05binary\x00\xff"),
+    (103.5, "playerKilled", '{"category":"playerKilled"}'),
+    (104.0, "playerDamaged", '{"category":"playerDamaged","damageInflicted":5}'),
+]
+
+def write(path, records):
+    recorder = MatchRecorder(path)
+    for timestamp, event_type, message in records:
+        recorder.record(message, event_type, timestamp)
+    recorder.close()
+
+@pytest.fixture
+def reader(tmp_path):
+    path = tmp_path / "match.apexrec"
+    write(path, RECORDS)
+    reader = MatchReader(path)
+    yield reader
+    reader.close()
+
+def test_records_round_trip(reader):
+    assert reader.count == len(RECORDS)
+    assert reader.start_time == 100.0
+    assert reader.end_time == 104.0
+    assert [reader.read(position) for position in range(reader.count)] == RECORDS
+    assert list(reader.iter_records()) == RECORDS
+    assert list(reader.iter_records(4)) == RECORDS[4:]
+    assert list(reader.iter_records(len(RECORDS))) == []
+
+@pytest.mark.parametrize("seconds, position", [
+    (-1.0, 0), (0.0, 0), (0.5, 1), (0.7, 2), (2.0, 3), (3.5, 4), (4.0, 5), (10.0, 6)
+])
+def test_seek_finds_first_record_at_or_after_time(reader, seconds, position):
+    assert reader.seek(seconds) == position
+
+def test_positions_for_type(reader):
+    assert reader.positions_for_type("playerDamaged") == [1, 2, 5]
+    assert reader.positions_for_type("matchSetup") == [3]
+    assert reader.positions_for_type("unknown") == []
+
+    # 2回目以降は作成済みの種別ごとのインデックスを使う
+    assert reader.type_positions is not None
+    assert reader.positions_for_type("playerDamaged") == [1, 2, 5]
+
+def test_resume_position_is_latest_snapshot_or_match_setup(tmp_path, reader):
+    assert reader.resume_position() == 3
+
+    path = tmp_path / "no_resume.apexrec"
+    write(path, [(1.0, "playerDamaged", "{}"), (2.0, "playerKilled", "{}")])
+    other = MatchReader(path)
+    assert other.resume_position() == 0
+    other.close()
+
+def test_reopened_recorder_appends_with_same_type_ids(tmp_path):
+    path = tmp_path / "match.apexrec"
+    write(path, RECORDS[:3])
+    write(path, RECORDS[3:])
+
+    assert path.read_bytes().count(FILE_MAGIC) == 1
+    reader = MatchReader(path)
+    assert list(reader.iter_records()) == RECORDS
+    assert reader.positions_for_type("playerDamaged") == [1, 2, 5]
+    reader.close()
+
+def test_truncated_last_record_is_skipped(tmp_path):
+    path = tmp_path / "match.apexrec"
+    write(path, RECORDS)
+
+    # 異常終了で最後のレコードの途中までしか書き込まれなかった場合
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - 3)
+    reader = MatchReader(path)
+    assert list(reader.iter_records()) == RECORDS[:-1]
+    reader.close()
+
+def test_invalid_file_is_rejected(tmp_path):
+    path = tmp_path / "other.apexrec"
+    path.write_bytes(b"NOTAREC!" + INDEX_ENTRY.pack(0.0, 0, 0))
+    with pytest.raises(ValueError):
+        MatchReader(path)
+
+def test_replay_from_resume_position(reader):
+    received = []
+    played = asyncio.run(replay(reader, received.append, speed=0, start=reader.resume_position()))
+    assert played == 3
+    assert received == [message for _, _, message in RECORDS[3:]]
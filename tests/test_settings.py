@@ -0,0 +1,39 @@
+import json
+from utils.settings import SettingsManager
+
+OVERRIDES = {"playerDamaged": 1000, "playerKilled": 1}
+
+def test_frame_sample_overrides_survive_reload_and_restart(tmp_path):
+    settings_file = tmp_path / "settings.json"
+    manager = SettingsManager(settings_file)
+    manager.update_settings({"logging.frameSampleOverrides": OVERRIDES})
+    assert manager.save_settings()
+    assert manager.flush()
+
+    with open(settings_file, "r") as f:
+        assert json.load(f)["logging"]["frameSampleOverrides"] == OVERRIDES
+
+    # 外部編集の読み直し
+    with open(settings_file, "r") as f:
+        saved = json.load(f)
+    saved["logging"]["frameRateLimit"] = 20
+    with open(settings_file, "w") as f:
+        json.dump(saved, f)
+    assert manager.reload()
+    assert manager.settings["logging"]["frameSampleOverrides"] == OVERRIDES
+    assert manager.settings["logging"]["frameRateLimit"] == 20
+
+    # 再起動
+    restarted = SettingsManager(settings_file)
+    assert restarted.settings["logging"]["frameSampleOverrides"] == OVERRIDES
+
+def test_unknown_settings_are_dropped(tmp_path):
+    settings_file = tmp_path / "settings.json"
+    with open(settings_file, "w") as f:
+        json.dump({"logging": {"level": "DEBUG", "unknown": 1}, "unknownSection": {}}, f)
+
+    manager = SettingsManager(settings_file)
+    assert manager.settings["logging"]["level"] == "DEBUG"
+    assert "unknown" not in manager.settings["logging"]
+    assert "unknownSection" not in manager.settings
+    assert manager.settings["logging"]["frameSampleOverrides"] == {}
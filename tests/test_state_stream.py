@@ -0,0 +1,153 @@
+import asyncio
+import copy
+from server.conflation import Conflator
+from server.state_stream import StateStream, diff_state
+
+def apply_patch(state, patch):
+    """パッチを状態に適用（client/script.js の applyPatch と同じ手順）"""
+    for path, value in patch.get("set", {}).items():
+        keys = path.split(".")
+        target = state
+        for key in keys[:-1]:
+            if isinstance(target, list):
+                target = target[int(key)]
+            else:
+                if target.get(key) is None:
+                    target[key] = {}
+                target = target[key]
+        if isinstance(target, list):
+            target[int(keys[-1])] = value
+        else:
+            target[keys[-1]] = value
+
+    for path in patch.get("del", []):
+        keys = path.split(".")
+        target = state
+        for key in keys[:-1]:
+            target = target[int(key)] if isinstance(target, list) else target.get(key)
+            if target is None:
+                break
+        if target is not None:
+            target.pop(keys[-1], None)
+
+def frame(health=100, shields=50, squad=None, match=None):
+    """処理済みスナップショット形式のフレーム"""
+    return {
+        "type": "gameData",
+        "gameState": "Playing",
+        "player": {"name": "Player1", "health": health, "shields": shields, "position": {"x": 0, "y": 0, "z": 0}},
+        "squad": squad if squad is not None else [{"name": "Mate1", "health": 100}, {"name": "Mate2", "health": 100}],
+        "match": match if match is not None else {"inProgress": True, "remainingSquads": 20}
+    }
+
+def test_diff_reports_nested_paths_only():
+    old = frame()
+    new = frame(health=80)
+    new["player"]["position"]["x"] = 12
+
+    changes, removed = diff_state(old, new)
+    assert changes == {"player.health": 80, "player.position.x": 12}
+    assert removed == []
+
+def test_diff_reports_nested_removals():
+    old = frame(match={"inProgress": True, "remainingSquads": 20, "ring": {"stage": 2, "closing": True}})
+    new = frame(match={"inProgress": True, "ring": {"stage": 2}})
+    del new["player"]["shields"]
+
+    changes, removed = diff_state(old, new)
+    assert changes == {}
+    assert sorted(removed) == ["match.remainingSquads", "match.ring.closing", "player.shields"]
+
+def test_diff_compares_same_length_lists_by_element():
+    old = frame()
+    new = frame(squad=[{"name": "Mate1", "health": 40}, {"name": "Mate2", "health": 100}])
+
+    changes, _ = diff_state(old, new)
+    assert changes == {"squad.0.health": 40}
+
+    changes, _ = diff_state({"tags": [1, 2, 3]}, {"tags": [1, 5, 3]})
+    assert changes == {"tags.1": 5}
+
+def test_diff_replaces_lists_whose_length_changed():
+    old = frame()
+    squad = [{"name": "Mate1", "health": 100}]
+    new = frame(squad=squad)
+
+    changes, removed = diff_state(old, new)
+    assert changes == {"squad": squad}
+    assert removed == []
+
+def test_diff_replaces_values_whose_type_changed():
+    changes, removed = diff_state({"a": {"b": 1}, "c": [1]}, {"a": None, "c": {"0": 1}})
+    assert changes == {"a": None, "c": {"0": 1}}
+    assert removed == []
+
+def test_stream_sends_keyframe_then_patches():
+    stream = StateStream()
+    assert stream.keyframe() is None
+
+    first = stream.update(frame())
+    assert first["type"] == "keyframe"
+    assert first["seq"] == 1
+
+    assert stream.update(frame()) is None
+    assert stream.seq == 1
+
+    patch = stream.update(frame(health=70))
+    assert patch == {"type": "patch", "seq": 2, "set": {"player.health": 70}}
+    assert "del" not in patch
+    assert stream.keyframe()["seq"] == 2
+
+def test_patches_round_trip_onto_keyframe():
+    frames = [
+        frame(),
+        frame(health=80),
+        frame(health=80, squad=[{"name": "Mate1", "health": 30}, {"name": "Mate2", "health": 100}]),
+        frame(health=60, squad=[{"name": "Mate2", "health": 100}]),
+        frame(health=60, squad=[{"name": "Mate2", "health": 0, "knocked": True}], match={"inProgress": True}),
+        frame(health=0, shields=0, squad=[{"name": "Mate2", "health": 0}], match={"inProgress": False, "ring": {"stage": 3}}),
+    ]
+    frames[3]["player"].pop("shields")
+
+    stream = StateStream()
+    client_state = copy.deepcopy(stream.update(frames[0])["state"])
+    seq = 1
+    for snapshot in frames[1:]:
+        patch = stream.update(copy.deepcopy(snapshot))
+        assert patch["seq"] == seq + 1
+        seq = patch["seq"]
+        apply_patch(client_state, patch)
+        assert client_state == snapshot
+
+    # 途中から接続したクライアントのキーフレームも最新の状態と一致する
+    assert stream.keyframe()["state"] == frames[-1]
+
+def run_conflator(snapshots, tick_rate=1):
+    """Conflatorにスナップショットを続けて渡し、配信されたものを返す（ティックは1秒なので途中では配信されない）"""
+    flushed = []
+
+    async def main():
+        conflator = Conflator(flushed.append, tick_rate)
+        for snapshot in snapshots:
+            conflator.submit(snapshot)
+        return conflator
+
+    return asyncio.run(main()), flushed
+
+def test_conflator_merges_updates_within_a_tick():
+    conflator, flushed = run_conflator([frame(), frame(health=90), frame(health=80)])
+
+    # 最初のフレームは即時配信、残りの2件は次のティックにまとめる
+    assert flushed == [frame()]
+    assert conflator.pending == frame(health=80)
+    conflator.flush()
+    assert flushed == [frame(), frame(health=80)]
+    assert conflator.get_stats()["conflated"] == 1
+
+def test_conflator_flushes_critical_changes_immediately():
+    ended = frame(health=90, match={"inProgress": False, "remainingSquads": 20})
+    conflator, flushed = run_conflator([frame(), frame(health=95), ended])
+
+    # マッチ終了はティックを待たずに配信し、まとめていた更新はそれに含まれる
+    assert flushed == [frame(), ended]
+    assert conflator.pending is None
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import pytest
+from http import HTTPStatus
+from server.static_cache import StaticCache
+
+async def wait_for(condition, timeout=2.0):
+    """条件が成り立つまで待つ（監視のイベントはイベントループ上で処理される）"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("キャッシュが更新されませんでした")
+        await asyncio.sleep(0.02)
+
+def body(cache, path):
+    entry = cache.lookup(path)
+    return entry.body if entry is not None else None
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "index.html").write_text("<p>v1</p>")
+    (tmp_path / "js" / "app.js").write_text("let v = 1;")
+    return tmp_path
+
+def test_initial_load_and_etag(root):
+    cache = StaticCache(root)
+    assert body(cache, "/") == b"<p>v1</p>"
+    assert body(cache, "/js/app.js") == b"let v = 1;"
+
+    status, headers, _ = cache.response("/js/app.js", {})
+    assert status == HTTPStatus.OK
+    status, _, _ = cache.response("/js/app.js", {"if-none-match": headers["ETag"]})
+    assert status == HTTPStatus.NOT_MODIFIED
+    assert cache.response("/missing.js", {})[0] == HTTPStatus.NOT_FOUND
+
+@pytest.mark.parametrize("force_poll", [False, True])
+def test_watcher_applies_changes_in_nested_directories(root, force_poll):
+    async def main():
+        cache = StaticCache(root).start(force_poll=force_poll, poll_interval=0.05)
+        try:
+            # 既存のサブディレクトリ内のファイルの変更（一時ファイルからの置き換え）
+            (root / "js" / "app.js.tmp").write_text("let v = 2;")
+            os.replace(root / "js" / "app.js.tmp", root / "js" / "app.js")
+            await wait_for(lambda: body(cache, "/js/app.js") == b"let v = 2;")
+
+            # 新しいサブディレクトリとその中のファイル
+            (root / "css").mkdir()
+            (root / "css" / "style.css").write_text("p { color: red; }")
+            await wait_for(lambda: body(cache, "/css/style.css") == b"p { color: red; }")
+
+            # 新しいサブディレクトリ内の変更も検知する
+            (root / "css" / "style.css").write_text("p { color: blue; }")
+            await wait_for(lambda: body(cache, "/css/style.css") == b"p { color: blue; }")
+
+            # ファイル・ディレクトリの削除
+            (root / "index.html").unlink()
+            (root / "css" / "style.css").unlink()
+            (root / "css").rmdir()
+            await wait_for(lambda: cache.lookup("/index.html") is None and cache.lookup("/css/style.css") is None)
+            await wait_for(lambda: root / "css" not in cache.directories)
+            assert body(cache, "/js/app.js") == b"let v = 2;"
+        finally:
+            cache.stop()
+        assert all(watcher is None for watcher in cache.directories.values())
+
+    asyncio.run(main())
+
+def test_start_picks_up_changes_made_before_watching(root):
+    cache = StaticCache(root)
+    (root / "js" / "app.js").write_text("let v = 3; // changed size")
+
+    async def main():
+        cache.start(force_poll=True, poll_interval=60)
+        cache.stop()
+
+    asyncio.run(main())
+    assert body(cache, "/js/app.js") == b"let v = 3; // changed size"
@@ -0,0 +1,120 @@
+"""
+記録したマッチを分析ストアに取り込み、マッチをまたいで集計するCLI
+
+使い方:
+    # 記録ファイル（またはディレクトリ内の .apexrec）を取り込む
+    python -m tools.analytics ingest recordings/
+
+    # レジェンドごとの集計（1試合あたりの平均ダメージ順）
+    python -m tools.analytics query --group-by legend --sort avgDamage
+
+    # 条件で絞り込んでプレイヤーごとに集計
+    python -m tools.analytics query --group-by player --filter legend=Wraith,Octane --filter "kills>=3" --limit 20
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from server.analytics import AnalyticsStore, GROUP_COLUMNS, iter_recorded_matches
+
+# 範囲の絞り込み条件（例: kills>=3, damage<=500）
+RANGE_FILTER = re.compile(r"^(\w+)(>=|<=)(-?[\d.]+)$")
+
+def parse_filters(values):
+    """
+    --filter の値を AnalyticsStore.query の絞り込み条件に変換
+
+    "列=値1,値2" は値との一致、"列>=数値" / "列<=数値" は範囲。
+    """
+    filters = {}
+    for value in values or []:
+        match = RANGE_FILTER.match(value)
+        if match:
+            column, operator, number = match.groups()
+            condition = filters.setdefault(column, {})
+            condition["min" if operator == ">=" else "max"] = float(number)
+            continue
+
+        column, separator, text = value.partition("=")
+        if not separator:
+            raise ValueError(f"絞り込み条件の形式が正しくありません: {value}")
+        items = text.split(",")
+        if column == "team":
+            items = [int(item) for item in items]
+        filters[column] = items
+    return filters
+
+def recording_files(paths):
+    """引数のパス（ファイルまたはディレクトリ）から記録ファイルを列挙"""
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(path.glob("*.apexrec"))
+        else:
+            yield path
+
+def ingest(args):
+    store = AnalyticsStore(args.store)
+    added = 0
+    skipped = 0
+    for path in recording_files(args.paths):
+        for name, stats in iter_recorded_matches(path):
+            if store.add_match(stats, name, save=False):
+                added += 1
+            else:
+                skipped += 1
+    store.save()
+    print(f"{added}マッチを取り込みました（取り込み済み・空のマッチ {skipped}件）")
+    print(f"合計: {store.get_summary()['matches']}マッチ / {store.rows}行")
+
+def print_table(rows, columns):
+    """集計結果を表形式で表示"""
+    widths = [max(len(str(column)), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(str(column).ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+def query(args):
+    store = AnalyticsStore(args.store)
+    started = time.perf_counter()
+    results = store.query(args.group_by, parse_filters(args.filter), args.sort, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    if results:
+        print_table(results, [args.group_by, "games", "kills", "avgKills", "avgDamage", "avgDamageTaken", "avgTimeAlive"])
+    print(f"{len(results)}件 / {store.rows}行を {elapsed:.1f} ms で集計しました（{store.get_summary()['backend']}）")
+
+def summary(args):
+    print(json.dumps(AnalyticsStore(args.store).get_summary(), ensure_ascii=False, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description="マッチをまたいだ統計の取り込みと集計")
+    parser.add_argument("--store", default="analytics", help="分析ストアのディレクトリ")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="記録ファイルを取り込む")
+    ingest_parser.add_argument("paths", nargs="+", help="記録ファイル（.apexrec）またはディレクトリ")
+    ingest_parser.set_defaults(handler=ingest)
+
+    query_parser = commands.add_parser("query", help="グループごとに集計")
+    query_parser.add_argument("--group-by", default="legend", choices=GROUP_COLUMNS, help="グループ化する列")
+    query_parser.add_argument("--filter", action="append", help="絞り込み条件（列=値1,値2 / 列>=数値 / 列<=数値）")
+    query_parser.add_argument("--sort", default="games", help="降順に並べる項目（games, kills, avgDamage など）")
+    query_parser.add_argument("--limit", type=int, help="表示するグループ数の上限")
+    query_parser.add_argument("--json", action="store_true", help="JSONで出力")
+    query_parser.set_defaults(handler=query)
+
+    summary_parser = commands.add_parser("summary", help="ストアの概要を表示")
+    summary_parser.set_defaults(handler=summary)
+
+    args = parser.parse_args()
+    try:
+        args.handler(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+LiveAPIの代わりにprotobufフレームを送信するテスト用プロデューサー
+
+記録済みのprotobufフレーム（4バイトのリトルエンディアン長 + フレーム の連続）を
+WebSocketサーバーにバイナリメッセージとして送信する。
+
+使い方:
+    # 合成したマッチのフレームファイルを作成
+    python -m tools.liveapi_producer generate sample_match.pbstream
+
+    # フレームファイルをサーバーに送信
+    python -m tools.liveapi_producer replay sample_match.pbstream --url ws://localhost:7777 --rate 200
+"""
+import argparse
+import asyncio
+import random
+import struct
+import websockets
+from server.liveapi_proto import encode_event
+
+# フレーム長のヘッダー
+LENGTH_HEADER = struct.Struct("<I")
+
+# 合成マッチのロビー構成
+TEAM_COUNT = 20
+TEAM_SIZE = 3
+LEGENDS = ("Wraith", "Bangalore", "Bloodhound", "Gibraltar", "Lifeline", "Pathfinder", "Octane", "Horizon")
+WEAPONS = ("R-301", "Flatline", "Peacekeeper", "Wingman", "R-99", "Volt")
+
+def write_frames(path, frames):
+    """フレームをファイルに書き込む"""
+    with open(path, "wb") as f:
+        for frame in frames:
+            f.write(LENGTH_HEADER.pack(len(frame)))
+            f.write(frame)
+
+def read_frames(path):
+    """ファイルからフレームを順に読み込む"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(LENGTH_HEADER.size)
+            if len(header) < LENGTH_HEADER.size:
+                return
+            (length,) = LENGTH_HEADER.unpack(header)
+            yield f.read(length)
+
+def generate_match(seed=0, fights=300):
+    """
+    合成したマッチのprotobufフレームを生成
+
+    Parameters:
+        seed (int): 乱数のシード（同じシードなら同じマッチになる）
+        fights (int): 交戦イベントの数
+
+    Returns:
+        list: protobufフレームのリスト
+    """
+    rng = random.Random(seed)
+    timestamp = 1700000000
+
+    # ロビーのプレイヤー
+    players = []
+    for team_id in range(TEAM_COUNT):
+        for index in range(TEAM_SIZE):
+            players.append({
+                "name": f"Player{team_id:02d}_{index}",
+                "teamId": team_id + 2,
+                "squadIndex": index,
+                "currentHealth": 100,
+                "maxHealth": 100,
+                "shieldHealth": 100,
+                "shieldMaxHealth": 100,
+                "character": rng.choice(LEGENDS),
+                "pos": {"x": 0.0, "y": 0.0, "z": 0.0}
+            })
+
+    frames = []
+
+    def emit(message_name, **event):
+        nonlocal timestamp
+        timestamp += 1
+        frames.append(encode_event(message_name, {"timestamp": timestamp, **event}))
+
+    emit("MatchSetup", map="mp_rr_tropic_island_mu1", playlistName="Trios")
+    for player in players:
+        emit("PlayerConnected", player=player)
+    emit("GameStateChanged", state="Playing")
+
+    # 観戦対象は最初のチーム
+    observed = players[0]
+    emit("ObserverSwitched", observer=observed, target=observed, targetTeam=players[:TEAM_SIZE])
+
+    alive_teams = set(player["teamId"] for player in players)
+    for fight in range(fights):
+        attacker, victim = rng.sample(players, 2)
+        if attacker["teamId"] == victim["teamId"]:
+            continue
+
+        damage = rng.randint(10, 45)
+        victim["shieldHealth"] = max(0, victim["shieldHealth"] - damage)
+        victim["pos"] = {"x": rng.uniform(-5000, 5000), "y": rng.uniform(-5000, 5000), "z": 0.0}
+        emit("PlayerDamaged", attacker=attacker, victim=victim, weapon=rng.choice(WEAPONS), damageInflicted=damage)
+
+        # 一定の確率でキル、チーム全滅
+        if rng.random() < 0.1 and len(alive_teams) > 1 and victim["teamId"] in alive_teams:
+            victim["currentHealth"] = 0
+            emit("PlayerKilled", attacker=attacker, victim=victim, awardedTo=attacker, weapon=rng.choice(WEAPONS))
+            if rng.random() < 0.3 and victim is not observed:
+                alive_teams.discard(victim["teamId"])
+                team = [player for player in players if player["teamId"] == victim["teamId"]]
+                emit("SquadEliminated", players=team)
+
+        if fight % 60 == 0:
+            emit("RingStartClosing", stage=fight // 60, currentRadius=10000.0, endRadius=5000.0, shrinkDuration=90.0)
+
+    emit("MatchStateEnd", state="Postmatch", winners=players[:TEAM_SIZE])
+    return frames
+
+async def replay(path, url, rate):
+    """
+    フレームファイルをWebSocketサーバーに送信
+
+    Parameters:
+        path (str): フレームファイルのパス
+        url (str): 送信先のWebSocket URL
+        rate (float): 1秒あたりの送信フレーム数（0以下で最大速度）
+    """
+    interval = 1.0 / rate if rate > 0 else 0
+    sent = 0
+    async with websockets.connect(url) as websocket:
+        for frame in read_frames(path):
+            await websocket.send(frame)
+            sent += 1
+            if interval:
+                await asyncio.sleep(interval)
+    print(f"{sent}フレームを送信しました: {url}")
+
+def main():
+    parser = argparse.ArgumentParser(description="LiveAPIのテスト用プロデューサー")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="合成したマッチのフレームファイルを作成")
+    generate_parser.add_argument("path")
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.add_argument("--fights", type=int, default=300)
+
+    replay_parser = subparsers.add_parser("replay", help="フレームファイルをサーバーに送信")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--url", default="ws://localhost:7777")
+    replay_parser.add_argument("--rate", type=float, default=100, help="1秒あたりのフレーム数（0で最大速度）")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        frames = generate_match(args.seed, args.fights)
+        write_frames(args.path, frames)
+        print(f"{len(frames)}フレームを書き込みました: {args.path}")
+    else:
+        asyncio.run(replay(args.path, args.url, args.rate))
+
+if __name__ == "__main__":
+    main()
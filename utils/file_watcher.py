@@ -0,0 +1,218 @@
+import asyncio
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import struct
+import sys
+from pathlib import Path
+from utils.logger import get_logger
+
+# ロガーの取得
+logger = get_logger()
+
+# inotifyのイベント（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+# ファイルの変更・置き換え・削除を検知するイベント
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# inotify_init1のフラグ
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# inotify_eventの固定長部分（wd, mask, cookie, len）
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# inotifyが使えない場合にstatで確認する間隔（秒）
+DEFAULT_POLL_INTERVAL = 1.0
+
+# 連続したイベントをまとめる時間（秒）
+DEFAULT_DEBOUNCE = 0.05
+
+def _load_libc():
+    """inotifyを使えるlibcを取得（Linux以外や取得できない場合はNone）"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    return libc
+
+_libc = _load_libc()
+
+def file_signature(path):
+    """ファイルの変更を判定するための (mtime, サイズ, inode)。存在しない場合はNone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+class FileWatcher:
+    """
+    ファイルの変更を監視してコールバックを呼び出す
+
+    Linuxではinotifyでファイルのあるディレクトリを監視し（一時ファイルからの置き換えも
+    検知できる）、使えない環境ではstatのポーリングで変更を確認する。
+    コールバックはイベントループ上で呼び出される。
+    """
+
+    def __init__(self, path, callback, poll_interval=DEFAULT_POLL_INTERVAL, debounce=DEFAULT_DEBOUNCE):
+        """
+        Parameters:
+            path (str | Path): 監視するファイル
+            callback (callable): 変更時に呼び出す関数（引数なし）
+            poll_interval (float): ポーリング時の確認間隔（秒）
+            debounce (float): 連続したイベントをまとめる時間（秒）
+        """
+        self.path = Path(path).resolve()
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+        self.mode = None
+        self.loop = None
+        self.fd = None
+        self.poll_task = None
+        self.pending = None
+
+    def start(self, force_poll=False):
+        """
+        監視を開始（実行中のイベントループが必要）
+
+        Parameters:
+            force_poll (bool): inotifyを使わずにポーリングする（共有フォルダなど、
+                他のマシンからの書き込みをinotifyで検知できない場合）
+        """
+        self.loop = asyncio.get_running_loop()
+
+        if not force_poll and _libc is not None and self._start_inotify():
+            self.mode = "inotify"
+        else:
+            self.mode = "poll"
+            # 開始直後の変更も検知できるよう、比較の基準は開始時点で取得する
+            self.poll_task = asyncio.ensure_future(self._poll(self._signature()))
+
+        logger.info(f"ファイルの監視を開始しました: {self.path} ({self.mode})")
+        return self
+
+    def stop(self):
+        """監視を終了"""
+        if self.fd is not None:
+            self.loop.remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+            self.poll_task = None
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+
+    def _start_inotify(self):
+        """inotifyでの監視を開始"""
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+
+        directory = os.fsencode(str(self._watch_directory()))
+        if _libc.inotify_add_watch(fd, directory, WATCH_MASK) < 0:
+            os.close(fd)
+            return False
+
+        self.fd = fd
+        self.loop.add_reader(fd, self._on_readable)
+        return True
+
+    def _on_readable(self):
+        """inotifyのイベントを読み取る"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            start = offset + INOTIFY_EVENT.size
+            name = data[start:start + length].rstrip(b"\0")
+            offset = start + length
+
+            if self._matches(os.fsdecode(name)):
+                self._schedule()
+                return
+
+    async def _poll(self, previous):
+        """statのポーリングで変更を確認"""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = self._signature()
+            if current != previous:
+                previous = current
+                self._fire()
+
+    def _watch_directory(self):
+        """inotifyで監視するディレクトリ"""
+        return self.path.parent
+
+    def _matches(self, name):
+        """inotifyのイベントのファイル名が監視対象かどうか"""
+        return name == self.path.name
+
+    def _signature(self):
+        """ポーリングで変更を判定する値"""
+        return file_signature(self.path)
+
+    def _schedule(self):
+        """連続したイベントをまとめてからコールバックを呼び出す"""
+        if self.pending is not None:
+            self.pending.cancel()
+        self.pending = self.loop.call_later(self.debounce, self._fire)
+
+    def _fire(self):
+        self.pending = None
+        try:
+            self.callback()
+        except Exception as e:
+            logger.error(f"ファイル変更の処理中にエラーが発生しました: {str(e)}")
+
+class DirectoryWatcher(FileWatcher):
+    """
+    ディレクトリ内のファイル（パターンに一致するもの）の追加・変更を監視してコールバックを呼び出す
+
+    ポーリングの場合は一致するすべてのファイルの (mtime, サイズ, inode) を比較する。
+    """
+
+    def __init__(self, path, callback, pattern="*", poll_interval=DEFAULT_POLL_INTERVAL, debounce=DEFAULT_DEBOUNCE):
+        """
+        Parameters:
+            path (str | Path): 監視するディレクトリ
+            callback (callable): 変更時に呼び出す関数（引数なし）
+            pattern (str): 監視するファイル名のパターン（fnmatch形式）
+            poll_interval (float): ポーリング時の確認間隔（秒）
+            debounce (float): 連続したイベントをまとめる時間（秒）
+        """
+        super().__init__(path, callback, poll_interval, debounce)
+        self.pattern = pattern
+
+    def _watch_directory(self):
+        return self.path
+
+    def _matches(self, name):
+        return fnmatch.fnmatch(name, self.pattern)
+
+    def _signature(self):
+        try:
+            names = sorted(name for name in os.listdir(self.path) if self._matches(name))
+        except OSError:
+            return None
+        return tuple((name, file_signature(self.path / name)) for name in names)
@@ -1,43 +1,236 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import time
 from pathlib import Path
 from datetime import datetime
 
 # ログディレクトリ
 LOG_DIR = Path("logs")
 
-def setup_logger():
-    """アプリケーションのロガーをセットアップ"""
+# ロガー名
+LOGGER_NAME = "apex_overlay"
+
+# フレーム単位のログのデフォルト（種類ごとにN件に1件だけ記録し、さらに1秒あたりの件数を制限）
+DEFAULT_FRAME_SAMPLE_EVERY = 100
+DEFAULT_FRAME_RATE_LIMIT = 10
+
+# フレーム単位のログに含めるメッセージの最大長
+FRAME_PREVIEW_LENGTH = 200
+
+# ファイル・コンソールへの書き出しを行うバックグラウンドスレッド
+_listener = None
+
+def setup_logger(level=logging.INFO):
+    """
+    アプリケーションのロガーをセットアップ
+
+    ログの呼び出し元（イベントループ）はキューに積むだけで、ファイル・コンソールへの
+    書き出しはQueueListenerのスレッドで行う。2回目以降の呼び出しではレベルのみ変更する。
+
+    Parameters:
+        level (int | str): ログレベル
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    set_level(level)
+    if _listener is not None:
+        return logger
+
     # ログディレクトリが存在しない場合は作成
     if not LOG_DIR.exists():
         LOG_DIR.mkdir(parents=True)
-    
+
     # 日付でログファイル名を生成
     log_file = LOG_DIR / f"apex_overlay_{datetime.now().strftime('%Y%m%d')}.log"
-    
-    # ロガーのセットアップ
-    logger = logging.getLogger("apex_overlay")
-    logger.setLevel(logging.INFO)
-    
-    # ファイルハンドラー
+
+    # ファイルハンドラー・コンソールハンドラー（レベルはロガー側で判定する）
     file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-    
-    # コンソールハンドラー
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    
+
     # フォーマッター
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
-    
-    # ハンドラーをロガーに追加
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+
+    # ロガーにはキューへの追加だけを行うハンドラーを付ける
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    _listener.start()
+    atexit.register(shutdown_logger)
+
     return logger
 
+def shutdown_logger():
+    """キューに残っているログを書き出してバックグラウンドスレッドを終了"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def set_level(level):
+    """
+    ログレベルを変更（実行中に切り替え可能）
+
+    Parameters:
+        level (int | str): ログレベル（"DEBUG" などの名前も可）
+
+    Returns:
+        bool: 変更できたかどうか（不明なレベル名の場合はFalse）
+    """
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    if not isinstance(level, int) or isinstance(level, bool):
+        return False
+    logging.getLogger(LOGGER_NAME).setLevel(level)
+    return True
+
+def get_level():
+    """現在のログレベル名"""
+    return logging.getLevelName(logging.getLogger(LOGGER_NAME).level)
+
 def get_logger():
     """アプリケーションのロガーを取得"""
-    return logging.getLogger("apex_overlay")
\ No newline at end of file
+    return logging.getLogger(LOGGER_NAME)
+
+def _preview(value):
+    """フレームの内容をログ用に切り詰める"""
+    if isinstance(value, (bytes, bytearray)):
+        return f"<バイナリ {len(value)}バイト>"
+    if isinstance(value, str) and len(value) > FRAME_PREVIEW_LENGTH:
+        return f"{value[:FRAME_PREVIEW_LENGTH]}...（{len(value)}文字）"
+    return value
+
+def _is_count(value, minimum):
+    """minimum以上の整数かどうか（boolは除く）"""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+def validate_frame_settings(sample_every=None, rate_limit=None, overrides=None):
+    """
+    フレーム単位のログの設定値を検証（Noneの項目は検証しない）
+
+    Parameters:
+        sample_every: 種類ごとに何件に1件記録するか（1以上の整数）
+        rate_limit: 種類ごとの1秒あたりの最大件数（0以上の整数、0で制限なし）
+        overrides: 種類ごとの記録間隔（種類の文字列 -> 1以上の整数 のdict）
+
+    Returns:
+        str: 正しくない場合はエラーメッセージ、正しければNone
+    """
+    if sample_every is not None and not _is_count(sample_every, 1):
+        return f"frameSampleEveryは1以上の整数で指定してください: {sample_every!r}"
+    if rate_limit is not None and not _is_count(rate_limit, 0):
+        return f"frameRateLimitは0以上の整数で指定してください: {rate_limit!r}"
+    if overrides is not None:
+        if not isinstance(overrides, dict):
+            return f"frameSampleOverridesは種類ごとの記録間隔のオブジェクトで指定してください: {overrides!r}"
+        for kind, every in overrides.items():
+            if not isinstance(kind, str) or not _is_count(every, 1):
+                return f"frameSampleOverridesの記録間隔は1以上の整数で指定してください: {kind!r}={every!r}"
+    return None
+
+class FrameLogSampler:
+    """
+    フレーム単位のログの間引き
+
+    メッセージの種類（イベント種別など）ごとに sample_every 件に1件だけ記録し、さらに
+    1秒あたり rate_limit 件までに制限する。ログレベルが無効な場合は件数を数えるだけで
+    何も組み立てない。省略した件数は次に記録するログに付ける。
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG,
+                 sample_every=DEFAULT_FRAME_SAMPLE_EVERY, rate_limit=DEFAULT_FRAME_RATE_LIMIT):
+        """
+        Parameters:
+            logger (logging.Logger): 記録先のロガー
+            level (int): フレーム単位のログのレベル
+            sample_every (int): 種類ごとに何件に1件記録するか（1ですべて）
+            rate_limit (int): 種類ごとの1秒あたりの最大件数（0で制限なし）
+        """
+        self.logger = logger or get_logger()
+        self.level = level
+        self.sample_every = sample_every
+        self.rate_limit = rate_limit
+
+        # 種類ごとの個別のサンプリング間隔（指定がなければ sample_every）
+        self.overrides = {}
+
+        # 種類 -> [受信件数, 現在の1秒の開始時刻, その1秒の記録件数, 省略件数]
+        self.kinds = {}
+
+        # 省略した件数の合計
+        self.suppressed = 0
+
+    def configure(self, sample_every=None, rate_limit=None, overrides=None):
+        """サンプリング間隔・レート制限を変更（正しくない値は警告を出して無視する）"""
+        if sample_every is not None and self._accept(validate_frame_settings(sample_every=sample_every)):
+            self.sample_every = sample_every
+        if rate_limit is not None and self._accept(validate_frame_settings(rate_limit=rate_limit)):
+            self.rate_limit = rate_limit
+        if overrides is not None and self._accept(validate_frame_settings(overrides=overrides)):
+            self.overrides = dict(overrides)
+
+    def _accept(self, error):
+        """検証結果がエラーの場合は警告を記録してFalseを返す"""
+        if error is None:
+            return True
+        self.logger.warning(f"フレーム単位のログの設定を無視しました: {error}")
+        return False
+
+    def log(self, kind, message, *args):
+        """
+        フレーム単位のログを記録（間引いた場合は何もしない）
+
+        Parameters:
+            kind (str): メッセージの種類
+            message (str): ログのメッセージ（%形式）
+            args: メッセージの引数（長い文字列・バイト列は切り詰める）
+        """
+        if not self.logger.isEnabledFor(self.level):
+            return
+
+        state = self.kinds.get(kind)
+        if state is None:
+            state = self.kinds[kind] = [0, 0.0, 0, 0]
+        state[0] += 1
+        if (state[0] - 1) % self.overrides.get(kind, self.sample_every):
+            state[3] += 1
+            self.suppressed += 1
+            return
+
+        if self.rate_limit:
+            now = time.monotonic()
+            if now - state[1] >= 1.0:
+                state[1] = now
+                state[2] = 0
+            if state[2] >= self.rate_limit:
+                state[3] += 1
+                self.suppressed += 1
+                return
+            state[2] += 1
+
+        args = tuple(_preview(arg) for arg in args)
+        if state[3]:
+            message = f"{message}（{kind}: {state[3]}件省略）"
+            state[3] = 0
+        self.logger.log(self.level, message, *args)
+
+    def get_config(self):
+        """現在の設定と件数"""
+        return {
+            "sampleEvery": self.sample_every,
+            "rateLimit": self.rate_limit,
+            "overrides": dict(self.overrides),
+            "suppressed": self.suppressed,
+            "received": {kind: state[0] for kind, state in self.kinds.items()}
+        }
+
+# フレーム単位のログの間引き（プロセスで1つ）
+frame_logger = FrameLogSampler()
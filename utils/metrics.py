@@ -0,0 +1,239 @@
+from itertools import cycle
+
+# 処理時間の計測とメトリクスの公開
+# ヒストグラムはナノ秒の値のビット長をそのままバケット番号に使い（2のべき乗の境界）、
+# 記録はリストの加算2回だけで行う（二分探索や浮動小数点の変換をしない）
+# フレームごとの段階の計測は時刻の取得自体が無視できないコストになるため、
+# TIMING_SAMPLE_INTERVAL フレームに1回だけ計測する
+
+# 処理時間を計測する間隔（フレーム数）
+TIMING_SAMPLE_INTERVAL = 8
+
+# 記録できるビット長の上限（2^63ns ≒ 292年）
+_MAX_BITS = 64
+
+# 出力するバケット境界のビット長の範囲: 2^10ns（約1µs）〜 2^30ns（約1.07s）
+MIN_BUCKET_BITS = 10
+MAX_BUCKET_BITS = 30
+
+class Histogram:
+    """2のべき乗の固定バケットで処理時間を記録するヒストグラム"""
+
+    def __init__(self, name, help_text, labels=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels or {}
+
+        # counts[i] は 2^(i-1) <= 値 < 2^i（ナノ秒）の件数
+        self.counts = [0] * (_MAX_BITS + 1)
+        self.total_ns = [0]
+
+    def observe_ns(self, value):
+        """処理時間（ナノ秒の整数）を記録"""
+        self.counts[value.bit_length()] += 1
+        self.total_ns[0] += value
+
+    def observe(self, seconds):
+        """処理時間（秒）を記録"""
+        self.observe_ns(max(0, int(seconds * 1e9)))
+
+    def snapshot(self):
+        """
+        出力用に集計したバケット
+
+        Returns:
+            tuple: ([(境界（秒）, 累積件数)], 総件数, 合計（秒）)
+        """
+        counts = list(self.counts)
+        total = sum(counts)
+        buckets = []
+        cumulative = sum(counts[:MIN_BUCKET_BITS + 1])
+        buckets.append((2 ** MIN_BUCKET_BITS / 1e9, cumulative))
+        for bits in range(MIN_BUCKET_BITS + 1, MAX_BUCKET_BITS + 1):
+            cumulative += counts[bits]
+            buckets.append((2 ** bits / 1e9, cumulative))
+        return buckets, total, self.total_ns[0] / 1e9
+
+    def to_dict(self):
+        """JSON用の表現"""
+        buckets, total, total_seconds = self.snapshot()
+
+        def quantile(fraction):
+            # 該当バケットの上限を返す
+            if not total:
+                return 0.0
+            for bound, cumulative in buckets:
+                if cumulative >= fraction * total:
+                    return bound
+            return float("inf")
+
+        return {
+            "count": total,
+            "sum": total_seconds,
+            "p50": quantile(0.50),
+            "p95": quantile(0.95),
+            "p99": quantile(0.99),
+            "buckets": {f"{bound:.9g}": cumulative for bound, cumulative in buckets},
+            "overflow": total - buckets[-1][1]
+        }
+
+class Counter:
+    """単調増加するカウンター（funcを指定すると読み取り時に値を取得）"""
+
+    def __init__(self, name, help_text, func=None):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+        self.value = 0
+
+    def inc(self, amount=1):
+        """カウンターを増やす"""
+        self.value += amount
+
+    def get(self):
+        """現在の値"""
+        return self.func() if self.func is not None else self.value
+
+class Gauge:
+    """読み取り時に値を取得するゲージ"""
+
+    def __init__(self, name, help_text, func):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+
+    def get(self):
+        """現在の値"""
+        return self.func()
+
+def _format_labels(labels, extra=None):
+    """Prometheusのラベル表記"""
+    items = dict(labels)
+    if extra:
+        items.update(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items.items()) + "}"
+
+class MetricsRegistry:
+    """メトリクスの登録と出力"""
+
+    def __init__(self, prefix="apex_overlay"):
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def histogram(self, name, help_text, labels=None):
+        """ヒストグラムを取得（未登録の場合は作成）"""
+        key = (name, tuple(sorted((labels or {}).items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = Histogram(name, help_text, labels)
+            self.histograms[key] = histogram
+        return histogram
+
+    def counter(self, name, help_text, func=None):
+        """カウンターを取得（未登録の場合は作成）"""
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = Counter(name, help_text, func)
+            self.counters[name] = counter
+        elif func is not None:
+            counter.func = func
+        return counter
+
+    def gauge(self, name, help_text, func):
+        """ゲージを登録（同名のゲージは置き換える）"""
+        gauge = Gauge(name, help_text, func)
+        self.gauges[name] = gauge
+        return gauge
+
+    def _read(self, metric):
+        """コールバックの例外で出力全体が失敗しないようにする"""
+        try:
+            return metric.get()
+        except Exception:
+            return None
+
+    def to_dict(self):
+        """
+        メトリクスをJSON用のdictで取得
+
+        Returns:
+            dict: histograms / counters / gauges
+        """
+        histograms = {}
+        for histogram in self.histograms.values():
+            name = histogram.name
+            if histogram.labels:
+                name += _format_labels(histogram.labels)
+            histograms[name] = histogram.to_dict()
+
+        return {
+            "timingSampleInterval": TIMING_SAMPLE_INTERVAL,
+            "histograms": histograms,
+            "counters": {name: self._read(counter) for name, counter in self.counters.items()},
+            "gauges": {name: self._read(gauge) for name, gauge in self.gauges.items()}
+        }
+
+    def to_prometheus(self):
+        """
+        メトリクスをPrometheusのテキスト形式で取得
+
+        Returns:
+            str: text/plain; version=0.0.4 形式の文字列
+        """
+        lines = []
+        described = set()
+
+        for histogram in self.histograms.values():
+            name = f"{self.prefix}_{histogram.name}"
+            if name not in described:
+                lines.append(f"# HELP {name} {histogram.help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                described.add(name)
+
+            buckets, total, total_seconds = histogram.snapshot()
+            for bound, cumulative in buckets:
+                lines.append(f"{name}_bucket{_format_labels(histogram.labels, {'le': f'{bound:.9g}'})} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(histogram.labels, {'le': '+Inf'})} {total}")
+            lines.append(f"{name}_sum{_format_labels(histogram.labels)} {total_seconds}")
+            lines.append(f"{name}_count{_format_labels(histogram.labels)} {total}")
+
+        for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+            for metric in metrics.values():
+                value = self._read(metric)
+                if value is None:
+                    continue
+                name = f"{self.prefix}_{metric.name}"
+                lines.append(f"# HELP {name} {metric.help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+def timing_sampler(interval=TIMING_SAMPLE_INTERVAL):
+    """interval回に1回だけTrueを返す関数を作成（呼び出しのコストはCの関数1回分）"""
+    return cycle((True,) + (False,) * (interval - 1)).__next__
+
+# アプリケーション全体で共有するレジストリ
+metrics = MetricsRegistry()
+
+def stage_histogram(stage):
+    """WebSocket経路の各段階の処理時間ヒストグラム"""
+    return metrics.histogram(
+        "stage_seconds",
+        f"WebSocket経路の段階ごとの処理時間（秒、{TIMING_SAMPLE_INTERVAL}回に1回計測）",
+        labels={"stage": stage}
+    )
+
+# WebSocket経路の段階
+RECEIVE_SECONDS = stage_histogram("receive")
+DECODE_SECONDS = stage_histogram("decode")
+PROCESS_SECONDS = stage_histogram("process")
+SERIALIZE_SECONDS = stage_histogram("serialize")
+SEND_SECONDS = stage_histogram("send")
+
+# エラー数
+ERRORS = metrics.counter("errors_total", "フレーム処理中のエラー数")
@@ -1,44 +1,284 @@
+import csv
+import io
+import json
 import os
+import tempfile
 from pathlib import Path
 
+# CSVのヘッダー行とみなす1列目の名前
+CSV_HEADER_NAMES = ('playerid', 'player_id', 'id')
+
+def _clean_player_id(player_id):
+    """プレイヤーIDを正規化（空白を含むIDは無効）"""
+    player_id = str(player_id).strip()
+    if not player_id or any(c.isspace() for c in player_id):
+        return None
+    return player_id
+
+def _clean_display_name(display_name):
+    """表示名を正規化（ファイルの形式を壊す引用符・改行を取り除く）"""
+    display_name = str(display_name).replace('"', '').replace('\r', ' ').replace('\n', ' ').strip()
+    return display_name or None
+
+def parse_overrides(data):
+    """
+    一括登録用のデータを {プレイヤーID: 表示名} に変換
+
+    Parameters:
+        data (dict | list | str): {"csv": "..."}、{"overrides": {...} または [...]}、
+            {ID: 名前} のJSON、[{"playerId": ..., "displayName": ...}] のリスト、
+            または "ID,名前" の行からなるCSV文字列
+
+    Returns:
+        tuple: ({プレイヤーID: 表示名}, 無効な行数)
+    """
+    if isinstance(data, dict):
+        if 'csv' in data:
+            data = data['csv']
+        elif 'overrides' in data:
+            data = data['overrides']
+
+    if isinstance(data, str):
+        stripped = data.strip()
+        if stripped.startswith(('{', '[')):
+            data = json.loads(stripped)
+        else:
+            rows = [row for row in csv.reader(io.StringIO(stripped)) if row]
+            if rows and rows[0][0].strip().lower() in CSV_HEADER_NAMES:
+                rows = rows[1:]
+            data = [row + [''] * (2 - len(row)) for row in rows]
+
+    if isinstance(data, dict):
+        pairs = data.items()
+    else:
+        pairs = []
+        for item in data:
+            if isinstance(item, dict):
+                pairs.append((item.get('playerId', ''), item.get('displayName', '')))
+            else:
+                pairs.append((item[0], item[1]))
+
+    return _clean_overrides(pairs)
+
+def _clean_overrides(pairs):
+    """(プレイヤーID, 表示名) の組を正規化して (辞書, 無効な件数) を返す"""
+    overrides = {}
+    invalid = 0
+    for player_id, display_name in pairs:
+        player_id = _clean_player_id(player_id)
+        display_name = _clean_display_name(display_name)
+        if player_id is None or display_name is None:
+            invalid += 1
+            continue
+        overrides[player_id] = display_name
+    return overrides, invalid
+
+def parse_player_ids(data):
+    """
+    一括削除用のデータをプレイヤーIDのリストに変換
+
+    Parameters:
+        data (dict | list | str): {"playerIds": [...]}、{"csv": "..."}、IDのリスト、
+            または1列目がIDのCSV文字列
+
+    Returns:
+        list: プレイヤーID
+    """
+    if isinstance(data, dict):
+        data = data.get('playerIds', data.get('csv', []))
+
+    if isinstance(data, str):
+        rows = [row for row in csv.reader(io.StringIO(data.strip())) if row]
+        if rows and rows[0][0].strip().lower() in CSV_HEADER_NAMES:
+            rows = rows[1:]
+        data = [row[0] for row in rows]
+
+    player_ids = []
+    for player_id in data:
+        player_id = _clean_player_id(player_id)
+        if player_id is not None:
+            player_ids.append(player_id)
+    return player_ids
+
+def render_override_file(overrides):
+    """override_names.txtの内容を作成"""
+    lines = ["names", "{"]
+    for player_id, display_name in overrides.items():
+        lines.append(f'    {player_id} "{display_name}"')
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def parse_override_file(content):
+    """override_names.txtの内容を {プレイヤーID: 表示名} に変換"""
+    overrides = {}
+    for line in content.splitlines():
+        player_id, _, rest = line.strip().partition(' ')
+        rest = rest.strip()
+        if len(rest) >= 2 and rest[0] == '"' and rest[-1] == '"':
+            overrides[player_id] = rest[1:-1]
+    return overrides
+
 class SimpleNameOverride:
-    """単純なName Override機能"""
-    
+    """
+    単純なName Override機能
+
+    オーバーライドはメモリ上の辞書（プレイヤーID -> 表示名）で管理し、
+    変更はまとめて1回だけoverride_names.txtに書き込む（内容が変わらない場合は書き込まない）。
+    """
+
     def __init__(self):
         # ユーザー名を取得
         self.username = os.environ.get('USERNAME', 'YourUsername')
-        
+
         # Apexのtempフォルダのパス
         self.temp_path = Path(f"C:/Users/{self.username}/Saved Games/Respawn/Apex/assets/temp")
-        
+
         # override_names.txtのパス
         self.override_file = self.temp_path / "override_names.txt"
-    
+
+        # プレイヤーID -> 表示名
+        self.overrides = {}
+
+        # 最後に書き込んだ（読み込んだ）ファイルの内容
+        self.written_content = None
+
     def setup(self):
-        """セットアップ（単にフォルダが存在するか確認）"""
+        """セットアップ（フォルダが存在するか確認し、既存のファイルを読み込む）"""
         if not self.temp_path.exists():
             print(f"警告: Apexのtempフォルダが見つかりません: {self.temp_path}")
             return False
-        
+
         print(f"Name Override Tool: {self.override_file}")
+        self.load()
         return True
-    
-    def create_sample_override(self):
-        """サンプルのオーバーライドファイルを作成"""
+
+    def load(self):
+        """既存のoverride_names.txtを読み込む"""
         try:
-            # 簡単なサンプル
-            sample_content = """names
-{
-    1234567890 "Player1"
-    9876543210 "Player2"
-}
-"""
-            # ファイルに書き込み
-            with open(self.override_file, "w") as f:
-                f.write(sample_content)
-            
+            content = self.override_file.read_text(encoding="utf-8")
+        except OSError:
+            return False
+
+        self.overrides = parse_override_file(content)
+        self.written_content = content
+        return True
+
+    def create_sample_override(self):
+        """サンプルのオーバーライドファイルを作成（既存のファイルがある場合は何もしない）"""
+        if self.override_file.exists():
+            return True
+
+        # 簡単なサンプル
+        if self._commit({"1234567890": "Player1", "9876543210": "Player2"}):
             print(f"サンプルのName Override Fileを作成しました: {self.override_file}")
             return True
-        except Exception as e:
-            print(f"サンプルファイルの作成に失敗しました: {str(e)}")
-            return False
\ No newline at end of file
+        return False
+
+    def _write_file(self, content):
+        """override_names.txtを一時ファイル経由で置き換える"""
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_path, prefix=".override_names.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.override_file)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _commit(self, overrides):
+        """
+        新しいオーバーライドを反映（ファイルの内容が変わる場合のみ書き込む）
+
+        書き込みに失敗した場合はメモリ上のオーバーライドも変更しない。
+        """
+        content = render_override_file(overrides)
+        if content != self.written_content:
+            try:
+                self._write_file(content)
+            except Exception as e:
+                print(f"Name Override Fileの書き込みに失敗しました: {str(e)}")
+                return False
+            self.written_content = content
+
+        self.overrides = overrides
+        return True
+
+    def get_override(self, player_id, default=None):
+        """プレイヤーIDの表示名を取得"""
+        return self.overrides.get(str(player_id), default)
+
+    def get_all_overrides(self):
+        """すべてのオーバーライドを取得"""
+        return dict(self.overrides)
+
+    def add_override(self, player_id, display_name):
+        """オーバーライドを1件追加"""
+        return self.add_overrides({player_id: display_name}) is not None
+
+    def remove_override(self, player_id):
+        """
+        オーバーライドを1件削除
+
+        Returns:
+            bool: 削除したかどうか（登録されていない場合・書き込みに失敗した場合はFalse）
+        """
+        return bool(self.remove_overrides([player_id]))
+
+    def add_overrides(self, overrides):
+        """
+        オーバーライドをまとめて追加・更新
+
+        Parameters:
+            overrides (dict): プレイヤーID -> 表示名
+
+        Returns:
+            int | None: 追加・更新した件数（書き込みに失敗した場合はNone）
+        """
+        overrides, _ = _clean_overrides(overrides.items())
+        updated = dict(self.overrides)
+        changed = 0
+        for player_id, display_name in overrides.items():
+            if updated.get(player_id) != display_name:
+                updated[player_id] = display_name
+                changed += 1
+
+        if changed and not self._commit(updated):
+            return None
+        return changed
+
+    def remove_overrides(self, player_ids):
+        """
+        オーバーライドをまとめて削除
+
+        Parameters:
+            player_ids (list): プレイヤーID
+
+        Returns:
+            int | None: 削除した件数（書き込みに失敗した場合はNone）
+        """
+        updated = dict(self.overrides)
+        removed = 0
+        for player_id in player_ids:
+            if updated.pop(str(player_id), None) is not None:
+                removed += 1
+
+        if removed and not self._commit(updated):
+            return None
+        return removed
+
+    def create_override_file(self, overrides):
+        """オーバーライドを置き換えてファイルを作成（プリセットの適用）"""
+        replaced, _ = _clean_overrides(overrides.items())
+        return self._commit(replaced)
+
+    def save_preset(self, preset_name, overrides, settings_manager):
+        """オーバーライドをプリセットとして設定に保存"""
+        presets = dict(settings_manager.get_setting('nameOverride.presets', {}))
+        presets[preset_name] = dict(overrides)
+        settings_manager.set_setting('nameOverride.presets', presets)
+        return settings_manager.save_settings()